@@ -0,0 +1,223 @@
+import threading
+import weakref
+from types import MappingProxyType
+
+import pandas as pd
+import streamlit as st
+
+from modelo import hash_datos, olvidar_modelo
+
+# Versiones del modelo en memoria, compartidas por todas las sesiones del proceso:
+# versión -> {'datos': mapping de solo lectura, 'referencias': manijas vivas}
+_VERSIONES: dict = {}
+# Hash de la tabla de hechos -> versión que la contiene
+_HECHOS: dict = {}
+# Última versión publicada con modelo: se conserva aunque ninguna sesión la use
+_vigente = None
+
+# Las sesiones de Streamlit corren en hilos distintos; reentrante porque
+# liberar una manija dentro de una sección protegida vuelve a entrar. Solo
+# protege los diccionarios: las construcciones usan un candado por versión
+_CANDADO = threading.RLock()
+# Versión -> candado de quien la está construyendo (publicar/completar)
+_CONSTRUCCIONES: dict = {}
+
+_VACIO = MappingProxyType({})
+
+
+class Manija:
+    """
+    Referencia de una sesión a una versión del almacén.
+
+    La sesión guarda en `st.session_state` solo la manija, no los datos.
+    Mientras exista, su versión no se descarta; cuando la sesión la
+    reemplaza o termina, el recolector la libera y la versión pierde una
+    referencia.
+    """
+    __slots__ = ('version', '__weakref__')
+
+    def __init__(self, version: str):
+        self.version = version
+        _VERSIONES[version]['referencias'] += 1
+        weakref.finalize(self, _soltar, version)
+
+    def __repr__(self):
+        return f"Manija({self.version[:12]})"
+
+
+def _soltar(version: str) -> None:
+    with _CANDADO:
+        entrada = _VERSIONES.get(version)
+        if entrada is not None:
+            entrada['referencias'] -= 1
+            _podar()
+
+
+def _podar() -> None:
+    # Se descartan las versiones que ya no usa ninguna sesión, salvo la vigente
+    for version, entrada in list(_VERSIONES.items()):
+        if entrada['referencias'] == 0 and version != _vigente:
+            del _VERSIONES[version]
+            for hechos in [h for h, v in _HECHOS.items() if v == version]:
+                del _HECHOS[hechos]
+            olvidar_modelo(version)
+
+
+def _candado_construccion(version: str) -> threading.Lock:
+    # Se llama con _CANDADO tomado; el constructor lo quita al guardar
+    return _CONSTRUCCIONES.setdefault(version, threading.Lock())
+
+
+def _guardar(version: str, datos: dict) -> None:
+    global _vigente
+    entrada = _VERSIONES.setdefault(version, {'datos': _VACIO, 'referencias': 0})
+    entrada['datos'] = MappingProxyType(dict(datos))
+    if 'df_fact' in datos:
+        _HECHOS[hash_datos(datos['df_fact'])] = version
+        _vigente = version
+
+
+# ===================================================================
+# Función: adquirir
+# ===================================================================
+def adquirir(version: str | None) -> Manija | None:
+    """
+    Devuelve una manija a la versión `version` si está en memoria.
+
+    `version` puede ser la llave con la que se publicó o el hash de su tabla
+    de hechos (el que guarda `almacen_sqlite`).
+    """
+    with _CANDADO:
+        if version not in _VERSIONES:
+            version = _HECHOS.get(version)
+        return Manija(version) if version is not None else None
+
+
+# ===================================================================
+# Función: publicar
+# ===================================================================
+def publicar(version: str, construir) -> Manija:
+    """
+    Registra una versión en el almacén y devuelve una manija a ella.
+
+    `construir()` solo se llama si la versión no está ya en memoria: si otra
+    sesión la publicó antes, se comparte su copia y la de quien llama se
+    puede soltar. Si otra sesión la está construyendo, se espera a que
+    termine; las demás versiones no se bloquean. Si los datos incluyen
+    'df_fact', la versión pasa a ser la vigente.
+
+    Args:
+        version (str): Versión de los datos (p. ej. `hash_datos(df_raw)`).
+        construir (callable): Función sin argumentos que devuelve un dict con los datos.
+
+    Returns:
+        Manija: Referencia que la sesión guarda en `st.session_state`.
+    """
+    with _CANDADO:
+        manija = adquirir(version)
+        if manija is not None:
+            return manija
+        candado = _candado_construccion(version)
+
+    with candado:
+        with _CANDADO:
+            manija = adquirir(version)
+            if manija is not None:
+                return manija
+        datos = construir()
+        with _CANDADO:
+            _guardar(version, datos)
+            _CONSTRUCCIONES.pop(version, None)
+            manija = Manija(version)
+            _podar()
+            return manija
+
+
+# ===================================================================
+# Función: completar
+# ===================================================================
+def completar(manija: Manija, requisitos: dict, construir) -> MappingProxyType:
+    """
+    Completa los datos de una versión con lo que derive de ellos (p. ej. el
+    modelo estrella a partir de `df_raw`), una sola vez para todas las sesiones.
+
+    Si algún valor de `requisitos` no coincide con el guardado, se llama a
+    `construir(datos)` y su resultado reemplaza los datos de la versión. Si
+    dos sesiones lo piden a la vez, la segunda espera y recibe lo que
+    construyó la primera; las sesiones de otras versiones no esperan.
+
+    Args:
+        manija (Manija): Versión a completar.
+        requisitos (dict): Llaves y valores que deben estar en los datos.
+        construir (callable): Recibe los datos actuales y devuelve el dict completo.
+
+    Returns:
+        MappingProxyType: Los datos de la versión, de solo lectura.
+    """
+    def faltan(datos):
+        return any(k not in datos or datos[k] != v for k, v in requisitos.items())
+
+    with _CANDADO:
+        entrada = _VERSIONES[manija.version]
+        if not faltan(entrada['datos']):
+            return entrada['datos']
+        candado = _candado_construccion(manija.version)
+
+    with candado:
+        with _CANDADO:
+            datos = entrada['datos']
+            if not faltan(datos):
+                return datos
+        nuevos = {**construir(datos), **requisitos}
+        with _CANDADO:
+            _guardar(manija.version, nuevos)
+            _CONSTRUCCIONES.pop(manija.version, None)
+            _podar()
+            return entrada['datos']
+
+
+# ===================================================================
+# Función: obtener
+# ===================================================================
+def obtener(manija: Manija | None) -> MappingProxyType:
+    """
+    Devuelve los datos de la versión de `manija` (vacíos si es None).
+
+    Los DataFrames son los mismos para todas las sesiones: no deben
+    modificarse en el lugar.
+    """
+    if manija is None:
+        return _VACIO
+    return _VERSIONES[manija.version]['datos']
+
+
+# ===================================================================
+# Función: datos_sesion
+# ===================================================================
+def datos_sesion(clave: str = 'modelo') -> MappingProxyType:
+    """
+    Datos de la versión que la sesión guarda en `st.session_state[clave]`.
+
+    'modelo' es la versión con la que trabajan las pestañas de análisis y
+    'crudos' la de los datos cargados en la pestaña de carga.
+    """
+    return obtener(st.session_state.get(clave))
+
+
+# ===================================================================
+# Función: estadisticas_almacen
+# ===================================================================
+def estadisticas_almacen() -> pd.DataFrame:
+    """
+    Versiones en memoria con sus sesiones, contenido y tamaño aproximado.
+    """
+    with _CANDADO:
+        filas = [{
+            'version': version[:12],
+            'sesiones': entrada['referencias'],
+            'vigente': version == _vigente,
+            'contenido': ", ".join(k for k, v in entrada['datos'].items() if isinstance(v, pd.DataFrame)),
+            'mb': sum(v.memory_usage(deep=False).sum() for v in entrada['datos'].values()
+                      if isinstance(v, pd.DataFrame)) / 2**20,
+        } for version, entrada in _VERSIONES.items()]
+    return pd.DataFrame(filas, columns=['version', 'sesiones', 'vigente', 'contenido', 'mb'])
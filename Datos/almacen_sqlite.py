@@ -0,0 +1,400 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from modelo import COLUMNAS_HECHOS, COLUMNAS_GEO, tipo_id
+from indicadores import CATEGORIAS_INDICADOR, CATEGORIAS_NIVEL
+
+RUTA_DB = os.path.join("Datos", "modelo_educativo.db")
+
+# Tablas propias de la app; las construidas en los cuadernos (dim_tiempo,
+# hechos_educacion, ...) no se tocan.
+TABLA_TIEMPO = "estrella_dim_tiempo"
+TABLA_GEO = "estrella_dim_geo"
+TABLA_HECHOS = "estrella_hechos"
+TABLA_META = "estrella_meta"
+# Un cubo materializado por nivel de agregación (p. ej. estrella_cubo_departamento)
+TABLA_CUBO = "estrella_cubo_{nivel}"
+# Almacén de indicadores en formato largo y su diccionario de (indicador, nivel)
+TABLA_INDICADORES = "estrella_indicadores"
+TABLA_DICCIONARIO = "estrella_dim_indicador"
+
+# Se incrementa cuando cambian las columnas de las tablas; un modelo guardado
+# con otro esquema se trata como inexistente y se reescribe.
+ESQUEMA = "2"
+
+_METRICAS_SQL = ",\n    ".join(f"{col} REAL" for col in COLUMNAS_HECHOS)
+
+DDL = f"""
+DROP TABLE IF EXISTS {TABLA_INDICADORES};
+DROP TABLE IF EXISTS {TABLA_HECHOS};
+DROP TABLE IF EXISTS {TABLA_GEO};
+DROP TABLE IF EXISTS {TABLA_TIEMPO};
+
+CREATE TABLE {TABLA_TIEMPO} (
+    id_tiempo INTEGER PRIMARY KEY,
+    a_o INTEGER NOT NULL UNIQUE
+);
+
+CREATE TABLE {TABLA_GEO} (
+    id_geo INTEGER PRIMARY KEY,
+    c_digo_departamento TEXT NOT NULL,
+    departamento TEXT NOT NULL,
+    municipio TEXT NOT NULL,
+    c_digo_municipio TEXT NOT NULL,
+    UNIQUE (departamento, municipio)
+);
+
+-- Clave primaria agrupada (id_tiempo, id_geo): la tabla es su propio índice cubridor
+CREATE TABLE {TABLA_HECHOS} (
+    id_tiempo INTEGER NOT NULL REFERENCES {TABLA_TIEMPO}(id_tiempo),
+    id_geo INTEGER NOT NULL REFERENCES {TABLA_GEO}(id_geo),
+    {_METRICAS_SQL},
+    PRIMARY KEY (id_tiempo, id_geo)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_{TABLA_HECHOS}_geo_tiempo
+    ON {TABLA_HECHOS} (id_geo, id_tiempo, {", ".join(COLUMNAS_HECHOS)});
+CREATE INDEX idx_{TABLA_GEO}_departamento ON {TABLA_GEO} (departamento, id_geo);
+CREATE INDEX idx_{TABLA_GEO}_codigo ON {TABLA_GEO} (c_digo_departamento, id_geo);
+CREATE INDEX idx_{TABLA_GEO}_municipio ON {TABLA_GEO} (c_digo_municipio, id_geo);
+
+CREATE TABLE IF NOT EXISTS {TABLA_META} (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+@contextmanager
+def _conectar(ruta: str):
+    con = sqlite3.connect(ruta)
+    try:
+        con.execute("PRAGMA foreign_keys = ON")
+        yield con
+    finally:
+        con.close()
+
+
+# ===================================================================
+# Función: version_guardada
+# ===================================================================
+def version_guardada(ruta: str = RUTA_DB) -> str | None:
+    """
+    Devuelve la versión del modelo guardado en SQLite, o None si no hay modelo
+    (o si fue guardado con otro `ESQUEMA`).
+    """
+    if not os.path.exists(ruta):
+        return None
+    with _conectar(ruta) as con:
+        try:
+            meta = dict(con.execute(
+                f"SELECT clave, valor FROM {TABLA_META} WHERE clave IN ('version', 'esquema')"
+            ).fetchall())
+        except sqlite3.OperationalError:
+            return None
+    return meta.get('version') if meta.get('esquema') == ESQUEMA else None
+
+
+# ===================================================================
+# Función: guardar_modelo
+# ===================================================================
+def guardar_modelo(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                   version: str, ruta: str = RUTA_DB) -> bool:
+    """
+    Escribe el modelo estrella en SQLite con tipos, llaves e índices.
+
+    Si el archivo ya tiene esta versión no se escribe nada. Todo ocurre en una
+    transacción, así que un lector nunca ve el modelo a medias.
+
+    Args:
+        df_fact, dim_geo, dim_tiempo: Modelo construido por `modelo.construir_modelo`.
+        version (str): Identificador de la versión (hash de la tabla de hechos).
+        ruta (str): Archivo SQLite de destino.
+
+    Returns:
+        bool: True si se escribió el modelo, False si ya estaba al día.
+    """
+    if version_guardada(ruta) == version:
+        return False
+
+    columnas_hechos = ['id_tiempo', 'id_geo'] + COLUMNAS_HECHOS
+    filas_tiempo = dim_tiempo[['id_tiempo', 'a_o']].astype('int64').itertuples(index=False, name=None)
+    filas_geo = dim_geo[['id_geo'] + COLUMNAS_GEO].astype({c: str for c in COLUMNAS_GEO}) \
+        .astype({'id_geo': 'int64'}).itertuples(index=False, name=None)
+    filas_hechos = df_fact[columnas_hechos].astype({'id_tiempo': 'int64', 'id_geo': 'int64'}) \
+        .astype({c: 'float64' for c in COLUMNAS_HECHOS}).itertuples(index=False, name=None)
+
+    with _conectar(ruta) as con:
+        with con:
+            con.executescript("BEGIN;" + DDL)
+            con.executemany(f"INSERT INTO {TABLA_TIEMPO} VALUES (?, ?)", filas_tiempo)
+            con.executemany(
+                f"INSERT INTO {TABLA_GEO} VALUES ({', '.join('?' * (len(COLUMNAS_GEO) + 1))})", filas_geo
+            )
+            con.executemany(
+                f"INSERT INTO {TABLA_HECHOS} VALUES ({', '.join('?' * len(columnas_hechos))})",
+                filas_hechos
+            )
+            con.executemany(f"INSERT OR REPLACE INTO {TABLA_META} VALUES (?, ?)",
+                            [('version', version), ('esquema', ESQUEMA)])
+            # El DDL borró el almacén de indicadores (depende de las dimensiones)
+            con.execute(f"DELETE FROM {TABLA_META} WHERE clave = 'version_indicadores'")
+        con.execute("ANALYZE")
+    return True
+
+
+# ===================================================================
+# Función: cargar_modelo
+# ===================================================================
+def cargar_modelo(ruta: str = RUTA_DB) -> tuple | None:
+    """
+    Lee el modelo guardado y lo devuelve con los mismos tipos compactos y el
+    mismo orden de filas que produce `modelo.construir_modelo`, de modo que su
+    hash coincide con la versión guardada.
+
+    Returns:
+        tuple | None: (dim_tiempo, dim_geo, df_fact) o None si no hay modelo.
+    """
+    if version_guardada(ruta) is None:
+        return None
+    with _conectar(ruta) as con:
+        dim_tiempo = pd.read_sql_query(f"SELECT * FROM {TABLA_TIEMPO} ORDER BY id_tiempo", con)
+        dim_geo = pd.read_sql_query(f"SELECT * FROM {TABLA_GEO} ORDER BY id_geo", con)
+        df_fact = pd.read_sql_query(f"SELECT * FROM {TABLA_HECHOS} ORDER BY id_tiempo, id_geo", con)
+    tipo_tiempo, tipo_geo = tipo_id(len(dim_tiempo)), tipo_id(len(dim_geo))
+    dim_tiempo = dim_tiempo.astype({'id_tiempo': tipo_tiempo, 'a_o': 'int16'})
+    dim_geo = dim_geo.astype({'id_geo': tipo_geo, **{c: 'category' for c in COLUMNAS_GEO}})
+    df_fact = df_fact.astype({'id_tiempo': tipo_tiempo, 'id_geo': tipo_geo,
+                              **{c: 'float32' for c in COLUMNAS_HECHOS}})
+    return dim_tiempo, dim_geo, df_fact
+
+
+# ===================================================================
+# Función: agregar
+# ===================================================================
+def agregar(claves: list, metricas: list = COLUMNAS_HECHOS, ruta: str = RUTA_DB) -> pd.DataFrame:
+    """
+    Promedia las métricas por `claves` × año directamente en SQLite.
+
+    Args:
+        claves (list): Columnas de la dimensión geográfica (p. ej. ['departamento']).
+        metricas (list): Columnas de la tabla de hechos a promediar.
+        ruta (str): Archivo SQLite.
+
+    Returns:
+        pd.DataFrame: Resultado indexado por `claves` + ['a_o'].
+    """
+    columnas_validas = set(COLUMNAS_GEO) | set(COLUMNAS_HECHOS)
+    if not set(claves) | set(metricas) <= columnas_validas:
+        raise ValueError(f"Columnas no válidas: {set(claves) | set(metricas) - columnas_validas}")
+
+    grupo = ", ".join(f"g.{c}" for c in claves)
+    promedios = ", ".join(f"AVG(h.{m}) AS {m}" for m in metricas)
+    sql = f"""
+        SELECT {grupo}, t.a_o, {promedios}
+        FROM {TABLA_HECHOS} h
+        JOIN {TABLA_GEO} g ON g.id_geo = h.id_geo
+        JOIN {TABLA_TIEMPO} t ON t.id_tiempo = h.id_tiempo
+        GROUP BY {grupo}, t.a_o
+        ORDER BY {grupo}, t.a_o
+    """
+    with _conectar(ruta) as con:
+        resultado = pd.read_sql_query(sql, con)
+    resultado = resultado.astype({'a_o': 'int16', **{m: 'float32' for m in metricas}})
+    return resultado.set_index(claves + ['a_o'])
+
+
+# ===================================================================
+# Función: guardar_cubos
+# ===================================================================
+def guardar_cubos(cubos: dict, version: str, ruta: str = RUTA_DB) -> None:
+    """
+    Guarda los cubos de la capa analítica (promedios por nivel × año) para que
+    la app los lea ya calculados.
+
+    Args:
+        cubos (dict): {nivel: DataFrame indexado por las llaves del nivel + ['a_o']}.
+        version (str): Versión del modelo del que salen (hash de la tabla de hechos).
+        ruta (str): Archivo SQLite; debe tener ya el modelo (`guardar_modelo`).
+    """
+    with _conectar(ruta) as con:
+        with con:
+            con.execute("BEGIN")
+            for nivel, cubo in cubos.items():
+                tabla = TABLA_CUBO.format(nivel=nivel)
+                llaves = [c for c in cubo.index.names if c != 'a_o']
+                metricas = list(cubo.columns)
+                con.execute(f"DROP TABLE IF EXISTS {tabla}")
+                con.execute(f"""
+                    CREATE TABLE {tabla} (
+                        {", ".join(f"{c} TEXT NOT NULL" for c in llaves)},
+                        a_o INTEGER NOT NULL,
+                        {", ".join(f"{m} REAL" for m in metricas)},
+                        PRIMARY KEY ({", ".join(llaves)}, a_o)
+                    ) WITHOUT ROWID
+                """)
+                filas = cubo.reset_index().astype({**{c: str for c in llaves}, 'a_o': 'int64'}) \
+                    .astype({m: 'float64' for m in metricas})
+                filas = filas.astype(object).where(filas.notna(), None)
+                con.executemany(
+                    f"INSERT INTO {tabla} VALUES ({', '.join('?' * (len(llaves) + 1 + len(metricas)))})",
+                    filas[llaves + ['a_o'] + metricas].itertuples(index=False, name=None)
+                )
+            con.execute(f"INSERT OR REPLACE INTO {TABLA_META} VALUES ('version_cubos', ?)", (version,))
+
+
+# ===================================================================
+# Función: cargar_cubos
+# ===================================================================
+def cargar_cubos(niveles: dict, version: str, ruta: str = RUTA_DB) -> dict | None:
+    """
+    Lee los cubos guardados con `guardar_cubos` si corresponden a `version`.
+
+    Args:
+        niveles (dict): {nivel: llaves}, p. ej. `capa_analitica.NIVELES_CUBO`.
+        version (str): Versión del modelo que se está usando.
+        ruta (str): Archivo SQLite.
+
+    Returns:
+        dict | None: {nivel: DataFrame indexado por llaves + ['a_o']}, o None si
+        no hay cubos de esta versión o falta alguno de los niveles.
+    """
+    if not os.path.exists(ruta):
+        return None
+    with _conectar(ruta) as con:
+        try:
+            fila = con.execute(f"SELECT valor FROM {TABLA_META} WHERE clave = 'version_cubos'").fetchone()
+            if not fila or fila[0] != version:
+                return None
+            cubos = {}
+            for nivel, llaves in niveles.items():
+                orden = ", ".join(llaves + ['a_o'])
+                cubo = pd.read_sql_query(f"SELECT * FROM {TABLA_CUBO.format(nivel=nivel)} ORDER BY {orden}", con)
+                metricas = [c for c in cubo.columns if c not in llaves + ['a_o']]
+                cubos[nivel] = cubo.astype({'a_o': 'int16', **{m: 'float32' for m in metricas}}) \
+                    .set_index(llaves + ['a_o'])
+        except sqlite3.OperationalError:
+            return None
+    return cubos
+
+
+# ===================================================================
+# Función: guardar_indicadores
+# ===================================================================
+def guardar_indicadores(tabla: pd.DataFrame, version: str, ruta: str = RUTA_DB) -> bool:
+    """
+    Guarda el almacén de indicadores (`modelo.crear_indicadores`) con
+    diccionario: cada (indicador, nivel) se guarda una vez en
+    `TABLA_DICCIONARIO` y los valores solo llevan su id.
+
+    Args:
+        tabla (pd.DataFrame): Tabla larga ordenada por indicador, nivel, año y municipio.
+        version (str): Versión del modelo del que sale (hash de la tabla de hechos).
+        ruta (str): Archivo SQLite; debe tener ya el modelo (`guardar_modelo`).
+
+    Returns:
+        bool: True si se escribió, False si ya estaba guardada esta versión.
+    """
+    if _version_indicadores(ruta) == version:
+        return False
+
+    # Las filas vienen agrupadas por (indicador, nivel): el id crece en el mismo orden
+    codigos = tabla['indicador'].cat.codes.to_numpy().astype(np.int64) * len(CATEGORIAS_NIVEL.categories) \
+        + tabla['nivel'].cat.codes.to_numpy()
+    nuevo_par = np.diff(codigos, prepend=-1) != 0
+    ids = nuevo_par.cumsum()
+    diccionario = pd.DataFrame({
+        'id_indicador': ids[nuevo_par],
+        'indicador': tabla['indicador'].to_numpy()[nuevo_par].astype(str),
+        'nivel': tabla['nivel'].to_numpy()[nuevo_par].astype(str),
+    })
+    # Columnas como listas de Python: con ~500 mil filas tarda la mitad que con itertuples
+    filas = zip(ids.tolist(), tabla['id_tiempo'].to_numpy().tolist(), tabla['id_geo'].to_numpy().tolist(),
+                tabla['valor'].to_numpy(dtype='float64').tolist())
+
+    with _conectar(ruta) as con:
+        with con:
+            con.executescript(f"""
+                BEGIN;
+                DROP TABLE IF EXISTS {TABLA_INDICADORES};
+                DROP TABLE IF EXISTS {TABLA_DICCIONARIO};
+                CREATE TABLE {TABLA_DICCIONARIO} (
+                    id_indicador INTEGER PRIMARY KEY,
+                    indicador TEXT NOT NULL,
+                    nivel TEXT NOT NULL,
+                    UNIQUE (indicador, nivel)
+                );
+                -- Agrupada por serie: leer un indicador y nivel es un rango de la llave primaria
+                CREATE TABLE {TABLA_INDICADORES} (
+                    id_indicador INTEGER NOT NULL REFERENCES {TABLA_DICCIONARIO}(id_indicador),
+                    id_tiempo INTEGER NOT NULL REFERENCES {TABLA_TIEMPO}(id_tiempo),
+                    id_geo INTEGER NOT NULL REFERENCES {TABLA_GEO}(id_geo),
+                    valor REAL NOT NULL,
+                    PRIMARY KEY (id_indicador, id_tiempo, id_geo)
+                ) WITHOUT ROWID;
+            """)
+            con.executemany(f"INSERT INTO {TABLA_DICCIONARIO} VALUES (?, ?, ?)",
+                            diccionario.astype({'id_indicador': 'int64'}).itertuples(index=False, name=None))
+            con.executemany(f"INSERT INTO {TABLA_INDICADORES} VALUES (?, ?, ?, ?)", filas)
+            con.execute(f"INSERT OR REPLACE INTO {TABLA_META} VALUES ('version_indicadores', ?)", (version,))
+    return True
+
+
+def _version_indicadores(ruta: str) -> str | None:
+    if not os.path.exists(ruta):
+        return None
+    with _conectar(ruta) as con:
+        try:
+            fila = con.execute(f"SELECT valor FROM {TABLA_META} WHERE clave = 'version_indicadores'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return fila[0] if fila else None
+
+
+# ===================================================================
+# Función: cargar_indicadores
+# ===================================================================
+def cargar_indicadores(version: str, ruta: str = RUTA_DB) -> pd.DataFrame | None:
+    """
+    Lee el almacén de indicadores guardado con `guardar_indicadores` si
+    corresponde a `version`.
+
+    Returns:
+        pd.DataFrame | None: La tabla larga con los tipos de
+        `indicadores.tabla_larga` (lista para `indicadores.indexar`), o None
+        si no hay almacén de esta versión.
+    """
+    if _version_indicadores(ruta) != version:
+        return None
+    with _conectar(ruta) as con:
+        try:
+            diccionario = pd.read_sql_query(f"SELECT * FROM {TABLA_DICCIONARIO} ORDER BY id_indicador", con)
+            filas = pd.read_sql_query(
+                f"SELECT * FROM {TABLA_INDICADORES} ORDER BY id_indicador, id_tiempo, id_geo", con
+            )
+            tiempos, municipios = con.execute(
+                f"SELECT (SELECT COUNT(*) FROM {TABLA_TIEMPO}), (SELECT COUNT(*) FROM {TABLA_GEO})"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    # Del id al código de cada categoría, sin pasar las filas por texto
+    pos = pd.Index(diccionario['id_indicador']).get_indexer(filas['id_indicador'])
+    cod_indicador = CATEGORIAS_INDICADOR.categories.get_indexer(diccionario['indicador'])[pos]
+    cod_nivel = CATEGORIAS_NIVEL.categories.get_indexer(diccionario['nivel'])[pos]
+    # Un indicador o nivel que ya no está en el catálogo se descarta; si el
+    # catálogo cambió de orden, las series se reordenan para seguir contiguas
+    conocidas = np.flatnonzero((cod_indicador >= 0) & (cod_nivel >= 0))
+    conocidas = conocidas[np.argsort(cod_indicador[conocidas] * len(CATEGORIAS_NIVEL.categories)
+                                     + cod_nivel[conocidas], kind='stable')]
+    return pd.DataFrame({
+        'indicador': pd.Categorical.from_codes(cod_indicador[conocidas], dtype=CATEGORIAS_INDICADOR),
+        'nivel': pd.Categorical.from_codes(cod_nivel[conocidas], dtype=CATEGORIAS_NIVEL),
+        'id_tiempo': filas['id_tiempo'].to_numpy()[conocidas].astype(tipo_id(tiempos)),
+        'id_geo': filas['id_geo'].to_numpy()[conocidas].astype(tipo_id(municipios)),
+        'valor': filas['valor'].to_numpy()[conocidas].astype('float32'),
+    })
@@ -7,27 +7,63 @@ from mapa import show_map_tab
 from evolucion import show_tab as show_evolucion_tab
 from comparativo import show_tab as show_comparativo_tab
 from cumplimiento_educativo import show_tab as show_riesgo_tab
+from almacen_sqlite import cargar_modelo, version_guardada
+from almacen_memoria import publicar
+from emparejamiento import enriquecer_dim_geo
+from instrumentacion import iniciar, mostrar_panel, terminar, tramo
+from precarga import esperar, iniciar_precarga, mostrar_precarga, recargar
 
-# Agregar nueva pestaña
-tabs = st.tabs([
-    "📥 Carga de Datos", 
-    "🔧 Transformación y Métricas", 
-    "📊 Visualizaciones", 
-    "🗺️ Mapa", 
-    "📊 Comparativo", 
-    "📉 Desempeño y Riesgo Educativo"
-])
-
-with tabs[0]:
-    show_data_tab()
-with tabs[1]:
-    show_transform_tab()
-with tabs[2]:
-    show_visualization_tab()
-with tabs[3]:
-    show_map_tab()
-with tabs[4]:
-    show_comparativo_tab()  # así deberías llamar al módulo comparativo
-with tabs[5]:
-    show_riesgo_tab()
+
+def _modelo_guardado():
+    # Se lee de SQLite y se enriquece una sola vez por versión, para todas las sesiones
+    dim_tiempo, dim_geo, df_fact = cargar_modelo()
+    try:
+        dim_geo = enriquecer_dim_geo(dim_geo)
+    except (OSError, ValueError):
+        # Sin DIVIPOLA el modelo sirve igual; la pestaña de transformación muestra el error
+        pass
+    return {'dim_tiempo': dim_tiempo, 'dim_geo': dim_geo, 'df_fact': df_fact}
+
+
+def show_carga_tab():
+    # La pestaña de carga recibe la precarga en vez de importarla (la precarga usa cargar_datos)
+    show_data_tab(esperar, recargar)
+
+
+# Tiempos y memoria por pestaña en la barra lateral (solo con ?perfil=1 o DIPLOMADO_PERFIL)
+iniciar()
+
+# Las cuatro fuentes (MEN, DIVIPOLA y los dos libros del DANE) se cargan a la vez en
+# segundo plano mientras se dibuja la primera pantalla; las pestañas las esperan
+iniciar_precarga()
+
+# Si ya hay un modelo guardado, las pestañas de análisis funcionan sin recargar datos.
+# La sesión guarda solo una manija a la versión compartida del almacén en memoria
+if 'modelo' not in st.session_state:
+    version = version_guardada()
+    if version is not None:
+        with tramo("modelo guardado"):
+            st.session_state['modelo'] = publicar(version, _modelo_guardado)
+
+# Una página por sección: en cada rerun solo se ejecuta la que se está viendo
+paginas = [
+    st.Page(show_carga_tab, title="Carga de Datos", icon="📥", url_path="carga", default=True),
+    st.Page(show_transform_tab, title="Transformación y Métricas", icon="🔧", url_path="transformacion"),
+    st.Page(show_visualization_tab, title="Visualizaciones", icon="📊", url_path="visualizaciones"),
+    st.Page(show_map_tab, title="Mapa", icon="🗺️", url_path="mapa"),
+    st.Page(show_evolucion_tab, title="Evolución", icon="📈", url_path="evolucion"),
+    st.Page(show_comparativo_tab, title="Comparativo", icon="📊", url_path="comparativo"),
+    st.Page(show_riesgo_tab, title="Desempeño y Riesgo Educativo", icon="📉", url_path="riesgo"),
+]
+pagina = st.navigation(paginas, position="top")
+mostrar_precarga()
+
+try:
+    with tramo(f"{pagina.icon} {pagina.title}"):
+        pagina.run()
+finally:
+    # st.rerun() y st.stop() cortan el script: el rastreo de memoria se suelta igual
+    terminar()
+
+mostrar_panel()
 
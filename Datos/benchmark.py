@@ -0,0 +1,380 @@
+"""
+Benchmark de las etapas del modelo con datos sintéticos a escala del MEN.
+
+Genera tablas con la forma de `educacion_raw` a 1x, 10x, 100x y 1000x las
+filas reales, mide tiempo y memoria de cada etapa por separado y agrega los
+resultados a un archivo JSON Lines, para comparar una corrida con otra.
+
+Uso (desde la raíz del repositorio):
+    python Datos/benchmark.py
+    python Datos/benchmark.py --escalas 1 10 --repeticiones 5
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+
+from modelo import COLUMNAS_TEXTO, crear_dim_geo, crear_dimension, crear_hechos, crear_indicadores, \
+    limpiar_datos, normalizar_columnas
+from cargar_datos import COLUMNAS_TRANSFORMACION, leer_csv
+from validacion import REGLAS
+from almacen_sqlite import RUTA_DB
+from capa_analitica import NIVELES_CUBO, construir_cubo, construir_vista
+import geometria
+import proyecciones
+
+ESCALAS = [1, 10, 100, 1000]
+RUTA_RESULTADOS = os.path.join("Datos", "benchmarks", "resultados.jsonl")
+
+# Tabla con la descarga original del MEN, base de los datos sintéticos
+TABLA_BASE = "educacion_raw"
+
+# Variación relativa de las métricas en las copias sintéticas
+RUIDO = 0.05
+
+# Los códigos de municipio de las copias no son códigos DIVIPOLA de 5 dígitos:
+# en la limpieza solo se exige que estén presentes
+REGLAS_SINTETICAS = {**REGLAS, 'c_digo_municipio': {'tipo': 'texto', 'requerida': True}}
+
+# Extensión aproximada de Colombia (lon/lat) para las capas sintéticas
+EXTENSION = (-79.0, -4.2, -66.8, 12.5)
+MUNICIPIOS_SINTETICOS = 1123
+DEPARTAMENTOS_SINTETICOS = 33
+
+
+# ===================================================================
+# Función: datos_base
+# ===================================================================
+def datos_base(columnas: list | None = COLUMNAS_TRANSFORMACION, ruta_db: str = RUTA_DB) -> pd.DataFrame:
+    """
+    Lee los datos reales del MEN con los tipos que entrega la API.
+
+    Se usa `educacion_raw` de la base SQLite y, si no está, el CSV incluido.
+
+    Args:
+        columnas (list | None): Columnas a conservar; por defecto las que
+            descarga la app. None conserva las 41 del dataset.
+        ruta_db (str): Base SQLite con `TABLA_BASE`.
+    """
+    try:
+        with sqlite3.connect(ruta_db) as con:
+            df = pd.read_sql_query(f"SELECT * FROM {TABLA_BASE}", con)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return leer_csv(columnas=columnas)
+    df = df[columnas] if columnas else df
+    for col in df.columns:
+        if col not in COLUMNAS_TEXTO:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+# ===================================================================
+# Función: generar
+# ===================================================================
+def generar(base: pd.DataFrame, escala: int, semilla: int = 0) -> pd.DataFrame:
+    """
+    Repite `base` `escala` veces como si fueran municipios distintos.
+
+    La copia 0 es la original. En las demás, el nombre del municipio lleva el
+    número de copia, el código de municipio se desplaza en múltiplos de
+    100000 y las métricas varían ±`RUIDO`; departamentos y años no cambian,
+    así que cada año y cada departamento crecen `escala` veces. Los textos
+    son object, como en la API, pero comparten los objetos str entre filas.
+
+    Returns:
+        pd.DataFrame: `len(base) * escala` filas con las columnas de `base`.
+    """
+    n = len(base)
+    rng = np.random.default_rng(semilla)
+    filas = np.tile(np.arange(n), escala)
+    copia = np.repeat(np.arange(escala), n)
+
+    # Columna por columna y sin consolidar: a 1000x cada copia intermedia pesa cientos de MB
+    df = pd.DataFrame(index=pd.RangeIndex(len(filas)))
+    for col in base.columns:
+        valores = base[col]
+        if col == 'municipio':
+            codigos, nombres = pd.factorize(valores)
+            sufijos = [nombres.astype(str)] + [nombres.astype(str) + f" {j}" for j in range(1, escala)]
+            nombres = np.concatenate(sufijos).astype(object)
+            df[col] = nombres[codigos[filas] + copia * len(sufijos[0])]
+        elif col == 'c_digo_municipio':
+            codigos, unicos = pd.factorize(valores)
+            numeros = pd.to_numeric(pd.Series(unicos), errors='coerce').to_numpy()
+            desplazados = numeros[codigos[filas]] + copia * 100_000
+            textos, posiciones = np.unique(desplazados, return_inverse=True)
+            df[col] = np.array([str(int(t)) for t in textos], dtype=object)[posiciones]
+        elif col in COLUMNAS_TEXTO or valores.dtype == object:
+            df[col] = valores.to_numpy(dtype=object)[filas]
+        elif col == 'a_o':
+            df[col] = valores.to_numpy()[filas]
+        else:
+            metrica = valores.to_numpy(dtype='float64')[filas]
+            metrica[n:] *= rng.normal(1.0, RUIDO, len(filas) - n)
+            df[col] = metrica
+    return df
+
+
+# ===================================================================
+# Función: medir
+# ===================================================================
+def medir(funcion, repeticiones: int = 3) -> tuple:
+    """
+    Mide una etapa: el menor tiempo y la mediana de `repeticiones` llamadas,
+    y el pico de memoria asignada (tracemalloc) en una llamada adicional.
+
+    Los resultados de las llamadas cronometradas se descartan enseguida; el
+    que se devuelve es el de la llamada con tracemalloc, así que nunca hay dos
+    copias vivas del resultado (importa en las escalas grandes).
+
+    Returns:
+        tuple: (resultado de la etapa, dict con 'segundos', 'segundos_mediana'
+        y 'pico_mb').
+    """
+    tiempos = []
+    for _ in range(max(repeticiones, 1)):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    # Medir memoria aparte: tracemalloc hace más lenta la etapa
+    tracemalloc.start()
+    resultado = funcion()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, {
+        'segundos': min(tiempos),
+        'segundos_mediana': statistics.median(tiempos),
+        'pico_mb': pico / 2**20,
+    }
+
+
+def etapas_modelo(df_raw: pd.DataFrame, repeticiones: int):
+    """
+    Recorre las etapas del modelo y de la capa analítica sobre `df_raw`,
+    entregando (etapa, medición) a medida que termina cada una.
+    """
+    df_clean, m = medir(lambda: limpiar_datos(normalizar_columnas(df_raw), reglas=REGLAS_SINTETICAS), repeticiones)
+    yield 'limpieza', m
+    dim_tiempo, m = medir(lambda: crear_dimension(df_clean, ['a_o'], 'tiempo'), repeticiones)
+    yield 'dim_tiempo', m
+    dim_geo, m = medir(lambda: crear_dim_geo(df_clean), repeticiones)
+    yield 'dim_geo', m
+    df_fact, m = medir(lambda: crear_hechos(df_clean, dim_tiempo, dim_geo), repeticiones)
+    yield 'hechos', m
+    _, m = medir(lambda: crear_indicadores(df_clean, dim_tiempo, dim_geo), repeticiones)
+    yield 'indicadores', m
+    # Lo que comparten las pestañas: la vista ancha y un cubo por nivel
+    vista, m = medir(lambda: construir_vista(df_fact, dim_geo, dim_tiempo), repeticiones)
+    yield 'vista', m
+    for nivel, claves in NIVELES_CUBO.items():
+        _, m = medir(lambda: construir_cubo(vista, claves), repeticiones)
+        yield f'cubo_{nivel}', m
+
+
+def _cobertura_sintetica(n: int, codigo: str, nombre: str, digitos: int, ruta: str) -> str:
+    """
+    Escribe un shapefile con `n` celdas que cubren `EXTENSION` sin huecos,
+    con los campos de código y nombre del MGN.
+    """
+    columnas = int(np.ceil(np.sqrt(n)))
+    filas = int(np.ceil(n / columnas))
+    x0, y0, x1, y1 = EXTENSION
+    ancho, alto = (x1 - x0) / columnas, (y1 - y0) / filas
+    celdas = [
+        box(x0 + (i % columnas) * ancho, y0 + (i // columnas) * alto,
+            x0 + (i % columnas + 1) * ancho, y0 + (i // columnas + 1) * alto)
+        for i in range(n)
+    ]
+    gdf = gpd.GeoDataFrame(
+        {codigo: [str(i + 1).zfill(digitos) for i in range(n)], nombre: [f"Celda {i + 1}" for i in range(n)]},
+        geometry=gpd.GeoSeries(celdas).segmentize(min(ancho, alto) / 40),
+        crs="EPSG:4326",
+    )
+    gdf.to_file(ruta)
+    return ruta
+
+
+def etapas_fijas(repeticiones: int, carpeta: str):
+    """
+    Etapas que no dependen del tamaño del MEN: lectura de las proyecciones del
+    DANE (en frío desde Excel y desde la caché) y construcción de la
+    geometría de los mapas. Sin los shapefiles del MGN se usan capas
+    sintéticas con el mismo número de departamentos y municipios.
+    """
+    if all(os.path.exists(r) for r in proyecciones.LIBROS.values()):
+        cache_original = proyecciones.CACHE_DIR
+        proyecciones.CACHE_DIR = os.path.join(carpeta, "dane")
+        try:
+            def en_frio():
+                proyecciones._EN_MEMORIA.clear()
+                if os.path.isdir(proyecciones.CACHE_DIR):
+                    for nombre in os.listdir(proyecciones.CACHE_DIR):
+                        os.remove(os.path.join(proyecciones.CACHE_DIR, nombre))
+                return proyecciones.cargar_proyecciones()
+
+            def desde_cache():
+                proyecciones._EN_MEMORIA.clear()
+                return proyecciones.cargar_proyecciones()
+
+            # Los libros se leen en procesos aparte: su memoria no entra en pico_mb
+            yield 'dane_excel', {}, medir(en_frio, repeticiones)[1]
+            yield 'dane_cache', {}, medir(desde_cache, repeticiones)[1]
+        finally:
+            proyecciones.CACHE_DIR = cache_original
+            proyecciones._EN_MEMORIA.clear()
+
+    capas = [
+        ('geojson_departamentos', geometria.RUTA_DEPARTAMENTOS, geometria.construir_capas,
+         DEPARTAMENTOS_SINTETICOS, geometria.CODIGO_DEPARTAMENTO, geometria.NOMBRE_DEPARTAMENTO, 2),
+        ('topojson_municipios', geometria.RUTA_MUNICIPIOS, geometria.construir_topologias,
+         MUNICIPIOS_SINTETICOS, geometria.CODIGO_MUNICIPIO, geometria.NOMBRE_MUNICIPIO, 5),
+    ]
+    for etapa, ruta, construir, n, codigo, nombre, digitos in capas:
+        origen = 'mgn'
+        if not all(os.path.exists(os.path.splitext(ruta)[0] + ext) for ext in geometria.COMPONENTES):
+            origen = 'sintetica'
+            ruta = _cobertura_sintetica(n, codigo, nombre, digitos, os.path.join(carpeta, f"{etapa}.shp"))
+        yield etapa, {'geometria': origen}, medir(lambda: construir(ruta), repeticiones)[1]
+
+
+def _escribir(registro: dict, ruta: str) -> None:
+    # Se escribe por etapa: una corrida interrumpida conserva lo ya medido
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    escala = str(registro['escala'] or '-')
+    if 'error' in registro:
+        print(f"{escala:>5}  ❌ {registro['error']}")
+    else:
+        print(f"{escala:>5}  {registro['etapa']:<24} {registro['segundos']:9.4f} s  {registro['pico_mb']:9.1f} MB",
+              flush=True)
+
+
+def _medir_escala(base: pd.DataFrame, escala: int, repeticiones: int, corrida: dict, ruta: str) -> None:
+    df_raw = generar(base, escala)
+    for etapa, medicion in etapas_modelo(df_raw, repeticiones):
+        _escribir({**corrida, 'escala': escala, 'filas': len(df_raw), 'etapa': etapa, **medicion}, ruta)
+
+
+def _entorno() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+# ===================================================================
+# Función: ejecutar
+# ===================================================================
+def ejecutar(escalas: list = ESCALAS, repeticiones: int = 3, columnas: list | None = COLUMNAS_TRANSFORMACION,
+             fijas: bool = True, ruta: str = RUTA_RESULTADOS) -> list:
+    """
+    Corre el benchmark y agrega sus registros a `ruta` (JSON Lines).
+
+    Cada registro es una etapa en una escala, con la identificación de la
+    corrida (fecha, commit y versiones), 'filas', 'segundos' (mínimo),
+    'segundos_mediana', 'repeticiones' y 'pico_mb'. Las etapas fijas llevan
+    escala null; una escala que no alcanzó a terminar deja un registro con
+    'error'.
+
+    Returns:
+        list: Los registros de esta corrida.
+    """
+    corrida = {'corrida': time.strftime("%Y-%m-%dT%H:%M:%S"), **_entorno(), 'repeticiones': repeticiones}
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    base = datos_base(columnas)
+    for escala in escalas:
+        # Cada escala en un proceso aparte: la memoria se devuelve al terminar y,
+        # si el sistema lo mata por falta de memoria, se anota y se sigue
+        try:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                pool.submit(_medir_escala, base, escala, repeticiones, corrida, ruta).result()
+        except BrokenProcessPool:
+            _escribir({**corrida, 'escala': escala, 'filas': len(base) * escala, 'etapa': None,
+                       'error': "el proceso terminó sin completar la escala (¿memoria insuficiente?)"}, ruta)
+
+    if fijas:
+        with tempfile.TemporaryDirectory() as carpeta:
+            for etapa, extra, medicion in etapas_fijas(repeticiones, carpeta):
+                _escribir({**corrida, 'escala': None, 'filas': None, 'etapa': etapa, **medicion, **extra}, ruta)
+
+    historial = pd.read_json(ruta, lines=True, dtype=False)
+    return historial[historial['corrida'] == corrida['corrida']].to_dict('records')
+
+
+# ===================================================================
+# Función: comparar
+# ===================================================================
+def comparar(registros: list, ruta: str = RUTA_RESULTADOS) -> pd.DataFrame | None:
+    """
+    Compara los tiempos de `registros` con la corrida anterior guardada en `ruta`.
+
+    Returns:
+        pd.DataFrame | None: 'segundos' de ambas corridas por etapa y escala y
+        su razón (anterior / actual: > 1 es mejora), o None si no hay corrida anterior.
+    """
+    historial = pd.read_json(ruta, lines=True, dtype=False)
+    if not registros or 'segundos' not in historial:
+        return None
+    historial = historial.dropna(subset=['segundos'])
+    corrida = registros[0]['corrida']
+    anteriores = historial[historial['corrida'] < corrida]
+    if anteriores.empty:
+        return None
+    anterior = anteriores[anteriores['corrida'] == anteriores['corrida'].max()]
+    actual = pd.DataFrame(registros).dropna(subset=['segundos'])
+    claves = ['etapa', 'escala']
+    tabla = actual[claves + ['segundos']].merge(
+        anterior[claves + ['segundos']], on=claves, suffixes=('', '_anterior')
+    )
+    tabla['escala'] = tabla['escala'].astype('Int64')
+    tabla['razon'] = tabla['segundos_anterior'] / tabla['segundos']
+    return tabla
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Mide tiempo y memoria de las etapas del modelo con datos sintéticos.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=ESCALAS,
+                        help="Múltiplos de las filas reales del MEN (por defecto: 1 10 100 1000)")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Llamadas por etapa para el tiempo")
+    parser.add_argument("--todas-las-columnas", action="store_true",
+                        help="Generar las 41 columnas del dataset, no solo las que descarga la app")
+    parser.add_argument("--sin-fijas", action="store_true", help="Omitir DANE y geometría")
+    parser.add_argument("--salida", default=RUTA_RESULTADOS, help=f"Archivo JSON Lines (por defecto: {RUTA_RESULTADOS})")
+    args = parser.parse_args(argv)
+
+    columnas = None if args.todas_las_columnas else COLUMNAS_TRANSFORMACION
+    registros = ejecutar(args.escalas, args.repeticiones, columnas, not args.sin_fijas, args.salida)
+    print(f"📄 {len(registros)} registros agregados a {args.salida}")
+
+    tabla = comparar(registros, args.salida)
+    if tabla is not None:
+        print("\nFrente a la corrida anterior (razón > 1 = más rápido):")
+        print(tabla.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Caché acotada que descarta el elemento usado hace más tiempo.
+
+    Las cachés por versión de los módulos (modelos, capas, consultas,
+    figuras, tendencias) se comparten entre las sesiones de Streamlit, que
+    corren en hilos distintos: cada operación toma el candado de la caché.
+    El valor se calcula fuera del candado, así que dos sesiones pueden
+    calcular a la vez el mismo; se queda el último que se guarda.
+
+    Uso:
+        figura = _FIGURAS.obtener(clave)
+        if figura is None:
+            figura = _FIGURAS.guardar(clave, construir())
+    """
+
+    def __init__(self, maximo: int):
+        self.maximo = maximo
+        self._datos: OrderedDict = OrderedDict()
+        self._candado = threading.Lock()
+
+    def obtener(self, clave, defecto=None):
+        """
+        Devuelve el valor de `clave` (o `defecto`) y lo marca como usado.
+        """
+        with self._candado:
+            if clave not in self._datos:
+                return defecto
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def guardar(self, clave, valor):
+        """
+        Guarda `valor`, descarta el más antiguo si se supera `maximo` y devuelve `valor`.
+        """
+        with self._candado:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return valor
+
+    def descartar(self, condicion) -> None:
+        """
+        Quita las entradas cuya clave cumple `condicion(clave)`.
+        """
+        with self._candado:
+            for clave in [c for c in self._datos if condicion(c)]:
+                del self._datos[clave]
+
+    def __contains__(self, clave) -> bool:
+        with self._candado:
+            return clave in self._datos
+
+    def __len__(self) -> int:
+        with self._candado:
+            return len(self._datos)
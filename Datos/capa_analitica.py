@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from modelo import COLUMNAS_HECHOS, crear_indicadores, version_modelo
+from cache_lru import CacheLRU
+from almacen_sqlite import agregar, cargar_cubos, cargar_indicadores, version_guardada
+from indicadores import indexar
+from instrumentacion import tramo
+
+# Niveles de agregación del cubo; todos se cruzan con el año
+NIVELES_CUBO = {
+    'departamento': ['departamento'],
+    'municipio': ['departamento', 'municipio'],
+    'c_digo_departamento': ['c_digo_departamento'],
+    'c_digo_municipio': ['c_digo_municipio'],
+}
+
+MAX_CAPAS = 4
+_CAPAS = CacheLRU(MAX_CAPAS)
+_INDICADORES = CacheLRU(MAX_CAPAS)
+
+
+# ===================================================================
+# Función: construir_vista
+# ===================================================================
+def construir_vista(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve la tabla de hechos con las columnas de las dimensiones (vista ancha).
+
+    Las dimensiones se ubican por id con `get_indexer` y sus columnas se toman
+    por posición, sin `merge`.
+    """
+    pos_geo = pd.Index(dim_geo['id_geo']).get_indexer(df_fact['id_geo'])
+    pos_tiempo = pd.Index(dim_tiempo['id_tiempo']).get_indexer(df_fact['id_tiempo'])
+
+    vista = df_fact.reset_index(drop=True)
+    for col in dim_geo.columns.drop('id_geo'):
+        vista[col] = dim_geo[col].array.take(pos_geo)
+    for col in dim_tiempo.columns.drop('id_tiempo'):
+        vista[col] = dim_tiempo[col].array.take(pos_tiempo)
+    return vista
+
+
+# ===================================================================
+# Función: construir_cubo
+# ===================================================================
+def construir_cubo(vista: pd.DataFrame, claves: list) -> pd.DataFrame:
+    """
+    Promedio de cada indicador por `claves` × año, indexado para consultar con `.loc`.
+    """
+    return vista.groupby(claves + ['a_o'], observed=True)[COLUMNAS_HECHOS].mean().sort_index()
+
+
+# ===================================================================
+# Función: construir_tensor
+# ===================================================================
+def construir_tensor(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> dict:
+    """
+    Arma los indicadores como un arreglo denso municipio × año × indicador.
+
+    Los municipios se ordenan por (departamento, municipio), así que cada
+    departamento ocupa un rango contiguo del primer eje y sus series son una
+    vista del arreglo, sin copiar. Las combinaciones sin dato quedan en NaN.
+
+    Returns:
+        dict: Con las llaves
+            - 'valores': np.ndarray float32 de forma (municipios, años, indicadores).
+            - 'geo': dim_geo en el orden del primer eje.
+            - 'años': np.ndarray con los años del segundo eje, ascendentes.
+            - 'metricas': {indicador: posición en el tercer eje} (`COLUMNAS_HECHOS`).
+            - 'departamentos': {departamento: slice de sus municipios en el primer eje}.
+    """
+    orden = np.lexsort((dim_geo['municipio'].astype(str), dim_geo['departamento'].astype(str)))
+    geo = dim_geo.iloc[orden].reset_index(drop=True)
+    tiempo = dim_tiempo.sort_values('a_o', ignore_index=True)
+
+    pos_geo = pd.Index(geo['id_geo']).get_indexer(df_fact['id_geo'])
+    pos_tiempo = pd.Index(tiempo['id_tiempo']).get_indexer(df_fact['id_tiempo'])
+    valores = np.full((len(geo), len(tiempo), len(COLUMNAS_HECHOS)), np.nan, dtype=np.float32)
+    valores[pos_geo, pos_tiempo] = df_fact[COLUMNAS_HECHOS].to_numpy(dtype=np.float32)
+
+    deptos, inicios = np.unique(geo['departamento'].astype(str).to_numpy(), return_index=True)
+    fines = np.append(inicios[1:], len(geo))
+    return {
+        'valores': valores,
+        'geo': geo,
+        'años': tiempo['a_o'].to_numpy(),
+        'metricas': {col: i for i, col in enumerate(COLUMNAS_HECHOS)},
+        'departamentos': {d: slice(int(i), int(f)) for d, i, f in zip(deptos, inicios, fines)},
+    }
+
+
+# ===================================================================
+# Función: serie_departamento
+# ===================================================================
+def serie_departamento(tensor: dict, metrica: str, departamento: str) -> np.ndarray:
+    """
+    Devuelve la matriz municipio × año de un indicador en un departamento.
+
+    Es una vista sobre `tensor['valores']` (no se copia ni debe modificarse);
+    sus filas son `tensor['geo']` en el rango del departamento.
+    """
+    return tensor['valores'][tensor['departamentos'][departamento], :, tensor['metricas'][metrica]]
+
+
+# ===================================================================
+# Función: top_k
+# ===================================================================
+def top_k(valores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones de los `k` valores más altos, de mayor a menor, ignorando NaN.
+
+    Con `argpartition` solo se ordenan los `k` elegidos, no todo el arreglo.
+    """
+    validas = np.flatnonzero(~np.isnan(valores))
+    if len(validas) > k:
+        validas = validas[np.argpartition(-valores[validas], k - 1)[:k]]
+    return validas[np.argsort(-valores[validas], kind='stable')]
+
+
+# ===================================================================
+# Función: obtener_capa
+# ===================================================================
+def obtener_capa(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> dict:
+    """
+    Devuelve la capa materializada que comparten las pestañas.
+
+    Se construye una sola vez por versión de la tabla de hechos (memoizada por
+    hash). Si esa versión ya está guardada en SQLite, los cubos se leen de las
+    tablas materializadas (`guardar_cubos`, p. ej. por el ETL) o, si no están,
+    se calculan con GROUP BY sobre la base en vez de pandas. Contiene:
+        - 'vista': hechos unidos con dim_geo y dim_tiempo.
+        - un cubo por cada nivel de `NIVELES_CUBO` (p. ej. 'departamento'),
+          con el promedio de los indicadores por nivel × año.
+        - 'tensor': los indicadores por municipio × año (`construir_tensor`).
+
+    Los DataFrames y el tensor se comparten entre sesiones y no deben modificarse.
+    """
+    clave = version_modelo(df_fact, dim_geo, dim_tiempo)
+    capa = _CAPAS.obtener(clave)
+    if capa is not None:
+        return capa
+
+    with tramo("capa analítica") as t:
+        vista = t.df(construir_vista(df_fact, dim_geo, dim_tiempo))
+        capa = {'vista': vista}
+        usar_sql = version_guardada() == clave[0]
+        cubos = cargar_cubos(NIVELES_CUBO, clave[0]) if usar_sql else None
+        for nivel, claves in NIVELES_CUBO.items():
+            if cubos is not None:
+                capa[nivel] = cubos[nivel]
+            else:
+                capa[nivel] = agregar(claves) if usar_sql else construir_cubo(vista, claves)
+        capa['tensor'] = construir_tensor(df_fact, dim_geo, dim_tiempo)
+
+    return _CAPAS.guardar(clave, capa)
+
+
+# ===================================================================
+# Función: obtener_indicadores
+# ===================================================================
+def obtener_indicadores(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                        df_clean: pd.DataFrame | None = None) -> dict | None:
+    """
+    Devuelve el almacén de indicadores del modelo (`indicadores.indexar`):
+    todos los indicadores del MEN con su desagregación por nivel, en formato largo.
+
+    Como la capa, se arma una vez por versión de la tabla de hechos y se
+    comparte entre pestañas y sesiones. Con `df_clean` (tras la pestaña de
+    transformación) se construye con `modelo.crear_indicadores`; sin él se lee
+    de SQLite si esa versión está guardada (`guardar_indicadores`, p. ej. por el ETL).
+
+    Returns:
+        dict | None: El almacén, o None si no hay `df_clean` ni almacén guardado.
+    """
+    clave = version_modelo(df_fact, dim_geo, dim_tiempo)
+    almacen = _INDICADORES.obtener(clave)
+    if almacen is not None:
+        return almacen
+
+    with tramo("almacén de indicadores") as t:
+        if df_clean is not None:
+            tabla = crear_indicadores(df_clean, dim_tiempo, dim_geo)
+        else:
+            tabla = cargar_indicadores(clave[0])
+        if tabla is None:
+            return None
+        almacen = indexar(t.df(tabla))
+
+    return _INDICADORES.guardar(clave, almacen)
@@ -1,30 +1,392 @@
 import streamlit as st
 import pandas as pd
 import requests
+import os
+import json
+import time
+import pyarrow.feather as feather
+from concurrent.futures import ThreadPoolExecutor
+
+from modelo import COLUMNAS_OPCIONALES, COLUMNAS_RELEVANTES, COLUMNAS_TEXTO, hash_datos
+from almacen_memoria import datos_sesion, obtener, publicar
+from instrumentacion import tramo
+
+API_URL = "https://www.datos.gov.co/resource/nudc-7mev.json"
+
+# Columnas que usa la app: las del modelo estrella y los indicadores por nivel del
+# almacén de indicadores. Se piden con $select para no descargar las de texto (etc, ...)
+COLUMNAS_TRANSFORMACION = COLUMNAS_RELEVANTES + COLUMNAS_OPCIONALES
+
+# Exportación completa del dataset en CSV, incluida en el repositorio
+RUTA_CSV = os.path.join("Datos", "MEN_ESTADISTICAS_EN_EDUCACION_EN_PREESCOLAR__B_SICA_Y_MEDIA_POR_MUNICIPIO_20250722.csv")
+
+# Almacén local: una carpeta por dataset con un Feather sin compresión por año
+# (lectura memory-mapped) y un meta.json con la versión de origen
+CACHE_DIR = os.path.join("Datos", "cache")
+
+# Filtro SoQL para la actualización incremental; el último año guardado se vuelve
+# a pedir porque el MEN lo corrige después de publicarlo, y los registros sin año
+# (partición 'sin_dato') se piden siempre completos
+FILTRO_INCREMENTAL = "a_o >= '{año}' OR a_o IS NULL"
+
 
 # ===================================================================
-# Función: load_data_from_api
+# Función: _tipar_pagina
+# ===================================================================
+def _tipar_pagina(registros: list, columnas: list | None) -> pd.DataFrame:
+    """
+    Convierte una página JSON de Socrata en un DataFrame con columnas tipadas.
+
+    Socrata entrega todos los valores como texto; aquí las columnas que no son
+    de texto se convierten a numérico en cuanto llega la página, de modo que el
+    JSON crudo se libera antes de pedir la siguiente.
+    """
+    return _tipar(pd.DataFrame.from_records(registros, columns=columnas))
+
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    # Todo lo que no es texto (nombres y códigos) se convierte a numérico
+    for col in df.columns:
+        if col not in COLUMNAS_TEXTO:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+# ===================================================================
+# Función: leer_csv
 # ===================================================================
-def load_data_from_api(limit: int = 50000) -> pd.DataFrame:
+def leer_csv(ruta: str = RUTA_CSV, columnas: list | None = COLUMNAS_TRANSFORMACION) -> pd.DataFrame:
     """
-    Carga datos desde la API de Socrata en formato JSON y los convierte en un DataFrame de pandas.
+    Lee la exportación en CSV del dataset con los mismos nombres de campo y
+    tipos que entrega la API.
 
     Args:
-        limit (int): Número máximo de registros a solicitar. Por defecto es 50,000.
+        ruta (str): Archivo CSV descargado de datos.gov.co.
+        columnas (list | None): Columnas a conservar. None conserva todas.
 
     Returns:
-        pd.DataFrame: DataFrame con los datos cargados. Si ocurre un error, devuelve un DataFrame vacío.
-        
+        pd.DataFrame: Datos con columnas numéricas ya convertidas.
+    """
+    df = pd.read_csv(ruta, dtype=str)
+    # Socrata nombra los campos en minúscula y cambia por '_' lo que no es ASCII ("AÑO" -> "a_o")
+    df.columns = df.columns.str.lower().str.replace(r"[^a-z0-9_]", "_", regex=True)
+    return _tipar(df[columnas].copy() if columnas else df)
+
+
+# ===================================================================
+# Función: _descargar_pagina
+# ===================================================================
+def _descargar_pagina(session: requests.Session, api_url: str, offset: int, page_size: int,
+                      columnas: list | None, timeout: float, where: str | None = None) -> pd.DataFrame:
+    """
+    Descarga una ventana $offset/$limit del dataset y la devuelve ya tipada.
+    """
+    params = {'$limit': page_size, '$offset': offset, '$order': ':id'}
+    if columnas:
+        params['$select'] = ','.join(columnas)
+    if where:
+        params['$where'] = where
+    response = session.get(api_url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return _tipar_pagina(response.json(), columnas)
+
+
+# ===================================================================
+# Función: fetch_paginado
+# ===================================================================
+def fetch_paginado(api_url: str = API_URL, columnas: list | None = COLUMNAS_TRANSFORMACION,
+                   page_size: int = 5000, max_workers: int = 4, limit: int | None = None,
+                   timeout: float = 60, where: str | None = None, avance=None) -> pd.DataFrame:
+    """
+    Descarga el dataset completo por ventanas $offset en paralelo.
+
+    Las páginas se piden en tandas de `max_workers` sobre una misma
+    `requests.Session` (conexiones reutilizadas) y se detiene en la primera
+    página incompleta, así que no se pierden filas aunque el dataset crezca.
+
+    Args:
+        api_url (str): Endpoint JSON de Socrata.
+        columnas (list | None): Columnas a pedir con $select. None trae todas.
+        page_size (int): Registros por página.
+        max_workers (int): Número máximo de descargas simultáneas.
+        limit (int | None): Tope opcional de registros. None descarga todo.
+        timeout (float): Tiempo máximo de espera por página, en segundos.
+        where (str | None): Filtro SoQL opcional ($where).
+        avance (callable | None): Se llama con un texto tras cada página recibida.
+
+    Returns:
+        pd.DataFrame: Datos con columnas numéricas ya convertidas.
+
+    Raises:
+        requests.exceptions.RequestException: Si alguna página falla.
+    """
+    paginas = []
+    filas = 0
+    offset = 0
+    terminado = False
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while not terminado:
+                offsets = []
+                for _ in range(max_workers):
+                    if limit is not None and offset >= limit:
+                        break
+                    offsets.append(offset)
+                    offset += page_size
+                if not offsets:
+                    break
+                futuros = [
+                    pool.submit(_descargar_pagina, session, api_url, o,
+                                page_size if limit is None else min(page_size, limit - o),
+                                columnas, timeout, where)
+                    for o in offsets
+                ]
+                # Se recorren en orden de offset para conservar el orden del dataset
+                for futuro in futuros:
+                    pagina = futuro.result()
+                    if not pagina.empty:
+                        paginas.append(pagina)
+                        filas += len(pagina)
+                        if avance is not None:
+                            avance(f"{filas:,} registros descargados")
+                    if len(pagina) < page_size:
+                        terminado = True
+
+    if not paginas:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(paginas, ignore_index=True)
+
+
+# ===================================================================
+# Función: consultar_version
+# ===================================================================
+def consultar_version(api_url: str = API_URL, timeout: float = 15) -> str | None:
+    """
+    Consulta la versión publicada del dataset sin descargarlo.
+
+    Pide un único registro y toma la marca de última modificación que
+    Socrata envía en las cabeceras (o el ETag si no está disponible).
+
+    Returns:
+        str | None: Identificador de versión, o None si no hay conexión.
+    """
+    try:
+        response = requests.get(api_url, params={'$limit': 1}, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        return None
+    headers = response.headers
+    return (headers.get('X-SODA2-Truth-Last-Modified')
+            or headers.get('Last-Modified')
+            or headers.get('ETag'))
+
+
+def _carpeta_cache(api_url: str) -> str:
+    # El nombre del recurso (p. ej. nudc-7mev) identifica el dataset en disco
+    dataset = os.path.basename(api_url).split('.')[0]
+    return os.path.join(CACHE_DIR, dataset)
+
+
+def _nombre_particion(año) -> str:
+    return "a_o=sin_dato.feather" if pd.isna(año) else f"a_o={int(año)}.feather"
+
+
+# ===================================================================
+# Función: leer_cache
+# ===================================================================
+def leer_cache(api_url: str = API_URL) -> tuple[pd.DataFrame, dict] | None:
+    """
+    Lee el dataset guardado en disco con lectura memory-mapped.
+
+    Returns:
+        tuple | None: (DataFrame, metadatos) o None si no hay copia local.
+    """
+    carpeta = _carpeta_cache(api_url)
+    ruta_meta = os.path.join(carpeta, "meta.json")
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, encoding="utf-8") as f:
+        meta = json.load(f)
+    partes = [
+        feather.read_table(os.path.join(carpeta, nombre), memory_map=True).to_pandas()
+        for nombre in meta.get('particiones', [])
+    ]
+    if not partes:
+        return None
+    return pd.concat(partes, ignore_index=True), meta
+
+
+# ===================================================================
+# Función: guardar_cache
+# ===================================================================
+def guardar_cache(df: pd.DataFrame, version: str | None, columnas: list | None,
+                  api_url: str = API_URL, años: list | None = None) -> None:
+    """
+    Guarda el dataset en disco, un archivo por año, junto con la versión de la que proviene.
+
+    Con `años` solo se reescriben las particiones de esos años (`df` contiene
+    únicamente esos datos; un año de la lista sin filas en `df` se borra, y
+    None o NaN es la partición de los registros sin año); sin `años` se
+    reemplaza el dataset completo. La
+    escritura se hace sobre archivos temporales y luego se reemplazan, para que
+    otra sesión nunca lea un archivo a medio escribir.
+    """
+    carpeta = _carpeta_cache(api_url)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_meta = os.path.join(carpeta, "meta.json")
+
+    particiones = set()
+    if años is not None and os.path.exists(ruta_meta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            particiones = set(json.load(f).get('particiones', []))
+        particiones -= {_nombre_particion(año) for año in años}
+
+    for año, parte in df.groupby('a_o', dropna=False, sort=False):
+        nombre = _nombre_particion(año)
+        ruta = os.path.join(carpeta, nombre)
+        parte.reset_index(drop=True).to_feather(ruta + ".tmp", compression="uncompressed")
+        os.replace(ruta + ".tmp", ruta)
+        particiones.add(nombre)
+
+    meta = {
+        'version': version,
+        'columnas': columnas,
+        'particiones': sorted(particiones),
+        'guardado': time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(ruta_meta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_meta + ".tmp", ruta_meta)
+
+    # Particiones de una versión anterior que ya no existen en el dataset
+    for nombre in os.listdir(carpeta):
+        if nombre.endswith(".feather") and nombre not in particiones:
+            try:
+                os.remove(os.path.join(carpeta, nombre))
+            except FileNotFoundError:
+                pass
+
+
+# ===================================================================
+# Función: refrescar_incremental
+# ===================================================================
+def refrescar_incremental(api_url: str = API_URL,
+                          columnas: list | None = COLUMNAS_TRANSFORMACION) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Actualiza la copia local descargando solo los años nuevos o corregidos.
+
+    Toma el año más reciente guardado, pide con $where los registros desde ese
+    año (y los que no tienen año) y reescribe únicamente esas particiones. Si
+    no hay copia local, o ningún registro guardado tiene año, se hace una
+    carga completa.
+
+    Returns:
+        tuple: (dataset completo, registros descargados). Si la copia local está
+        al día el segundo DataFrame viene vacío.
+
+    Raises:
+        requests.exceptions.RequestException: Si hay un problema de conexión o respuesta HTTP.
+    """
+    cache = leer_cache(api_url)
+    version = consultar_version(api_url)
+    if cache is None or cache[1].get('columnas') != columnas or cache[0]['a_o'].isna().all():
+        df = fetch_paginado(api_url=api_url, columnas=columnas)
+        guardar_cache(df, version, columnas, api_url)
+        return df, df
+
+    df, meta = cache
+    if version is not None and meta.get('version') == version:
+        return df, df.iloc[0:0]
+
+    ultimo_año = int(df['a_o'].max())
+    nuevos = fetch_paginado(api_url=api_url, columnas=columnas,
+                            where=FILTRO_INCREMENTAL.format(año=ultimo_año))
+    # Se reemplazan los años recibidos y siempre los registros sin año, que se pidieron completos
+    años = list(nuevos['a_o'].dropna().unique())
+    guardar_cache(nuevos, version, columnas, api_url, años=años + [None])
+    df = pd.concat([df[~(df['a_o'].isin(años) | df['a_o'].isna())], nuevos], ignore_index=True)
+    return df, nuevos
+
+
+# ===================================================================
+# Función: cargar_men
+# ===================================================================
+def cargar_men(limit: int | None = None, columnas: list | None = COLUMNAS_TRANSFORMACION,
+               api_url: str = API_URL, usar_cache: bool = True, forzar: bool = False,
+               avance=None) -> pd.DataFrame:
+    """
+    Carga el dataset del MEN desde la copia local o la API, sin tocar la interfaz.
+
+    Si existe una copia local de la misma versión del dataset se lee desde disco
+    y solo se hace una consulta mínima para comparar versiones. Sin conexión se
+    usa la copia local disponible. Se puede llamar desde un hilo en segundo plano.
+
+    Args:
+        limit (int | None): Número máximo de registros a solicitar. Por defecto se descarga todo el dataset.
+        columnas (list | None): Columnas a solicitar con $select. Por defecto las que usa la transformación.
+        api_url (str): Endpoint de la API. Se puede apuntar a un servidor local de pruebas.
+        usar_cache (bool): Si se usa el almacén local en disco. Se ignora cuando hay `limit`.
+        forzar (bool): Descarga de nuevo aunque la copia local esté al día.
+        avance (callable | None): Recibe un texto con la etapa en curso.
+
+    Returns:
+        pd.DataFrame: DataFrame con los datos cargados. En `df.attrs['origen']` queda
+        'cache' o 'api'.
+
     Raises:
         requests.exceptions.RequestException: Si hay un problema de conexión o respuesta HTTP.
     """
-    api_url = f"https://www.datos.gov.co/resource/nudc-7mev.json?$limit={limit}"
+    avance = avance or (lambda detalle: None)
+    usar_cache = usar_cache and limit is None
+    version = None
+    if usar_cache:
+        avance("Consultando la versión publicada")
+        version = consultar_version(api_url)
+        cache = leer_cache(api_url)
+        if cache is not None and not forzar:
+            df, meta = cache
+            if meta.get('columnas') == columnas and (version is None or meta.get('version') == version):
+                df.attrs['origen'] = 'cache'
+                df.attrs['version'] = meta.get('version')
+                return df
+
+    avance("Descargando de la API")
+    df = fetch_paginado(api_url=api_url, columnas=columnas, limit=limit, avance=avance)
+    if usar_cache and not df.empty:
+        guardar_cache(df, version, columnas, api_url)
+    df.attrs['origen'] = 'api'
+    df.attrs['version'] = version
+    return df
+
+
+# ===================================================================
+# Función: load_data_from_api
+# ===================================================================
+def load_data_from_api(limit: int | None = None, columnas: list | None = COLUMNAS_TRANSFORMACION,
+                       api_url: str = API_URL, usar_cache: bool = True,
+                       forzar: bool = False) -> pd.DataFrame:
+    """
+    Carga datos desde la API de Socrata de forma paginada y los convierte en un DataFrame de pandas.
+
+    Igual que `cargar_men`, pero los errores se muestran en la interfaz de
+    Streamlit en lugar de propagarse.
+
+    Args:
+        limit (int | None): Número máximo de registros a solicitar. Por defecto se descarga todo el dataset.
+        columnas (list | None): Columnas a solicitar con $select. Por defecto las que usa la transformación.
+        api_url (str): Endpoint de la API. Se puede apuntar a un servidor local de pruebas.
+        usar_cache (bool): Si se usa el almacén local en disco. Se ignora cuando hay `limit`.
+        forzar (bool): Descarga de nuevo aunque la copia local esté al día.
+
+    Returns:
+        pd.DataFrame: DataFrame con los datos cargados. En `df.attrs['origen']` queda
+        'cache' o 'api'. Si ocurre un error, devuelve un DataFrame vacío.
+    """
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()  # Verifica si la respuesta fue exitosa
-        data = response.json()
-        df = pd.DataFrame(data)
-        return df
+        return cargar_men(limit, columnas, api_url, usar_cache, forzar)
     except requests.exceptions.RequestException as e:
         # Muestra un mensaje de error en la interfaz de Streamlit si hay un problema de conexión
         st.error(f"Error de conexión: {e}")
@@ -37,10 +399,15 @@ def load_data_from_api(limit: int = 50000) -> pd.DataFrame:
 # ===================================================================
 # Función: show_data_tab
 # ===================================================================
-def show_data_tab():
+def show_data_tab(esperar, recargar):
     """
     Muestra la interfaz de la pestaña para cargar datos desde la API.
     Incluye instrucciones y un botón para iniciar la carga.
+
+    Args:
+        esperar, recargar (callable): `precarga.esperar` y `precarga.recargar`.
+            Los pasa app.py: la precarga llama a `cargar_men` de este módulo,
+            que por eso no la importa.
     """
     st.header("📥 Carga de Datos del MEN vía API")  # Encabezado de la sección
 
@@ -51,21 +418,60 @@ def show_data_tab():
     Presiona el botón para cargar los datos directamente desde la API.
     """)
 
+    forzar = st.checkbox("Ignorar la copia local y descargar de nuevo", value=False)
+
+    col1, col2 = st.columns(2)
+    cargar = col1.button("🔄 Cargar datos")
+    actualizar = col2.button("⏩ Actualizar solo años nuevos", disabled='df_raw' not in datos_sesion('crudos'))
+
+    if actualizar:
+        try:
+            with st.spinner("Buscando años nuevos en la API..."), tramo("actualización incremental") as t:
+                df_raw, df_nuevos = refrescar_incremental()
+                t.df(df_nuevos)
+            recargar('men')
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error de conexión: {e}")
+            return
+
+        if df_nuevos.empty:
+            st.session_state['crudos'] = publicar(hash_datos(df_raw), lambda: {'df_raw': df_raw})
+            st.info("La copia local ya está al día.")
+        else:
+            # La pestaña de Transformación actualiza el modelo solo para estos años,
+            # partiendo del modelo que la sesión tiene en uso
+            previo = st.session_state.get('modelo')
+            st.session_state['crudos'] = publicar(
+                hash_datos(df_raw), lambda: {'df_raw': df_raw, 'df_nuevos': df_nuevos, 'previo': previo})
+            años = sorted(int(a) for a in df_nuevos['a_o'].dropna().unique())
+            st.success(f"Se actualizaron {len(df_nuevos)} filas de los años {años}.")
+
     # Botón para cargar los datos
-    if st.button("🔄 Cargar datos"):
-        with st.spinner("Cargando datos desde la API..."):
-            df_raw = load_data_from_api()
+    elif cargar:
+        with st.spinner("Cargando datos desde la API..."), tramo("descarga MEN") as t:
+            if forzar:
+                df_raw = t.df(load_data_from_api(forzar=True))
+                recargar('men')
+            else:
+                # Normalmente ya está cargado en segundo plano desde que se abrió la app
+                try:
+                    df_raw = t.df(esperar('men'))
+                except requests.exceptions.RequestException as e:
+                    st.error(f"Error de conexión: {e}")
+                    df_raw = pd.DataFrame()
 
         # Verifica si se cargaron datos correctamente
         if not df_raw.empty:
-            # Guardar el dataframe en sesión para usarlo en otras pestañas
-            st.session_state['df_raw'] = df_raw
-            
-            st.success(f"¡Datos cargados exitosamente! ({len(df_raw)} filas)")
+            # Los datos se comparten entre sesiones; la sesión guarda solo su versión.
+            # Si otra sesión ya cargó la misma versión, se usa esa copia
+            st.session_state['crudos'] = publicar(hash_datos(df_raw), lambda: {'df_raw': df_raw})
+            df_raw = obtener(st.session_state['crudos'])['df_raw']
+
+            origen = "copia local" if df_raw.attrs.get('origen') == 'cache' else "API"
+            st.success(f"¡Datos cargados exitosamente desde {origen}! ({len(df_raw)} filas)")
             st.dataframe(df_raw.head(10))
         else:
             st.warning("No se encontraron datos o hubo un error en la carga.")
     else:
         # Mensaje informativo si aún no se ha presionado el botón
         st.info("Presiona el botón para iniciar la carga.")
-        
\ No newline at end of file
@@ -1,95 +1,221 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 
-def show_tab():
-    st.markdown("## 📊 Comparativo Nacional de Indicadores")
+from consultas import query
+from precarga import esperar_proyecciones
+from emparejamiento import emparejar_nombres
+from modelo import hash_datos, version_modelo
+from graficos import figura
+from tendencias import AÑO_FINAL, NIVEL_CONFIANZA, obtener_tendencias
+from instrumentacion import tramo
+from almacen_memoria import datos_sesion
 
-    try:
-        # Cargar bases
-        info_2020 = pd.read_excel("Datos/Info_2020_2035.xlsx")
-        info_2005 = pd.read_excel("Datos/Info_2005_2019.xlsx")
-
-        # Mostrar resumen
-        total_2020 = len(info_2020)
-        total_2005 = len(info_2005)
-        años_2020 = info_2020['AÑO'].nunique()
-        años_2005 = info_2005['AÑO'].nunique()
-        deptos_2020 = info_2020['DPNOM'].nunique()
-        deptos_2005 = info_2005['DPNOM'].nunique()
-
-        st.success("✅ **Bases cargadas correctamente:**")
-        st.markdown(f"""
-        - 📄 **Info_2020_2035.xlsx**: {total_2020:,} registros, {años_2020} años, {deptos_2020} departamentos  
-        - 📄 **Info_2005_2019.xlsx**: {total_2005:,} registros, {años_2005} años, {deptos_2005} departamentos
-        """)
-
-        # Unificar
-        df_dane = pd.concat([info_2005, info_2020], ignore_index=True)
-        df_total = df_dane[df_dane["ÁREA GEOGRÁFICA"].str.lower().str.contains("total")]
-        df_grouped = df_total.groupby(["DPNOM", "AÑO"], as_index=False)["Población"].sum()
-        df_grouped.rename(columns={"DPNOM": "Departamento"}, inplace=True)
-
-        # Datos educativos
-        df_fact = st.session_state['df_fact']
-        dim_geo = st.session_state['dim_geo']
-        dim_tiempo = st.session_state['dim_tiempo']
-        df_edu = df_fact.merge(dim_geo, on="id_geo").merge(dim_tiempo, on="id_tiempo")
-
-        df_edu_grouped = df_edu.groupby(["departamento", "a_o"], as_index=False)["tasa_matriculaci_n_5_16"].mean()
-        df_edu_grouped.rename(columns={"departamento": "Departamento", "a_o": "AÑO"}, inplace=True)
-
-        # Merge
-        df_comparado = df_edu_grouped.merge(df_grouped, on=["Departamento", "AÑO"], how="inner")
-
-        # Treemap
-        st.subheader("🌲 Treemap: Matrícula vs Población Proyectada")
-        fig = px.treemap(
-            df_comparado,
-            path=['Departamento'],
-            values='Población',
-            color='tasa_matriculaci_n_5_16',
-            color_continuous_scale='Viridis',
-            hover_data={'AÑO': True, 'tasa_matriculaci_n_5_16': ':.2f'}
-        )
-        st.plotly_chart(fig, use_container_width=True)
+# Indicadores (en %) que se grafican en la proyección de un municipio
+NOMBRES_PROYECCION = {'cobertura_neta': "Cobertura neta", 'tasa_matriculaci_n_5_16': "Tasa de matrícula 5-16"}
 
-        # Tabla
-        st.subheader("📋 Tabla comparativa")
-        st.dataframe(df_comparado.sort_values(by="AÑO", ascending=False))
-
-        # Burbujas estáticas (promedios)
-        st.subheader("🫧 Top 10 Departamentos por Población Promedio (5-16 años)")
-
-        df_avg = df_grouped.groupby("Departamento", as_index=False)["Población"].mean()
-        df_avg = df_avg.sort_values(by="Población", ascending=False).head(10)
-
-        # Controles interactivos
-        deptos_seleccionados = st.multiselect(
-            "Selecciona los departamentos a mostrar",
-            options=df_avg["Departamento"].tolist(),
-            default=df_avg["Departamento"].tolist()
-        )
-
-        df_filtrado = df_avg[df_avg["Departamento"].isin(deptos_seleccionados)]
-
-        fig_burbujas = px.scatter(
-            df_filtrado,
-            x="Departamento",
-            y="Población",
-            size="Población",
-            color="Departamento",
-            size_max=80,
-            title="🔵 Población Promedio por Departamento (5-16 años)",
-            labels={"Población": "Población 5-16"},
-            height=600
-        )
-        fig_burbujas.update_layout(xaxis_tickangle=-45)
 
-        st.plotly_chart(fig_burbujas, use_container_width=True)
+def show_tab():
+    st.markdown("## 📊 Comparativo Nacional de Indicadores")
 
+    try:
+        # Cargar bases (desde la caché columnar; los Excel se leen solo si cambiaron)
+        with st.spinner("Esperando las proyecciones del DANE..."), tramo("proyecciones DANE"):
+            proyecciones = esperar_proyecciones()
     except Exception as e:
         st.error(f"❌ No se pudo cargar la base del DANE (`Info_2020_2035.xlsx`)\n\nError: {e}")
+        return
+
+    info_2020 = proyecciones['2020_2035']
+    info_2005 = proyecciones['2005_2019']
+
+    # Mostrar resumen
+    total_2020 = len(info_2020)
+    total_2005 = len(info_2005)
+    años_2020 = info_2020['AÑO'].nunique()
+    años_2005 = info_2005['AÑO'].nunique()
+    deptos_2020 = info_2020['DPNOM'].nunique()
+    deptos_2005 = info_2005['DPNOM'].nunique()
+
+    st.success("✅ **Bases cargadas correctamente:**")
+    st.markdown(f"""
+    - 📄 **Info_2020_2035.xlsx**: {total_2020:,} registros, {años_2020} años, {deptos_2020} departamentos  
+    - 📄 **Info_2005_2019.xlsx**: {total_2005:,} registros, {años_2005} años, {deptos_2005} departamentos
+    """)
+
+    # Población total por departamento y año (2005-2035), ya unificada
+    df_grouped = proyecciones['agrupado']
+
+    # Datos educativos
+    datos = datos_sesion()
+    if 'df_fact' not in datos:
+        st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
+        return
+    modelo = (datos['df_fact'], datos['dim_geo'], datos['dim_tiempo'])
+    df_edu_grouped = query("tasa_matriculaci_n_5_16", ["departamento", "a_o"], modelo=modelo)
+    df_edu_grouped.rename(columns={"departamento": "Departamento", "a_o": "AÑO"}, inplace=True)
+
+    # El MEN y el DANE escriben distinto algunos departamentos ("Bogotá D.C." / "Bogotá, D.C.")
+    equivalencias = emparejar_nombres(df_edu_grouped["Departamento"], df_grouped["Departamento"])
+    df_edu_grouped["Departamento"] = df_edu_grouped["Departamento"].astype(str).map(equivalencias["referencia"])
+
+    # Merge
+    with tramo("merge MEN-DANE") as t:
+        df_comparado = t.df(df_edu_grouped.merge(df_grouped, on=["Departamento", "AÑO"], how="inner"))
+
+    # Treemap
+    st.subheader("🌲 Treemap: Matrícula vs Población Proyectada")
+    # Depende del modelo y de las proyecciones del DANE
+    fig = figura(("treemap", version_modelo(*modelo), hash_datos(df_grouped)), lambda: _figura_treemap(df_comparado))
+    with tramo("plotly treemap"):
+        st.plotly_chart(fig, use_container_width=True)
 
+    # Tabla
+    st.subheader("📋 Tabla comparativa")
+    st.dataframe(df_comparado.sort_values(by="AÑO", ascending=False))
+
+    # Burbujas estáticas (promedios)
+    st.subheader("🫧 Top 10 Departamentos por Población Promedio (5-16 años)")
+
+    df_avg = df_grouped.groupby("Departamento", as_index=False, observed=True)["Población"].mean()
+    df_avg = df_avg.sort_values(by="Población", ascending=False).head(10)
+
+    # Controles interactivos
+    deptos_seleccionados = st.multiselect(
+        "Selecciona los departamentos a mostrar",
+        options=df_avg["Departamento"].tolist(),
+        default=df_avg["Departamento"].tolist()
+    )
+
+    df_filtrado = df_avg[df_avg["Departamento"].isin(deptos_seleccionados)]
+
+    fig_burbujas = px.scatter(
+        df_filtrado,
+        x="Departamento",
+        y="Población",
+        size="Población",
+        color="Departamento",
+        size_max=80,
+        title="🔵 Población Promedio por Departamento (5-16 años)",
+        labels={"Población": "Población 5-16"},
+        height=600
+    )
+    fig_burbujas.update_layout(xaxis_tickangle=-45)
+
+    with tramo("plotly burbujas"):
+        st.plotly_chart(fig_burbujas, use_container_width=True)
 
+    # Proyección de los indicadores y de la población 5-16 del MEN a 2035
+    tendencias = obtener_tendencias(*modelo)
+    _grafico_proyeccion(tendencias, df_grouped, equivalencias["referencia"].to_dict(), version_modelo(*modelo))
+
+
+def _figura_treemap(df_comparado):
+    """
+    Treemap de población con la tasa de matrícula por departamento.
+
+    Se agrega aquí a una fila por departamento, como haría Plotly con la ruta
+    ['Departamento']: la población se suma y la tasa se promedia ponderada
+    por población.
+    """
+    ponderada = df_comparado["tasa_matriculaci_n_5_16"] * df_comparado["Población"]
+    df_treemap = (
+        df_comparado.assign(ponderada=ponderada)
+        .groupby("Departamento", as_index=False, observed=True)
+        .agg(Población=("Población", "sum"), ponderada=("ponderada", "sum"),
+             desde=("AÑO", "min"), hasta=("AÑO", "max"))
+    )
+    df_treemap["tasa_matriculaci_n_5_16"] = df_treemap["ponderada"] / df_treemap["Población"]
+    df_treemap["Años"] = df_treemap["desde"].astype(int).astype(str) + "-" + df_treemap["hasta"].astype(int).astype(str)
+    return px.treemap(
+        df_treemap,
+        path=['Departamento'],
+        values='Población',
+        color='tasa_matriculaci_n_5_16',
+        color_continuous_scale='Viridis',
+        hover_data={'Años': True, 'tasa_matriculaci_n_5_16': ':.2f'}
+    )
+
+
+@st.fragment
+def _grafico_proyeccion(tendencias, df_grouped, equivalencias, version):
+    st.markdown("---")
+    st.subheader(f"🔮 Proyección a {AÑO_FINAL}: Cobertura Neta y Tasa de Matrícula")
+    st.caption(f"Tendencia lineal de cada municipio sobre los años observados, "
+               f"con banda de confianza del {NIVEL_CONFIANZA:.0%}.")
+
+    deptos = list(tendencias['departamentos'])
+    depto = st.selectbox("Selecciona un departamento", deptos, key="proyeccion_depto")
+    rango = tendencias['departamentos'][depto]
+    municipios = tendencias['geo']['municipio'].astype(str).to_numpy()[rango]
+    municipio = st.selectbox("Selecciona un municipio", municipios, key="proyeccion_municipio")
+    posicion = rango.start + int(np.flatnonzero(municipios == municipio)[0])
+
+    fig = figura(("proyección", version, depto, municipio),
+                 lambda: _figura_proyeccion(tendencias, posicion, municipio))
+    if fig is None:
+        st.warning(f"{municipio} no tiene suficientes años observados para estimar la tendencia.")
+    else:
+        with tramo("plotly proyección"):
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Departamento: los indicadores son el promedio de las proyecciones municipales;
+    # la población 5-16 y la matrícula estimada, la suma de las municipales
+    años = tendencias['años']
+    futuros = años > tendencias['ultimo_año']
+    estimado = tendencias['estimado'][rango][:, futuros]
+    con_dato = (~np.isnan(estimado)).sum(axis=0)
+    promedio = np.where(con_dato > 0, np.nansum(estimado, axis=0) / np.maximum(con_dato, 1), np.nan)
+    i_tasa, i_poblacion = tendencias['metricas']['tasa_matriculaci_n_5_16'], tendencias['metricas']['poblaci_n_5_16']
+    matriculados = estimado[:, :, i_tasa] / 100 * estimado[:, :, i_poblacion]
+    df_proyeccion = pd.DataFrame({
+        "AÑO": años[futuros],
+        **{metrica: promedio[:, i] for metrica, i in tendencias['metricas'].items() if metrica in NOMBRES_PROYECCION},
+        "Población 5-16 proyectada": np.nansum(estimado[:, :, i_poblacion], axis=0).round(),
+        "Matriculados 5-16 estimados": np.nansum(matriculados, axis=0).round(),
+    })
+    # Población total del DANE (todas las edades), como referencia
+    poblacion = df_grouped[df_grouped["Departamento"] == equivalencias.get(depto)]
+    df_proyeccion = df_proyeccion.merge(
+        poblacion[["AÑO", "Población"]].rename(columns={"Población": "Población total DANE"}), on="AÑO", how="left")
+
+    st.markdown(f"**{depto}**: proyecciones municipales del MEN (promedio de los indicadores, suma de la "
+                f"población 5-16 y de la matrícula estimada) y población total del DANE")
+    st.dataframe(df_proyeccion, hide_index=True)
+
+
+def _figura_proyeccion(tendencias, posicion, municipio):
+    """
+    Valores observados, recta ajustada y banda de confianza de cada indicador.
+    """
+    graficadas = [i for metrica, i in tendencias['metricas'].items() if metrica in NOMBRES_PROYECCION]
+    if np.isnan(tendencias['estimado'][posicion][:, graficadas]).all():
+        return None
+    años = tendencias['años']
+    años_observados = tendencias['años_observados']
+    colores = px.colors.qualitative.Plotly
+
+    fig = go.Figure()
+    for metrica, nombre in NOMBRES_PROYECCION.items():
+        i = tendencias['metricas'][metrica]
+        color = colores[i % len(colores)]
+        fig.add_trace(go.Scatter(x=años, y=tendencias['superior'][posicion, :, i], mode='lines',
+                                 line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=años, y=tendencias['inferior'][posicion, :, i], mode='lines',
+                                 line=dict(width=0), fill='tonexty', fillcolor=color, opacity=0.2,
+                                 name=f"Banda {nombre}", hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=años, y=tendencias['estimado'][posicion, :, i], mode='lines',
+                                 line=dict(color=color, dash='dash'), name=f"Tendencia {nombre}"))
+        fig.add_trace(go.Scatter(x=años_observados, y=tendencias['observado'][posicion, :, i], mode='markers',
+                                 marker=dict(color=color, size=8), name=nombre))
+    fig.add_vline(x=tendencias['ultimo_año'] + 0.5, line_dash='dot', line_color='gray')
+    fig.update_layout(
+        title=f"{municipio}: observado y proyectado a {AÑO_FINAL}",
+        xaxis_title="Año",
+        yaxis_title="%",
+        height=550
+    )
+    return fig
@@ -0,0 +1,130 @@
+import threading
+
+import pandas as pd
+
+from modelo import version_modelo
+from cache_lru import CacheLRU
+from capa_analitica import NIVELES_CUBO, obtener_capa
+from instrumentacion import tramo
+
+# Resultados recientes, indexados por (versión del modelo, consulta normalizada)
+MAX_RESULTADOS = 256
+_RESULTADOS = CacheLRU(MAX_RESULTADOS)
+_ESTADISTICAS = {'aciertos': 0, 'fallos': 0}
+# Las sesiones consultan desde hilos distintos: `+=` sobre el diccionario no es atómico
+_CANDADO = threading.Lock()
+
+
+def _como_lista(valor) -> list:
+    if valor is None:
+        return []
+    if isinstance(valor, (list, tuple, set, pd.Index, pd.Series)):
+        return list(valor)
+    return [valor]
+
+
+def _normalizar(metrics, group_by, filters, order_by, limit) -> tuple:
+    """
+    Lleva la consulta a una forma canónica y hashable para usarla como llave.
+
+    Un filtro escalar y una lista de un elemento son la misma consulta, y el
+    orden de los filtros o de sus valores no importa.
+    """
+    filtros = tuple(sorted(
+        (col, tuple(sorted(_como_lista(valores), key=str)))
+        for col, valores in (filters or {}).items()
+    ))
+    return (tuple(_como_lista(metrics)), tuple(_como_lista(group_by)), filtros, order_by, limit)
+
+
+def _resolver(capa: dict, metricas: list, agrupar: list, filtros: tuple) -> pd.DataFrame:
+    """
+    Calcula la agregación, usando un cubo ya materializado cuando la consulta
+    agrupa exactamente por sus llaves; si no, agrega sobre la vista ancha.
+    """
+    columnas_filtro = {col for col, _ in filtros}
+    for nivel, claves in NIVELES_CUBO.items():
+        llaves = claves + ['a_o']
+        if set(agrupar) == set(llaves) and columnas_filtro <= set(llaves) \
+                and set(metricas) <= set(capa[nivel].columns):
+            cubo = capa[nivel]
+            mascara = pd.Series(True, index=cubo.index)
+            for col, valores in filtros:
+                mascara &= cubo.index.get_level_values(col).isin(valores)
+            return cubo.loc[mascara.to_numpy(), metricas].reset_index()[agrupar + metricas]
+
+    vista = capa['vista']
+    if filtros:
+        mascara = pd.Series(True, index=vista.index)
+        for col, valores in filtros:
+            mascara &= vista[col].isin(valores)
+        vista = vista[mascara]
+    if not agrupar:
+        return vista[metricas].mean().to_frame().T
+    return vista.groupby(agrupar, observed=True)[metricas].mean().reset_index()
+
+
+# ===================================================================
+# Función: query
+# ===================================================================
+def query(metrics, group_by=None, filters: dict | None = None, order_by: str | None = None,
+          limit: int | None = None, *, modelo: tuple) -> pd.DataFrame:
+    """
+    Promedia métricas de la tabla de hechos agrupando por columnas de las dimensiones.
+
+    Es la consulta que repiten las pestañas (filtrar por año/departamento,
+    agrupar, promediar y tomar un top-N). Los resultados se guardan en una
+    caché LRU por versión del modelo, así que volver a elegir el mismo
+    departamento o año en un selector no recalcula nada.
+
+    Args:
+        metrics (str | list): Métrica(s) de la tabla de hechos a promediar.
+        group_by (str | list | None): Columna(s) de agrupación, p. ej. ['departamento', 'a_o'].
+        filters (dict | None): {columna: valor o lista de valores}.
+        order_by (str | None): Columna de orden; con prefijo '-' el orden es descendente.
+        limit (int | None): Número máximo de filas a devolver (top-N con `order_by`).
+        modelo (tuple): (df_fact, dim_geo, dim_tiempo) sobre el que se consulta.
+
+    Returns:
+        pd.DataFrame: Columnas de agrupación seguidas de las métricas. Es una copia
+        que el llamador puede modificar.
+    """
+    consulta = _normalizar(metrics, group_by, filters, order_by, limit)
+    # Las dimensiones entran en la llave: dim_geo cambia, p. ej., al enriquecerse con la DIVIPOLA
+    llave = version_modelo(*modelo) + consulta
+    resultado = _RESULTADOS.obtener(llave)
+    if resultado is not None:
+        with _CANDADO:
+            _ESTADISTICAS['aciertos'] += 1
+        return resultado.copy()
+    with _CANDADO:
+        _ESTADISTICAS['fallos'] += 1
+
+    metricas, agrupar, filtros = list(consulta[0]), list(consulta[1]), consulta[2]
+    capa = obtener_capa(*modelo)
+    with tramo(f"groupby {', '.join(agrupar) or 'total'}") as t:
+        resultado = t.df(_resolver(capa, metricas, agrupar, filtros))
+
+    if order_by:
+        columna, ascendente = order_by.lstrip('-'), not order_by.startswith('-')
+        if limit is not None:
+            resultado = resultado.nsmallest(limit, columna) if ascendente else resultado.nlargest(limit, columna)
+        else:
+            resultado = resultado.sort_values(columna, ascending=ascendente)
+    elif limit is not None:
+        resultado = resultado.head(limit)
+    resultado = resultado.reset_index(drop=True)
+
+    return _RESULTADOS.guardar(llave, resultado).copy()
+
+
+# ===================================================================
+# Función: estadisticas_cache
+# ===================================================================
+def estadisticas_cache() -> dict:
+    """
+    Devuelve los aciertos, fallos y tamaño actual de la caché de consultas.
+    """
+    with _CANDADO:
+        estadisticas = dict(_ESTADISTICAS)
+    return {**estadisticas, 'tamaño': len(_RESULTADOS)}
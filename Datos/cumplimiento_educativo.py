@@ -2,26 +2,85 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from modelo import version_modelo
+from graficos import figura, figura_caja, reducir_puntos
+from capa_analitica import obtener_indicadores
+from indicadores import NIVELES, columna, consultar, disponibles, etiqueta
+from instrumentacion import tramo
+from almacen_memoria import datos_sesion
+
+# Indicadores de flujo escolar de la pestaña, por municipio
+INDICADORES_RIESGO = ['deserci_n', 'aprobaci_n', 'repitencia', 'reprobaci_n']
+
 def show_tab():
     st.markdown("## 📉 Desempeño y Riesgo Educativo")
     st.caption("Analiza los indicadores clave como **deserción**, **aprobación** y **repitencia** a nivel departamental.")
 
-    if 'df_clean' not in st.session_state:
+    datos = datos_sesion()
+    almacen = None
+    if 'df_fact' in datos:
+        almacen = obtener_indicadores(datos['df_fact'], datos['dim_geo'], datos['dim_tiempo'], datos.get('df_clean'))
+    if almacen is None:
         st.warning("⚠️ Primero debes cargar y transformar los datos en la pestaña de Transformación.")
         return
+    dim_geo, dim_tiempo = datos['dim_geo'], datos['dim_tiempo']
+
+    # Selección de año y de nivel educativo (los indicadores vienen del almacén por nivel)
+    años_disponibles = sorted(dim_tiempo['a_o'])
+    col_año, col_nivel = st.columns(2)
+    año_seleccionado = col_año.selectbox("📅 Selecciona un año:", años_disponibles, index=len(años_disponibles)-1)
+    opciones = disponibles(almacen)
+    niveles = [n for n in NIVELES if all(n in opciones.get(i, []) for i in INDICADORES_RIESGO)]
+    if not niveles:
+        st.info("Ningún nivel educativo tiene datos de deserción, aprobación, repitencia y reprobación a la vez.")
+        return
+    nivel = col_nivel.selectbox("🎓 Nivel educativo:", niveles, format_func=lambda n: NIVELES[n][0])
+
+    with tramo("consulta indicadores"):
+        df_filtrado = consultar(almacen, [(i, nivel) for i in INDICADORES_RIESGO], dim_geo, dim_tiempo,
+                                ['departamento', 'municipio'], {'a_o': año_seleccionado})
+    df_filtrado = df_filtrado.rename(columns={columna(i, nivel): i for i in INDICADORES_RIESGO})
+    version = (version_modelo(datos['df_fact'], dim_geo, dim_tiempo), nivel)
+
+    # El año afecta a los dos gráficos; los departamentos solo al boxplot (fragmento)
+    _grafico_desercion(df_filtrado, año_seleccionado, nivel, version)
+
+    st.markdown("---")
+    st.subheader("📊 Comparativo de Indicadores Clave por Departamento")
+
+    st.markdown("---")
+    st.subheader("🧭 Comparativo 3D: Aprobación, Repitencia y Reprobación")
+
+    # Filtrado para valores válidos
+    df_3d = df_filtrado[['departamento', 'aprobaci_n', 'repitencia', 'reprobaci_n']].dropna()
 
-    df = st.session_state['df_clean']
+    def construir_3d():
+        # scatter_3d ya es WebGL; con muchos municipios se reduce por densidad
+        fig = px.scatter_3d(
+            reducir_puntos(df_3d, ['aprobaci_n', 'repitencia', 'reprobaci_n']),
+            x='aprobaci_n',
+            y='repitencia',
+            z='reprobaci_n',
+            color='departamento',
+            hover_name='departamento',
+            title=f"📌 Indicadores Clave por Departamento - {NIVELES[nivel][0]} - Año {año_seleccionado}",
+            labels={i: etiqueta(i, nivel) for i in ['aprobaci_n', 'repitencia', 'reprobaci_n']},
+            height=700
+        )
+        fig.update_layout(margin=dict(l=0, r=0, b=0, t=40))
+        return fig
 
-    # Selección de año
-    años_disponibles = sorted(df['a_o'].unique())
-    año_seleccionado = st.selectbox("📅 Selecciona un año:", años_disponibles, index=len(años_disponibles)-1)
-    df_filtrado = df[df['a_o'] == año_seleccionado]
+    fig_3d = figura(("3D indicadores", version, año_seleccionado), construir_3d)
+    puntos = sum(len(traza.x) for traza in fig_3d.data)
+    if puntos < len(df_3d):
+        st.caption(f"Se muestran {puntos:,} de {len(df_3d):,} municipios, muestreados según la densidad de puntos.")
 
-    # Normalizar nombre largo de San Andrés
-    df_filtrado['departamento'] = df_filtrado['departamento'].replace({
-        "Archipiélago De San Andrés Providencia Y Santa Catalina": "San Andrés"
-    })
+    with tramo("plotly 3D"):
+        st.plotly_chart(fig_3d, use_container_width=True)
 
+
+@st.fragment
+def _grafico_desercion(df_filtrado, año_seleccionado, nivel, version):
     st.subheader("📦 Distribución de la Deserción por Departamento")
 
     # Departamento selector interactivo (máx. 5 visibles en gráfico)
@@ -34,44 +93,20 @@ def show_tab():
         key="select_departamentos_boxplot"
     )
 
-    df_box = df_filtrado[df_filtrado['departamento'].isin(departamentos_seleccionados)]
-
-    fig_box = px.box(
-        df_box,
-        x="departamento",
-        y="deserci_n",
-        points="all",
-        color="departamento",
-        labels={"deserci_n": "Deserción (%)"},
-        title=f"Distribución de la Deserción - Año {año_seleccionado}"
-    )
-    fig_box.update_layout(showlegend=False, height=600, margin=dict(l=30, r=30, t=60, b=30))
-    st.plotly_chart(fig_box, use_container_width=True)
-
-    st.markdown("---")
-    st.subheader("📊 Comparativo de Indicadores Clave por Departamento")
-
-    st.markdown("---")
-    st.subheader("🧭 Comparativo 3D: Aprobación, Repitencia y Reprobación")
-
-    # Filtrado para valores válidos
-    df_3d = df_filtrado[['departamento', 'aprobaci_n', 'repitencia', 'reprobaci_n']].dropna()
-
-    fig_3d = px.scatter_3d(
-        df_3d,
-        x='aprobaci_n',
-        y='repitencia',
-        z='reprobaci_n',
-        color='departamento',
-        hover_name='departamento',
-        title=f"📌 Indicadores Clave por Departamento - Año {año_seleccionado}",
-        labels={
-            'aprobaci_n': 'Aprobación (%)',
-            'repitencia': 'Repitencia (%)',
-            'reprobaci_n': 'Reprobación (%)'
-        },
-        height=700
-    )
-    fig_3d.update_layout(margin=dict(l=0, r=0, b=0, t=40))
+    # Cuartiles y bigotes calculados aquí: al navegador solo van las cajas y los atípicos
+    def construir_caja():
+        df_box = df_filtrado[df_filtrado['departamento'].isin(departamentos_seleccionados)]
+        fig = figura_caja(
+            df_box,
+            x="departamento",
+            y="deserci_n",
+            labels={"deserci_n": etiqueta('deserci_n', nivel)},
+            title=f"Distribución de la Deserción ({NIVELES[nivel][0]}) - Año {año_seleccionado}"
+        )
+        fig.update_layout(showlegend=False, height=600, margin=dict(l=30, r=30, t=60, b=30))
+        return fig
 
-    st.plotly_chart(fig_3d, use_container_width=True)
+    clave = ("box deserción", version, año_seleccionado, tuple(departamentos_seleccionados))
+    fig_box = figura(clave, construir_caja)
+    with tramo("plotly box deserción"):
+        st.plotly_chart(fig_box, use_container_width=True)
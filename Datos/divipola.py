@@ -0,0 +1,164 @@
+import os
+import json
+import time
+
+import pandas as pd
+import requests
+
+# División Político-Administrativa de Colombia (DANE), municipios
+RUTA_CSV = os.path.join("Datos", "DIVIPOLA-_C_digos_municipios_20250723.csv")
+API_URL = "https://www.datos.gov.co/resource/gdxc-w37w.json"
+
+COLUMNAS = ['codigo_departamento', 'departamento', 'codigo_municipio', 'municipio',
+            'tipo_municipio', 'longitud', 'latitud']
+# Campos del dataset gdxc-w37w en la API de Socrata
+COLUMNAS_API = {
+    'cod_dpto': 'codigo_departamento', 'dpto': 'departamento',
+    'cod_mpio': 'codigo_municipio', 'nom_mpio': 'municipio',
+    'tipo_municipio': 'tipo_municipio', 'longitud': 'longitud', 'latitud': 'latitud',
+}
+TIPOS = {
+    'codigo_departamento': 'category', 'departamento': 'category',
+    'codigo_municipio': 'int32', 'municipio': 'category',
+    'tipo_municipio': 'category', 'longitud': 'float64', 'latitud': 'float64',
+}
+
+# Columnas que la DIVIPOLA agrega a dim_geo
+COLUMNAS_ENRIQUECIDAS = ['tipo_municipio', 'longitud', 'latitud']
+
+CACHE_DIR = os.path.join("Datos", "cache", "divipola")
+
+# Referencia vigente en este proceso
+_EN_MEMORIA: dict = {}
+
+
+def _huella(ruta: str) -> str:
+    info = os.stat(ruta)
+    return f"csv:{info.st_size}-{info.st_mtime_ns}"
+
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[COLUMNAS].copy()
+    df['codigo_departamento'] = df['codigo_departamento'].astype(str).str.strip().str.zfill(2)
+    df['codigo_municipio'] = pd.to_numeric(df['codigo_municipio'])
+    for col in ['longitud', 'latitud']:
+        # La API entrega texto y el CSV usa coma decimal
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+    return df.astype(TIPOS).sort_values('codigo_municipio', ignore_index=True)
+
+
+# ===================================================================
+# Función: leer_csv
+# ===================================================================
+def leer_csv(ruta: str = RUTA_CSV) -> pd.DataFrame:
+    """
+    Lee la DIVIPOLA publicada en CSV (coordenadas con coma decimal).
+    """
+    df = pd.read_csv(ruta, dtype={0: str, 2: str}, decimal=',')
+    df.columns = COLUMNAS
+    return _tipar(df)
+
+
+# ===================================================================
+# Función: descargar_api
+# ===================================================================
+def descargar_api(api_url: str = API_URL, timeout: float = 30) -> tuple[pd.DataFrame, str]:
+    """
+    Descarga la DIVIPOLA vigente desde datos.gov.co.
+
+    Returns:
+        tuple: (DataFrame con `COLUMNAS`, versión publicada según las cabeceras de Socrata).
+
+    Raises:
+        requests.RequestException: Si la API no responde o devuelve un error.
+        ValueError: Si la respuesta no trae los campos esperados.
+    """
+    response = requests.get(api_url, params={'$limit': 5000}, timeout=timeout)
+    response.raise_for_status()
+    df = pd.DataFrame(response.json())
+    faltantes = set(COLUMNAS_API) - set(df.columns)
+    if faltantes:
+        raise ValueError(f"La API de DIVIPOLA no trae los campos {sorted(faltantes)}")
+    headers = response.headers
+    version = (headers.get('X-SODA2-Truth-Last-Modified') or headers.get('Last-Modified')
+               or headers.get('ETag') or time.strftime("%Y-%m-%dT%H:%M:%S"))
+    return _tipar(df.rename(columns=COLUMNAS_API)), f"api:{version}"
+
+
+def _leer_meta() -> dict | None:
+    ruta_meta = os.path.join(CACHE_DIR, "meta.json")
+    if not (os.path.exists(ruta_meta) and os.path.exists(os.path.join(CACHE_DIR, "divipola.feather"))):
+        return None
+    with open(ruta_meta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_cache(df: pd.DataFrame, meta: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(CACHE_DIR, "divipola.feather")
+    df.to_feather(ruta + ".tmp")
+    os.replace(ruta + ".tmp", ruta)
+    ruta_meta = os.path.join(CACHE_DIR, "meta.json")
+    with open(ruta_meta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(ruta_meta + ".tmp", ruta_meta)
+
+
+def _publicar(df: pd.DataFrame, meta: dict) -> pd.DataFrame:
+    df.attrs.update(meta)
+    _EN_MEMORIA.clear()
+    _EN_MEMORIA[meta['version']] = df
+    return df
+
+
+# ===================================================================
+# Función: cargar_divipola
+# ===================================================================
+def cargar_divipola(ruta: str = RUTA_CSV) -> pd.DataFrame:
+    """
+    Devuelve la dimensión de referencia DIVIPOLA sin tocar la red.
+
+    Se usa la última versión guardada en `CACHE_DIR`: la descargada con
+    `actualizar_divipola` o, si nunca se actualizó, la del CSV local (que se
+    vuelve a leer solo si el archivo cambia).
+
+    Returns:
+        pd.DataFrame: Una fila por municipio con `COLUMNAS`; `codigo_municipio`
+        es entero. En `attrs` quedan 'origen' ('csv' o 'api'), 'version' y
+        'guardado'. Se comparte y no debe modificarse.
+
+    Raises:
+        FileNotFoundError: Si no hay caché ni CSV local.
+    """
+    meta = _leer_meta()
+    if meta is not None:
+        vigente = meta['origen'] == 'api' or (os.path.exists(ruta) and meta['version'] == _huella(ruta))
+        if vigente:
+            if meta['version'] in _EN_MEMORIA:
+                return _EN_MEMORIA[meta['version']]
+            return _publicar(pd.read_feather(os.path.join(CACHE_DIR, "divipola.feather")), meta)
+
+    df = leer_csv(ruta)
+    meta = {'origen': 'csv', 'version': _huella(ruta), 'guardado': time.strftime("%Y-%m-%d %H:%M:%S")}
+    _guardar_cache(df, meta)
+    return _publicar(df, meta)
+
+
+# ===================================================================
+# Función: actualizar_divipola
+# ===================================================================
+def actualizar_divipola(api_url: str = API_URL) -> pd.DataFrame:
+    """
+    Descarga la DIVIPOLA de la API y la deja como referencia vigente.
+
+    Solo se llama cuando el usuario lo pide; el resto del tiempo la app
+    trabaja con la copia guardada.
+
+    Raises:
+        requests.RequestException, ValueError: Como en `descargar_api`.
+    """
+    df, version = descargar_api(api_url)
+    meta = {'origen': 'api', 'version': version, 'guardado': time.strftime("%Y-%m-%d %H:%M:%S")}
+    _guardar_cache(df, meta)
+    return _publicar(df, meta)
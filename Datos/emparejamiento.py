@@ -0,0 +1,278 @@
+import os
+import json
+import hashlib
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from modelo import hash_datos, normalizar_nombres
+from cache_lru import CacheLRU
+from divipola import COLUMNAS_ENRIQUECIDAS, cargar_divipola
+
+# Columnas con las que se comparan las dos fuentes
+COLUMNAS_CRUCE = ['codigo_departamento', 'departamento', 'codigo_municipio', 'municipio']
+
+# Similitud mínima para aceptar una coincidencia difusa
+UMBRAL = 0.8
+# Similitud asignada cuando las palabras de un nombre contienen a las del otro
+# ("Archipiélago de San Andrés" frente al nombre completo del departamento)
+SIMILITUD_CONTENCION = 0.9
+
+CACHE_DIR = os.path.join("Datos", "cache", "cruces")
+
+# Cruces ya calculados en este proceso: {nombre: (version, cruce)}
+_EN_MEMORIA: dict = {}
+# dim_geo ya enriquecidas con la DIVIPOLA
+MAX_ENRIQUECIDAS = 4
+_ENRIQUECIDAS = CacheLRU(MAX_ENRIQUECIDAS)
+
+
+def _contiene(a: str, b: str) -> bool:
+    palabras_a, palabras_b = set(a.split()), set(b.split())
+    return bool(palabras_a and palabras_b) and (palabras_a <= palabras_b or palabras_b <= palabras_a)
+
+
+def _mejor_candidato(llave: str, candidatos: list) -> tuple:
+    """
+    Devuelve el candidato más parecido a `llave` y su similitud.
+
+    La similitud es la de difflib, salvo que las palabras de uno de los dos
+    nombres contengan a las del otro y ningún otro candidato cumpla lo mismo
+    ("Cúcuta" y "San José de Cúcuta"); si varios la cumplen ("San Pedro" en
+    Antioquia) la contención no decide y vale solo difflib.
+    """
+    similitudes = [SequenceMatcher(None, llave, c, autojunk=False).ratio() for c in candidatos]
+    contenidos = [i for i, c in enumerate(candidatos) if _contiene(llave, c)]
+    if len(contenidos) == 1:
+        similitudes[contenidos[0]] = max(similitudes[contenidos[0]], SIMILITUD_CONTENCION)
+    if not similitudes:
+        return None, 0.0
+    mejor = int(np.argmax(similitudes))
+    return candidatos[mejor], similitudes[mejor]
+
+
+# ===================================================================
+# Función: emparejar_nombres
+# ===================================================================
+def emparejar_nombres(origen, referencia, umbral: float = UMBRAL) -> pd.DataFrame:
+    """
+    Empareja cada nombre de `origen` con un nombre de `referencia`.
+
+    Primero por llave normalizada exacta y, para los que quedan, por la
+    referencia más parecida (difflib) con similitud de al menos `umbral`.
+
+    Args:
+        origen (array-like): Nombres a emparejar.
+        referencia (array-like): Nombres válidos.
+        umbral (float): Similitud mínima de una coincidencia difusa (0-1).
+
+    Returns:
+        pd.DataFrame: Indexado por los valores únicos de `origen`, con las columnas
+        'referencia' (None si no hubo coincidencia), 'metodo' ('exacto',
+        'difuso' o 'sin_coincidencia') y 'similitud'.
+    """
+    nombres = pd.Series(pd.unique(pd.Series(origen).dropna()), dtype=object)
+    nombres_ref = pd.Series(pd.unique(pd.Series(referencia).dropna()), dtype=object)
+    llaves = normalizar_nombres(nombres)
+    por_llave = dict(zip(normalizar_nombres(nombres_ref), nombres_ref))
+
+    filas = []
+    for nombre, llave in zip(nombres, llaves):
+        if llave in por_llave:
+            filas.append((por_llave[llave], 'exacto', 1.0))
+            continue
+        candidato, similitud = _mejor_candidato(llave, list(por_llave))
+        if candidato is not None and similitud >= umbral:
+            filas.append((por_llave[candidato], 'difuso', similitud))
+        else:
+            filas.append((None, 'sin_coincidencia', similitud))
+    return pd.DataFrame(filas, columns=['referencia', 'metodo', 'similitud'], index=pd.Index(nombres, name='origen'))
+
+
+# ===================================================================
+# Función: emparejar
+# ===================================================================
+def emparejar(origen: pd.DataFrame, referencia: pd.DataFrame, umbral: float = UMBRAL) -> pd.DataFrame:
+    """
+    Asigna a cada municipio de `origen` su código DIVIPOLA en `referencia`.
+
+    Se trabaja sobre las combinaciones únicas de `COLUMNAS_CRUCE`, en tres pasos:
+        1. Código de municipio exacto, si `origen` lo trae y existe en la referencia.
+        2. Nombre de municipio normalizado exacto, dentro del mismo departamento.
+        3. Nombre más parecido (difflib) dentro del mismo departamento.
+    El departamento se toma por código; si falta, se empareja por nombre.
+
+    Args:
+        origen (pd.DataFrame): Columnas `COLUMNAS_CRUCE`; los códigos pueden ser nulos.
+        referencia (pd.DataFrame): Columnas `COLUMNAS_CRUCE`, p. ej. `referencia_divipola()`.
+        umbral (float): Similitud mínima de una coincidencia difusa (0-1).
+
+    Returns:
+        pd.DataFrame: Las combinaciones únicas de `origen` con 'codigo' (Int32,
+        código DIVIPOLA del municipio), 'metodo' ('codigo', 'exacto', 'difuso'
+        o 'sin_coincidencia') y 'similitud'.
+    """
+    cruce = origen[COLUMNAS_CRUCE].astype(object).drop_duplicates(ignore_index=True)
+    cruce['codigo'] = pd.array([pd.NA] * len(cruce), dtype='Int32')
+    cruce['metodo'] = 'sin_coincidencia'
+    cruce['similitud'] = 0.0
+
+    # 1. Código de municipio
+    codigos_ref = set(referencia['codigo_municipio'].astype(str))
+    por_codigo = cruce['codigo_municipio'].notna() & cruce['codigo_municipio'].astype(str).isin(codigos_ref)
+    cruce.loc[por_codigo, 'codigo'] = cruce.loc[por_codigo, 'codigo_municipio'].astype(int)
+    cruce.loc[por_codigo, ['metodo', 'similitud']] = ['codigo', 1.0]
+
+    # Bloque: código de departamento (o el que corresponde a su nombre)
+    departamentos_ref = referencia.drop_duplicates('codigo_departamento')
+    deptos = emparejar_nombres(cruce['departamento'], departamentos_ref['departamento'], umbral)
+    codigo_por_nombre = dict(zip(departamentos_ref['departamento'], departamentos_ref['codigo_departamento']))
+    bloque = cruce['codigo_departamento'].where(
+        cruce['codigo_departamento'].notna(),
+        cruce['departamento'].map(deptos['referencia']).map(codigo_por_nombre)
+    )
+
+    # 2 y 3. Nombre del municipio dentro de cada departamento
+    pendientes = ~por_codigo & bloque.notna()
+    for codigo_depto, filas in cruce[pendientes].groupby(bloque[pendientes]):
+        candidatos = referencia[referencia['codigo_departamento'] == codigo_depto]
+        if candidatos.empty:
+            continue
+        parejas = emparejar_nombres(filas['municipio'], candidatos['municipio'], umbral)
+        codigo_por_municipio = dict(zip(candidatos['municipio'], candidatos['codigo_municipio'].astype(int)))
+        resultado = parejas.reindex(filas['municipio'].to_numpy())
+        encontrados = resultado['referencia'].notna().to_numpy()
+        indices = filas.index[encontrados]
+        cruce.loc[indices, 'codigo'] = resultado['referencia'][encontrados].map(codigo_por_municipio).to_numpy()
+        cruce.loc[filas.index, 'metodo'] = resultado['metodo'].to_numpy()
+        cruce.loc[filas.index, 'similitud'] = resultado['similitud'].to_numpy()
+
+    return cruce.astype({'metodo': 'category', 'similitud': 'float32'})
+
+
+# ===================================================================
+# Función: referencia_divipola
+# ===================================================================
+def referencia_divipola(divipola: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Devuelve los municipios de la DIVIPOLA (por defecto la vigente) con las columnas `COLUMNAS_CRUCE`.
+    """
+    divipola = cargar_divipola() if divipola is None else divipola
+    return pd.DataFrame({
+        'codigo_departamento': divipola['codigo_departamento'].astype(str),
+        'departamento': divipola['departamento'].astype(str),
+        'codigo_municipio': divipola['codigo_municipio'].astype(str).str.zfill(5),
+        'municipio': divipola['municipio'].astype(str),
+    })
+
+
+def _origen(dim_geo: pd.DataFrame) -> pd.DataFrame:
+    # Municipios de dim_geo con las columnas `COLUMNAS_CRUCE`, como texto
+    return pd.DataFrame({
+        'codigo_departamento': dim_geo['c_digo_departamento'].astype(str),
+        'departamento': dim_geo['departamento'].astype(str),
+        'codigo_municipio': dim_geo['c_digo_municipio'].astype(str),
+        'municipio': dim_geo['municipio'].astype(str),
+    })
+
+
+def _version(origen: pd.DataFrame, referencia: pd.DataFrame, umbral: float) -> str:
+    # hash_datos se recuerda por objeto: repetir el cruce con los mismos DataFrames no recorre los datos
+    partes = [hash_datos(origen), hash_datos(referencia), str(umbral)]
+    return hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+# ===================================================================
+# Función: cruce
+# ===================================================================
+def cruce(origen: pd.DataFrame, referencia: pd.DataFrame, nombre: str, umbral: float = UMBRAL) -> pd.DataFrame:
+    """
+    Devuelve la tabla de equivalencias de `emparejar`, calculándola una sola
+    vez por versión de las dos fuentes.
+
+    El resultado se guarda en `CACHE_DIR` (Feather) con la versión de sus
+    entradas, así que con una nueva publicación del MEN o de la DIVIPOLA se
+    vuelve a emparejar y, mientras tanto, unir es un cruce por código entero.
+
+    Args:
+        origen, referencia (pd.DataFrame): Como en `emparejar`.
+        nombre (str): Nombre del cruce (archivo en la caché).
+        umbral (float): Similitud mínima de una coincidencia difusa (0-1).
+
+    Returns:
+        pd.DataFrame: Tabla de equivalencias; se comparte y no debe modificarse.
+    """
+    version = _version(origen, referencia, umbral)
+    if nombre in _EN_MEMORIA and _EN_MEMORIA[nombre][0] == version:
+        return _EN_MEMORIA[nombre][1]
+
+    ruta = os.path.join(CACHE_DIR, f"{nombre}.feather")
+    ruta_meta = os.path.join(CACHE_DIR, f"{nombre}.meta.json")
+    tabla = None
+    if os.path.exists(ruta_meta) and os.path.exists(ruta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            if json.load(f).get('version') == version:
+                tabla = pd.read_feather(ruta)
+
+    if tabla is None:
+        tabla = emparejar(origen, referencia, umbral)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tabla.to_feather(ruta + ".tmp")
+        os.replace(ruta + ".tmp", ruta)
+        with open(ruta_meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({'version': version}, f)
+        os.replace(ruta_meta + ".tmp", ruta_meta)
+
+    _EN_MEMORIA[nombre] = (version, tabla)
+    return tabla
+
+
+# ===================================================================
+# Función: equivalencias_dim_geo
+# ===================================================================
+def equivalencias_dim_geo(dim_geo: pd.DataFrame, divipola: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Tabla de equivalencias (`cruce`) entre los municipios de dim_geo y la DIVIPOLA.
+    """
+    return cruce(_origen(dim_geo), referencia_divipola(divipola), 'men_divipola')
+
+
+# ===================================================================
+# Función: enriquecer_dim_geo
+# ===================================================================
+def enriquecer_dim_geo(dim_geo: pd.DataFrame, divipola: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Agrega a dim_geo el tipo de municipio y las coordenadas de la DIVIPOLA.
+
+    Cada municipio se une por el código DIVIPOLA que le asigna el cruce
+    (`equivalencias_dim_geo`), no por el código del MEN, así que los
+    municipios emparejados por nombre también reciben sus datos. El resultado
+    se recuerda por versión de dim_geo y de la referencia, así que en cada
+    rerun se devuelve el mismo objeto.
+
+    Args:
+        dim_geo (pd.DataFrame): Dimensión geográfica del modelo.
+        divipola (pd.DataFrame | None): Referencia; por defecto `cargar_divipola()`.
+
+    Returns:
+        pd.DataFrame: dim_geo con `COLUMNAS_ENRIQUECIDAS` (nulas si el
+        municipio no tiene equivalente en la DIVIPOLA).
+    """
+    divipola = cargar_divipola() if divipola is None else divipola
+    clave = (hash_datos(dim_geo), divipola.attrs.get('version') or hash_datos(divipola))
+    enriquecida = _ENRIQUECIDAS.obtener(clave)
+    if enriquecida is not None:
+        return enriquecida
+
+    equivalencias = equivalencias_dim_geo(dim_geo, divipola)
+    filas = pd.MultiIndex.from_frame(equivalencias[COLUMNAS_CRUCE].astype(str)) \
+        .get_indexer(pd.MultiIndex.from_frame(_origen(dim_geo)))
+    codigos = equivalencias['codigo'].array.take(filas, allow_fill=True)
+    posiciones = pd.Index(divipola['codigo_municipio']).get_indexer(codigos.fillna(-1).astype(np.int64))
+
+    enriquecida = dim_geo.drop(columns=COLUMNAS_ENRIQUECIDAS, errors='ignore')
+    for col in COLUMNAS_ENRIQUECIDAS:
+        enriquecida[col] = divipola[col].array.take(posiciones, allow_fill=True)
+
+    return _ENRIQUECIDAS.guardar(clave, enriquecida)
@@ -0,0 +1,198 @@
+"""
+ETL sin interfaz del modelo estrella de educación.
+
+Carga los datos del MEN (API, CSV local o caché), limpia y agrega cada año en
+un proceso aparte, arma dim_tiempo, dim_geo y la tabla de hechos y deja todo,
+con los cubos de la capa analítica y el almacén de indicadores por nivel
+educativo, en la base SQLite que lee la app. Así la app arranca con el modelo
+ya materializado.
+
+Uso (desde la raíz del repositorio):
+    python Datos/etl.py --fuente csv
+    python Datos/etl.py --fuente api --procesos 4
+"""
+import os
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from modelo import COLUMNAS_HECHOS, columnas_faltantes, crear_indicadores, hash_datos, modelo_desde_limpios, \
+    normalizar_columnas, validar_datos
+from cargar_datos import API_URL, COLUMNAS_TRANSFORMACION, RUTA_CSV, consultar_version, \
+    fetch_paginado, guardar_cache, leer_cache, leer_csv
+from almacen_sqlite import RUTA_DB, guardar_cubos, guardar_indicadores, guardar_modelo
+from capa_analitica import NIVELES_CUBO
+from divipola import cargar_divipola
+
+FUENTES = ['api', 'csv', 'cache']
+
+
+# ===================================================================
+# Función: cargar_fuente
+# ===================================================================
+def cargar_fuente(fuente: str, ruta_csv: str = RUTA_CSV, api_url: str = API_URL,
+                  limite: int | None = None) -> pd.DataFrame:
+    """
+    Carga los datos crudos del MEN con las columnas de la transformación.
+
+    Args:
+        fuente (str): 'api' (descarga y actualiza la caché local), 'csv' o 'cache'.
+        ruta_csv (str): Archivo a leer con la fuente 'csv'.
+        api_url (str): Endpoint de la API de Socrata.
+        limite (int | None): Máximo de registros a descargar de la API (para pruebas).
+
+    Returns:
+        pd.DataFrame: Datos crudos (`df_raw`).
+
+    Raises:
+        FileNotFoundError: Si se pide la caché y no hay copia local.
+        requests.exceptions.RequestException: Si falla la descarga.
+    """
+    if fuente == 'csv':
+        return leer_csv(ruta_csv)
+    if fuente == 'cache':
+        cache = leer_cache(api_url)
+        if cache is None:
+            raise FileNotFoundError("No hay copia local del dataset; usa --fuente api o --fuente csv")
+        return cache[0]
+
+    version = consultar_version(api_url)
+    df = fetch_paginado(api_url, COLUMNAS_TRANSFORMACION, limit=limite)
+    if limite is None:
+        # La misma copia local que usa la pestaña de carga
+        guardar_cache(df, version, COLUMNAS_TRANSFORMACION, api_url)
+    return df
+
+
+# ===================================================================
+# Función: procesar_año
+# ===================================================================
+def procesar_año(df_año: pd.DataFrame, divipola: pd.DataFrame | None = None) -> tuple:
+    """
+    Valida los registros de un año (ya normalizados) y calcula sus cubos.
+
+    Cada cubo agrupa por año, así que los de años distintos no se mezclan y
+    basta con concatenarlos.
+
+    Returns:
+        tuple: (df_clean del año, {nivel: cubo del año}, registros en cuarentena).
+    """
+    validacion = validar_datos(df_año, divipola)
+    df_clean = validacion['limpio']
+    cubos = {
+        nivel: df_clean.groupby(claves + ['a_o'], observed=True)[COLUMNAS_HECHOS].mean()
+        for nivel, claves in NIVELES_CUBO.items()
+    }
+    return df_clean, cubos, len(validacion['cuarentena'])
+
+
+# ===================================================================
+# Función: ejecutar
+# ===================================================================
+def ejecutar(df_raw: pd.DataFrame, procesos: int | None = None, ruta_db: str = RUTA_DB,
+             divipola: pd.DataFrame | None = None) -> dict:
+    """
+    Construye el modelo, los cubos y el almacén de indicadores desde `df_raw`
+    y los guarda en SQLite.
+
+    Args:
+        df_raw (pd.DataFrame): Datos crudos del MEN.
+        procesos (int | None): Procesos para los años; por defecto uno por CPU.
+            Con 1 todo corre en el proceso actual.
+        ruta_db (str): Archivo SQLite de destino.
+        divipola (pd.DataFrame | None): Referencia para validar los códigos de municipio.
+
+    Returns:
+        dict: Resumen con versión, filas, años, registros en cuarentena, valores
+        del almacén de indicadores y tiempos por etapa (segundos).
+
+    Raises:
+        ValueError: Si faltan columnas requeridas o no queda ningún registro válido.
+    """
+    faltantes = columnas_faltantes(df_raw)
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas: {faltantes}")
+
+    tiempos = {}
+    inicio = time.perf_counter()
+    df_raw = normalizar_columnas(df_raw)
+    años = pd.to_numeric(df_raw['a_o'], errors='coerce')
+    # Las filas sin año válido forman su propio grupo y la validación las deja en cuarentena
+    particiones = [grupo for _, grupo in df_raw.groupby(años, sort=True, dropna=False)]
+    procesos = min(procesos or os.cpu_count() or 1, max(len(particiones), 1))
+    procesar = partial(procesar_año, divipola=divipola)
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(procesar, particiones))
+    else:
+        resultados = [procesar(p) for p in particiones]
+    cuarentena = sum(n for _, _, n in resultados)
+    resultados = [(limpio, cubos) for limpio, cubos, _ in resultados if len(limpio)]
+    if not resultados:
+        raise ValueError("No quedó ningún registro válido después de la limpieza")
+    tiempos['limpieza_y_cubos'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    df_clean, dim_tiempo, dim_geo, df_fact = modelo_desde_limpios([limpio for limpio, _ in resultados])
+    cubos = {
+        nivel: pd.concat([c[nivel] for _, c in resultados]).sort_index()
+        for nivel in NIVELES_CUBO
+    }
+    indicadores = crear_indicadores(df_clean, dim_tiempo, dim_geo)
+    tiempos['modelo'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    version = hash_datos(df_fact)
+    guardar_modelo(df_fact, dim_geo, dim_tiempo, version, ruta_db)
+    guardar_cubos(cubos, version, ruta_db)
+    guardar_indicadores(indicadores, version, ruta_db)
+    tiempos['guardado'] = time.perf_counter() - inicio
+
+    return {
+        'version': version,
+        'registros_originales': len(df_raw),
+        'registros_validos': len(df_clean),
+        'cuarentena': cuarentena,
+        'años': len(dim_tiempo),
+        'municipios': len(dim_geo),
+        'valores_indicadores': len(indicadores),
+        'procesos': procesos,
+        'tiempos': tiempos,
+    }
+
+
+def main(argv: list | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Construye y guarda el modelo estrella de educación sin abrir la app.")
+    parser.add_argument("--fuente", choices=FUENTES, default='api', help="Origen de los datos del MEN (por defecto: api)")
+    parser.add_argument("--csv", default=RUTA_CSV, help="Archivo CSV para --fuente csv")
+    parser.add_argument("--api-url", default=API_URL, help="Endpoint de la API de Socrata")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de registros a descargar de la API")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto: uno por CPU)")
+    parser.add_argument("--db", default=RUTA_DB, help=f"Base SQLite de destino (por defecto: {RUTA_DB})")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    df_raw = cargar_fuente(args.fuente, args.csv, args.api_url, args.limite)
+    carga = time.perf_counter() - inicio
+    print(f"📥 {len(df_raw):,} registros cargados desde {args.fuente} en {carga:.2f} s")
+
+    try:
+        divipola = cargar_divipola()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Sin DIVIPOLA no se validan los códigos de municipio: {e}")
+        divipola = None
+
+    resumen = ejecutar(df_raw, args.procesos, args.db, divipola)
+    print(f"🧹 {resumen['registros_validos']:,} registros válidos, {resumen['cuarentena']:,} en cuarentena, "
+          f"{resumen['años']} años, {resumen['municipios']:,} municipios ({resumen['procesos']} procesos)")
+    print(f"🗂️ {resumen['valores_indicadores']:,} valores en el almacén de indicadores")
+    for etapa, segundos in resumen['tiempos'].items():
+        print(f"   {etapa}: {segundos:.2f} s")
+    print(f"✅ Modelo {resumen['version'][:12]} guardado en {args.db}")
+
+
+if __name__ == "__main__":
+    main()
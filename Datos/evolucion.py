@@ -1,45 +1,61 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from modelo import version_modelo
+from capa_analitica import obtener_capa, serie_departamento, top_k
+from graficos import figura
+from instrumentacion import tramo
+from almacen_memoria import datos_sesion
+
 UST_BLUE = "#002855"
 UST_YELLOW = "#FFD100"
 
+METRICA = 'tasa_matriculaci_n_5_16'
+
 def show_tab():
     st.title("📈 Evolución de Indicadores Educativos")
 
-    if 'df_fact' not in st.session_state:
+    datos = datos_sesion()
+    if 'df_fact' not in datos:
         st.warning("⚠️ Primero debes construir la tabla de hechos en la pestaña 'Transformación'.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    dim_tiempo = st.session_state['dim_tiempo']
+    modelo = (datos['df_fact'], datos['dim_geo'], datos['dim_tiempo'])
+    # Indicadores como arreglo municipio × año × indicador: los selectores solo indexan
+    tensor = obtener_capa(*modelo)['tensor']
+    deptos = list(tensor['departamentos'])
+
+    # Cada gráfico es un fragmento: cambiar su selector solo vuelve a dibujar ese gráfico
+    _grafico_top10(tensor, deptos)
+    _grafico_heatmap(tensor, deptos, version_modelo(*modelo))
 
-    # Merge completo
-    df = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
-    df['departamento'] = df['departamento'].str.title()
-    df['municipio'] = df['municipio'].str.title()
 
+@st.fragment
+def _grafico_top10(tensor, deptos):
     st.subheader("🏆 Top 10 Municipios por Tasa de Matrícula")
 
     # Selector de departamento
-    deptos = sorted(df['departamento'].unique())
-    selected_depto = st.selectbox("Selecciona un departamento", deptos)
+    selected_depto = st.selectbox("Selecciona un departamento", deptos, key="evolucion_depto")
 
     # Selector de año
-    años = sorted(df['a_o'].unique())
+    años = tensor['años'].tolist()
     selected_year = st.selectbox("Selecciona un año", años, index=len(años)-1)
 
-    # Filtrar por departamento y año
-    df_filtered = df[(df['departamento'] == selected_depto) & (df['a_o'] == selected_year)]
+    # Top 10 municipios del departamento en el año (columna del departamento en el tensor)
+    valores = serie_departamento(tensor, METRICA, selected_depto)[:, años.index(selected_year)]
+    posiciones = top_k(valores, 10)
 
-    if df_filtered.empty:
+    if len(posiciones) == 0:
         st.warning("No hay datos disponibles para ese año y departamento.")
         return
 
-    # Top 10 municipios
-    top10 = df_filtered.groupby('municipio')['tasa_matriculaci_n_5_16'].mean().nlargest(10).reset_index()
+    municipios = tensor['geo']['municipio'].to_numpy()[tensor['departamentos'][selected_depto]]
+    top10 = pd.DataFrame({
+        'municipio': pd.Series(municipios[posiciones], dtype=str).str.title(),
+        METRICA: valores[posiciones],
+    })
 
     # Gráfico
     fig = px.bar(
@@ -60,49 +76,63 @@ def show_tab():
         plot_bgcolor="#F5F5F5"
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with tramo("plotly top 10"):
+        st.plotly_chart(fig, use_container_width=True)
 
+
+@st.fragment
+def _grafico_heatmap(tensor, deptos, version):
     st.markdown("---")
     st.subheader("🌡️ Mapa de Calor: Intensidad de Matrícula por Municipio y Año")
 
-    selected_depto_heat = st.selectbox("Selecciona un departamento (heatmap)", deptos, index=deptos.index(selected_depto))
+    # Arranca en el departamento del top 10; después es independiente
+    inicial = st.session_state.get("evolucion_depto", deptos[0])
+    selected_depto_heat = st.selectbox("Selecciona un departamento (heatmap)", deptos,
+                                       index=deptos.index(inicial) if inicial in deptos else 0)
 
-    df_heat = df[df['departamento'] == selected_depto_heat]
-    df_heat = df_heat.groupby(['municipio', 'a_o'])['tasa_matriculaci_n_5_16'].mean().reset_index()
+    fig3 = figura(("heatmap matrícula", version, selected_depto_heat),
+                  lambda: _figura_heatmap(tensor, selected_depto_heat))
 
-    if df_heat.empty:
+    if fig3 is None:
         st.warning("No hay datos para este departamento.")
     else:
-        # 🔹 Calcular top 10 municipios por promedio general
-        top_municipios = (
-            df_heat.groupby('municipio')['tasa_matriculaci_n_5_16']
-            .mean()
-            .nlargest(10)
-            .index
-        )
-
-        df_top = df_heat[df_heat['municipio'].isin(top_municipios)]
-
-        # 🔧 Convertir año a entero para que no aparezca como 2023.0
-        df_top['a_o'] = df_top['a_o'].astype(int)
-
-        # 🔁 Pivot para heatmap
-        pivot_heat = df_top.pivot(index="municipio", columns="a_o", values="tasa_matriculaci_n_5_16")
-        pivot_heat = pivot_heat.fillna(0)
-
-        # 📊 Crear heatmap
-        fig3 = px.imshow(
-            pivot_heat,
-            labels=dict(color="Tasa de Matrícula (%)"),
-            color_continuous_scale="YlGnBu",
-            aspect="auto",
-            title=f"Top 10 Municipios por Tasa de Matrícula - {selected_depto_heat}"
-        )
-
-        fig3.update_layout(
-            xaxis_title="Año",
-            yaxis_title="Municipio",
-            height=600
-        )
-
-        st.plotly_chart(fig3, use_container_width=True)
+        with tramo("plotly heatmap"):
+            st.plotly_chart(fig3, use_container_width=True)
+
+
+def _figura_heatmap(tensor, depto):
+    # Municipio × año del departamento: vista del tensor, sin filtrar ni pivotar
+    matriz = serie_departamento(tensor, METRICA, depto)
+    con_dato = ~np.isnan(matriz)
+    if not con_dato.any():
+        return None
+
+    # 🔹 Top 10 municipios por promedio general (en orden alfabético, como el pivot)
+    conteo = con_dato.sum(axis=1)
+    promedios = np.where(conteo > 0, np.nansum(matriz, axis=1) / np.maximum(conteo, 1), np.nan)
+    elegidos = np.sort(top_k(promedios, 10))
+
+    # Solo los años con algún dato para esos municipios
+    columnas = con_dato[elegidos].any(axis=0)
+    municipios = tensor['geo']['municipio'].to_numpy()[tensor['departamentos'][depto]][elegidos]
+    pivot_heat = pd.DataFrame(
+        np.nan_to_num(matriz[elegidos][:, columnas]),
+        index=pd.Index(pd.Series(municipios, dtype=str).str.title(), name="municipio"),
+        columns=pd.Index(tensor['años'][columnas].astype(int), name="a_o"),
+    )
+
+    # 📊 Crear heatmap
+    fig = px.imshow(
+        pivot_heat,
+        labels=dict(color="Tasa de Matrícula (%)"),
+        color_continuous_scale="YlGnBu",
+        aspect="auto",
+        title=f"Top 10 Municipios por Tasa de Matrícula - {depto}"
+    )
+
+    fig.update_layout(
+        xaxis_title="Año",
+        yaxis_title="Municipio",
+        height=600
+    )
+    return fig
@@ -0,0 +1,154 @@
+import os
+import time
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from modelo import COLUMNAS_GEO, COLUMNAS_HECHOS, hash_datos
+from capa_analitica import obtener_capa
+
+# Formatos de descarga de la tabla de hechos
+FORMATOS = {
+    'xlsx': {'nombre': 'Excel (.xlsx)',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'csv.gz': {'nombre': 'CSV comprimido (.csv.gz)', 'mime': 'application/gzip'},
+    'parquet': {'nombre': 'Parquet (.parquet)', 'mime': 'application/vnd.apache.parquet'},
+}
+
+CACHE_DIR = os.path.join("Datos", "cache", "exportaciones")
+NOMBRE_ARCHIVO = "tabla_hechos_educacion"
+
+# Filas por bloque al escribir; acota la memoria usada por la conversión
+FILAS_POR_BLOQUE = 50_000
+
+# Archivos exportados que se conservan (los usados más recientemente) y edad
+# a partir de la cual un temporal se da por abandonado
+MAX_ARCHIVOS = 6
+MAX_EDAD_TEMPORAL = 3600
+
+
+def _tabla(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame, unir: bool) -> pd.DataFrame:
+    if not unir:
+        return df_fact
+    # La vista ancha ya está materializada en la capa analítica
+    vista = obtener_capa(df_fact, dim_geo, dim_tiempo)['vista']
+    return vista[['id_tiempo', 'a_o', 'id_geo'] + COLUMNAS_GEO + COLUMNAS_HECHOS]
+
+
+def _escribir_xlsx(df: pd.DataFrame, ruta: str) -> None:
+    # Modo write_only: las filas se escriben en streaming sin armar el libro en memoria
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('TablaHechos')
+    hoja.append(list(df.columns))
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE].astype(object)
+        for fila in bloque.where(bloque.notna(), None).itertuples(index=False, name=None):
+            hoja.append(fila)
+    libro.save(ruta)
+
+
+def _escribir_csv_gz(df: pd.DataFrame, ruta: str) -> None:
+    df.to_csv(ruta, index=False, chunksize=FILAS_POR_BLOQUE,
+              compression={'method': 'gzip', 'compresslevel': 6, 'mtime': 0})
+
+
+def _escribir_parquet(df: pd.DataFrame, ruta: str) -> None:
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(ruta, esquema, compression='zstd') as escritor:
+        for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+            bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE]
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+
+
+_ESCRITORES = {'xlsx': _escribir_xlsx, 'csv.gz': _escribir_csv_gz, 'parquet': _escribir_parquet}
+
+
+def _borrar(ruta: str) -> None:
+    # Otra sesión puede haberlo borrado ya
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _podar(conservar: str) -> None:
+    # Quedan los MAX_ARCHIVOS usados más recientemente (y siempre `conservar`);
+    # los temporales de otras sesiones se respetan mientras sean recientes
+    archivos, ahora = [], time.time()
+    for entrada in os.scandir(CACHE_DIR):
+        try:
+            modificado = entrada.stat().st_mtime
+        except FileNotFoundError:
+            continue
+        if entrada.name.endswith(".tmp"):
+            if ahora - modificado > MAX_EDAD_TEMPORAL:
+                _borrar(entrada.path)
+        elif entrada.path != conservar:
+            archivos.append((modificado, entrada.path))
+    for _, ruta in sorted(archivos, reverse=True)[MAX_ARCHIVOS - 1:]:
+        _borrar(ruta)
+
+
+# ===================================================================
+# Función: ruta_exportacion
+# ===================================================================
+def ruta_exportacion(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+                     formato: str, unir: bool = False) -> str:
+    """
+    Devuelve la ruta del archivo exportado para esta versión del modelo.
+
+    El nombre incluye el hash de la tabla de hechos (y de las dimensiones si
+    se unen), así que el archivo existe solo si ya se generó esta versión.
+    """
+    if formato not in FORMATOS:
+        raise KeyError(f"Formato desconocido: {formato}")
+    version = hash_datos(df_fact)[:16]
+    if unir:
+        version += "-" + hash_datos(dim_geo)[:8] + hash_datos(dim_tiempo)[:8]
+    return os.path.join(CACHE_DIR, f"{NOMBRE_ARCHIVO}_{version}.{formato}")
+
+
+# ===================================================================
+# Función: exportar
+# ===================================================================
+def exportar(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+             formato: str, unir: bool = False) -> str:
+    """
+    Genera (si hace falta) el archivo de descarga de la tabla de hechos.
+
+    Los archivos se escriben por bloques y quedan en `CACHE_DIR`, uno por
+    versión, formato y opción de unión; pedir de nuevo la misma descarga solo
+    devuelve la ruta. Cada archivo se escribe en un temporal propio y se
+    publica con `os.replace`, así que varias sesiones pueden exportar a la
+    vez; al publicar se conservan solo los `MAX_ARCHIVOS` más recientes.
+
+    Args:
+        df_fact, dim_geo, dim_tiempo: Modelo construido por `modelo.construir_modelo`.
+        formato (str): Una llave de `FORMATOS`.
+        unir (bool): Si True, incluye las columnas de dim_geo y dim_tiempo.
+
+    Returns:
+        str: Ruta del archivo generado.
+    """
+    ruta = ruta_exportacion(df_fact, dim_geo, dim_tiempo, formato, unir)
+    try:
+        # Marca el archivo como usado para que la poda lo conserve
+        os.utime(ruta)
+        return ruta
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=CACHE_DIR, prefix=os.path.basename(ruta) + ".", suffix=".tmp")
+    os.close(descriptor)
+    try:
+        _ESCRITORES[formato](_tabla(df_fact, dim_geo, dim_tiempo, unir), temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        _borrar(temporal)
+        raise
+    _podar(ruta)
+    return ruta
@@ -0,0 +1,307 @@
+import os
+import json
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+# Capas del Marco Geoestadístico Nacional (DANE)
+RUTA_DEPARTAMENTOS = os.path.join("data", "shapes", "MGN_ANM_DPTOS.shp")
+RUTA_MUNICIPIOS = os.path.join("data", "shapes", "MGN_MPIO_POLITICO.shp")
+COMPONENTES = ['.shp', '.shx', '.dbf', '.prj']
+CODIGO_DEPARTAMENTO = "DPTO_CCDGO"
+NOMBRE_DEPARTAMENTO = "DPTO_CNMBR"
+CODIGO_MUNICIPIO = "MPIO_CDPMP"
+NOMBRE_MUNICIPIO = "MPIO_CNMBR"
+OBJETO_MUNICIPIOS = "municipios"
+
+# Tolerancias de simplificación en grados (EPSG:4326); 0.01° ≈ 1.1 km
+TOLERANCIAS = {'alta': 0.001, 'media': 0.005, 'baja': 0.02}
+TOLERANCIAS_MUNICIPIOS = {'alta': 0.0005, 'media': 0.002, 'baja': 0.008}
+
+CACHE_DIR = os.path.join("Datos", "cache", "geo")
+
+# Capas ya serializadas en este proceso: {nombre: (huella, {nivel: texto})}
+_EN_MEMORIA: dict = {}
+
+
+def _componentes(ruta: str) -> list:
+    base = os.path.splitext(ruta)[0]
+    return [base + ext for ext in COMPONENTES]
+
+
+def _huella(ruta: str) -> str:
+    # Tamaño y fecha de modificación de cada componente del shapefile
+    partes = []
+    for componente in _componentes(ruta):
+        info = os.stat(componente)
+        partes.append(f"{info.st_size}-{info.st_mtime_ns}")
+    return "|".join(partes)
+
+
+def _leer_capa(ruta: str, codigo: str, nombre: str, digitos: int) -> gpd.GeoDataFrame:
+    """
+    Lee solo el código y el nombre de la capa, en EPSG:4326 y ordenada por código.
+    """
+    gdf = gpd.read_file(ruta, columns=[codigo, nombre])
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+    gdf[codigo] = gdf[codigo].astype(str).str.zfill(digitos)
+    return gdf.sort_values(codigo, ignore_index=True)
+
+
+def _simplificar(geometrias: gpd.GeoSeries, tolerancia: float) -> gpd.GeoSeries:
+    """
+    Simplifica la capa como cobertura: los bordes compartidos entre
+    departamentos se simplifican una sola vez, así que no aparecen huecos ni
+    solapes entre vecinos. Si la capa no es una cobertura válida (bordes sin
+    nodos comunes) o GEOS < 3.12, se simplifica cada polígono por separado
+    conservando su topología.
+    """
+    try:
+        if not shapely.coverage_is_valid(geometrias.values):
+            raise ValueError("La capa no es una cobertura válida")
+        simplificada = geometrias.simplify_coverage(tolerancia)
+    except (AttributeError, ValueError, shapely.errors.UnsupportedGEOSVersionError):
+        simplificada = geometrias.simplify(tolerancia, preserve_topology=True)
+    # Las coordenadas se redondean a una décima de la tolerancia: el GeoJSON pesa menos
+    return gpd.GeoSeries(shapely.set_precision(simplificada.values, tolerancia / 10), crs=geometrias.crs)
+
+
+def _poligonos(geometria) -> list:
+    # Cada polígono como lista de anillos (exterior primero) de coordenadas
+    if geometria is None or geometria.is_empty:
+        return []
+    partes = geometria.geoms if hasattr(geometria, 'geoms') else [geometria]
+    return [
+        [np.asarray(p.exterior.coords)] + [np.asarray(r.coords) for r in p.interiors]
+        for p in partes if p.geom_type == 'Polygon' and not p.is_empty
+    ]
+
+
+def _a_topojson(gdf: gpd.GeoDataFrame, objeto: str, paso: float) -> str:
+    """
+    Codifica una capa de polígonos como TopoJSON cuantizado.
+
+    Los anillos se cortan en los nodos donde cambian los vecinos, de modo que
+    cada borde compartido entre dos municipios se guarda una sola vez (el
+    vecino lo referencia invertido, ~i). Las coordenadas se llevan a enteros
+    en una grilla de `paso` grados y los arcos se guardan como diferencias.
+    """
+    origen = np.array(gdf.total_bounds[:2])
+
+    # 1. Anillos cuantizados, abiertos y sin vértices repetidos consecutivos
+    features = []
+    for geometria in gdf.geometry:
+        poligonos = []
+        for anillos in _poligonos(geometria):
+            cuantizados = []
+            for coords in anillos:
+                q = np.rint((coords[:, :2] - origen) / paso).astype(np.int64)
+                q = q[np.r_[True, np.any(np.diff(q, axis=0) != 0, axis=1)]]
+                cuantizados.append(list(map(tuple, q[:-1].tolist())) if len(q) >= 4 else None)
+            # Un polígono cuyo exterior colapsa en la grilla se descarta con sus huecos
+            if cuantizados[0] is not None:
+                poligonos.append([anillo for anillo in cuantizados if anillo is not None])
+        features.append(poligonos)
+
+    # 2. Nodos: puntos que aparecen con pares de vecinos distintos
+    vecinos, nodos = {}, set()
+    for poligonos in features:
+        for anillos in poligonos:
+            for anillo in anillos:
+                n = len(anillo)
+                for i, punto in enumerate(anillo):
+                    a, b = anillo[i - 1], anillo[(i + 1) % n]
+                    par = (a, b) if a < b else (b, a)
+                    previo = vecinos.setdefault(punto, par)
+                    if previo != par:
+                        nodos.add(punto)
+
+    # 3. Arcos entre nodos, reutilizados (o invertidos) entre vecinos
+    arcos, indices = [], {}
+
+    def _indice(arco: list) -> int:
+        clave = tuple(arco)
+        if clave in indices:
+            return indices[clave]
+        inverso = clave[::-1]
+        if inverso in indices:
+            return ~indices[inverso]
+        indices[clave] = len(arcos)
+        arcos.append(arco)
+        return indices[clave]
+
+    def _cortar(anillo: list) -> list:
+        cortes = [i for i, punto in enumerate(anillo) if punto in nodos]
+        if not cortes:
+            # Anillo aislado: empieza en su punto mínimo para reconocerlo desde el vecino
+            k = anillo.index(min(anillo))
+            return [_indice(anillo[k:] + anillo[:k + 1])]
+        rotado = anillo[cortes[0]:] + anillo[:cortes[0]] + [anillo[cortes[0]]]
+        cortes = [i - cortes[0] for i in cortes] + [len(anillo)]
+        return [_indice(rotado[i:j + 1]) for i, j in zip(cortes, cortes[1:])]
+
+    geometrias = []
+    for poligonos, propiedades in zip(features, gdf.drop(columns=gdf.geometry.name).to_dict('records')):
+        arcos_poligonos = [[_cortar(anillo) for anillo in anillos] for anillos in poligonos]
+        if not arcos_poligonos:
+            geometrias.append({'type': None, 'properties': propiedades})
+        elif len(arcos_poligonos) == 1:
+            geometrias.append({'type': 'Polygon', 'arcs': arcos_poligonos[0], 'properties': propiedades})
+        else:
+            geometrias.append({'type': 'MultiPolygon', 'arcs': arcos_poligonos, 'properties': propiedades})
+
+    topologia = {
+        'type': 'Topology',
+        'bbox': [float(v) for v in gdf.total_bounds],
+        'transform': {'scale': [paso, paso], 'translate': [float(origen[0]), float(origen[1])]},
+        'objects': {objeto: {'type': 'GeometryCollection', 'geometries': geometrias}},
+        'arcs': [np.diff(np.array(arco), axis=0, prepend=[[0, 0]]).tolist() for arco in arcos],
+    }
+    return json.dumps(topologia, separators=(',', ':'))
+
+
+# ===================================================================
+# Función: construir_capas
+# ===================================================================
+def construir_capas(ruta: str = RUTA_DEPARTAMENTOS) -> dict:
+    """
+    Lee el shapefile de departamentos y lo serializa a GeoJSON en cada nivel
+    de `TOLERANCIAS`.
+
+    Solo se conservan el código y el nombre del departamento; el resto de
+    atributos del MGN no se usa en el mapa y multiplicaría el tamaño del HTML.
+
+    Returns:
+        dict: {nivel: GeoJSON (str)} con la propiedad `CODIGO_DEPARTAMENTO`
+        como texto de dos dígitos.
+    """
+    gdf = _leer_capa(ruta, CODIGO_DEPARTAMENTO, NOMBRE_DEPARTAMENTO, 2)
+    capas = {}
+    for nivel, tolerancia in TOLERANCIAS.items():
+        simplificada = gdf.set_geometry(_simplificar(gdf.geometry, tolerancia))
+        capas[nivel] = simplificada.to_json(drop_id=True, separators=(',', ':'))
+    return capas
+
+
+# ===================================================================
+# Función: construir_topologias
+# ===================================================================
+def construir_topologias(ruta: str = RUTA_MUNICIPIOS) -> dict:
+    """
+    Lee el shapefile de municipios y lo codifica como TopoJSON en cada nivel
+    de `TOLERANCIAS_MUNICIPIOS`.
+
+    Returns:
+        dict: {nivel: TopoJSON (str)} con el objeto `OBJETO_MUNICIPIOS` y las
+        propiedades `CODIGO_MUNICIPIO` (cinco dígitos) y `NOMBRE_MUNICIPIO`.
+    """
+    gdf = _leer_capa(ruta, CODIGO_MUNICIPIO, NOMBRE_MUNICIPIO, 5)
+    return {
+        nivel: _a_topojson(gdf.set_geometry(_simplificar(gdf.geometry, tolerancia)),
+                           OBJETO_MUNICIPIOS, tolerancia / 10)
+        for nivel, tolerancia in TOLERANCIAS_MUNICIPIOS.items()
+    }
+
+
+def _leer_cache(nombre: str, huella: str, niveles: dict) -> dict | None:
+    ruta_meta = os.path.join(CACHE_DIR, f"{nombre}.meta.json")
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, encoding="utf-8") as f:
+        if json.load(f) != {'huella': huella, 'niveles': niveles}:
+            return None
+    capas = {}
+    for nivel in niveles:
+        with open(os.path.join(CACHE_DIR, f"{nombre}_{nivel}.json"), encoding="utf-8") as f:
+            capas[nivel] = f.read()
+    return capas
+
+
+def _guardar_cache(nombre: str, capas: dict, huella: str, niveles: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for nivel, texto in capas.items():
+        ruta = os.path.join(CACHE_DIR, f"{nombre}_{nivel}.json")
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(ruta + ".tmp", ruta)
+    ruta_meta = os.path.join(CACHE_DIR, f"{nombre}.meta.json")
+    with open(ruta_meta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({'huella': huella, 'niveles': niveles}, f)
+    os.replace(ruta_meta + ".tmp", ruta_meta)
+
+
+def _cargar(nombre: str, ruta: str, niveles: dict, construir) -> dict:
+    """
+    Devuelve los textos de todos los niveles de una capa, desde memoria, desde
+    `CACHE_DIR` o construyéndolos si cambió algún componente del shapefile.
+    """
+    faltantes = [c for c in _componentes(ruta) if not os.path.exists(c)]
+    if faltantes:
+        raise FileNotFoundError(f"Faltan componentes de la capa de {nombre}: {', '.join(faltantes)}")
+
+    huella = _huella(ruta)
+    if nombre in _EN_MEMORIA and _EN_MEMORIA[nombre][0] == huella:
+        return _EN_MEMORIA[nombre][1]
+
+    capas = _leer_cache(nombre, huella, niveles)
+    if capas is None:
+        capas = construir(ruta)
+        _guardar_cache(nombre, capas, huella, niveles)
+
+    _EN_MEMORIA[nombre] = (huella, capas)
+    return capas
+
+
+# ===================================================================
+# Función: capa_departamentos
+# ===================================================================
+def capa_departamentos(nivel: str = 'media', ruta: str = RUTA_DEPARTAMENTOS) -> str:
+    """
+    Devuelve la geometría de los departamentos como GeoJSON ya serializado.
+
+    La capa se lee y simplifica una sola vez: los GeoJSON de todos los niveles
+    se guardan en `CACHE_DIR` y se invalidan si cambia algún componente del
+    shapefile. Como la geometría no depende del año ni de la métrica, el mapa
+    solo tiene que asociar la columna de valores a `CODIGO_DEPARTAMENTO`.
+
+    Args:
+        nivel (str): Nivel de detalle, una llave de `TOLERANCIAS`.
+        ruta (str): Ruta del .shp de departamentos.
+
+    Returns:
+        str: FeatureCollection GeoJSON en EPSG:4326.
+
+    Raises:
+        FileNotFoundError: Si falta algún componente del shapefile.
+        KeyError: Si el nivel no existe.
+    """
+    if nivel not in TOLERANCIAS:
+        raise KeyError(f"Nivel de detalle desconocido: {nivel}")
+    return _cargar('departamentos', ruta, TOLERANCIAS, construir_capas)[nivel]
+
+
+# ===================================================================
+# Función: topologias_municipios
+# ===================================================================
+def topologias_municipios(ruta: str = RUTA_MUNICIPIOS) -> dict:
+    """
+    Devuelve la geometría de los ~1.120 municipios como TopoJSON ya serializado,
+    un texto por nivel de detalle.
+
+    Los bordes compartidos se guardan una sola vez y las coordenadas van
+    cuantizadas, así que cada nivel pesa una fracción del GeoJSON equivalente.
+    Se construyen una sola vez y se guardan en `CACHE_DIR`, igual que la capa
+    de departamentos.
+
+    Args:
+        ruta (str): Ruta del .shp de municipios.
+
+    Returns:
+        dict: {nivel: TopoJSON (str)} para cada llave de `TOLERANCIAS_MUNICIPIOS`.
+
+    Raises:
+        FileNotFoundError: Si falta algún componente del shapefile.
+    """
+    return _cargar('municipios', ruta, TOLERANCIAS_MUNICIPIOS, construir_topologias)
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from instrumentacion import tramo
+from cache_lru import CacheLRU
+
+# A partir de estos puntos los scatter 2D se dibujan con WebGL (Scattergl)
+UMBRAL_WEBGL = 1000
+# Máximo de puntos que se envían al navegador en un scatter; por encima se reduce
+MAX_PUNTOS = 5000
+# Celdas por eje de la rejilla con la que se mide la densidad al reducir
+CELDAS = 20
+
+# Figuras recientes, indexadas por (gráfico, versión de los datos, selección)
+MAX_FIGURAS = 32
+_FIGURAS = CacheLRU(MAX_FIGURAS)
+# `construir` puede devolver None (sin datos): también se guarda
+_SIN_FIGURA = object()
+
+
+# ===================================================================
+# Función: estadisticas_caja
+# ===================================================================
+def estadisticas_caja(df: pd.DataFrame, grupo: str, valor: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula los cuartiles y bigotes de un boxplot por grupo en una sola pasada.
+
+    Se ordena una vez por (grupo, valor) y todo sale de posiciones sobre ese
+    arreglo: los cuartiles con interpolación lineal (la misma que usa Plotly
+    por defecto) y los bigotes con la regla de Tukey, hasta el dato más
+    extremo dentro de 1.5 veces el rango intercuartílico.
+
+    Args:
+        df (pd.DataFrame): Datos; las filas con `valor` nulo se ignoran.
+        grupo (str): Columna que define las cajas.
+        valor (str): Columna numérica.
+
+    Returns:
+        tuple: (estadísticas indexadas por grupo con 'n', 'q1', 'mediana',
+        'q3', 'bigote_inferior', 'bigote_superior' y 'media'; filas atípicas
+        con las columnas `grupo` y `valor`).
+    """
+    datos = df[[grupo, valor]].dropna()
+    if datos.empty:
+        columnas = ['n', 'q1', 'mediana', 'q3', 'bigote_inferior', 'bigote_superior', 'media']
+        return pd.DataFrame(columns=columnas, index=pd.Index([], name=grupo)), datos
+    codigos, grupos = pd.factorize(datos[grupo], sort=True)
+    valores = datos[valor].to_numpy(dtype=float)
+    orden = np.lexsort((valores, codigos))
+    codigos, valores = codigos[orden], valores[orden]
+
+    n = np.bincount(codigos, minlength=len(grupos))
+    inicio = np.concatenate(([0], np.cumsum(n)[:-1]))
+
+    def cuantil(p):
+        posicion = (n - 1) * p
+        abajo = np.floor(posicion).astype(int)
+        arriba = np.minimum(abajo + 1, n - 1)
+        fraccion = posicion - abajo
+        return valores[inicio + abajo] * (1 - fraccion) + valores[inicio + arriba] * fraccion
+
+    q1, mediana, q3 = cuantil(0.25), cuantil(0.5), cuantil(0.75)
+    rango = q3 - q1
+    limite_inferior = (q1 - 1.5 * rango)[codigos]
+    limite_superior = (q3 + 1.5 * rango)[codigos]
+    dentro = (valores >= limite_inferior) & (valores <= limite_superior)
+
+    estadisticas = pd.DataFrame({
+        'n': n,
+        'q1': q1,
+        'mediana': mediana,
+        'q3': q3,
+        'bigote_inferior': np.minimum.reduceat(np.where(dentro, valores, np.inf), inicio),
+        'bigote_superior': np.maximum.reduceat(np.where(dentro, valores, -np.inf), inicio),
+        'media': np.add.reduceat(valores, inicio) / n,
+    }, index=pd.Index(grupos, name=grupo))
+    atipicos = pd.DataFrame({grupo: np.asarray(grupos)[codigos[~dentro]], valor: valores[~dentro]})
+    return estadisticas, atipicos
+
+
+# ===================================================================
+# Función: figura_caja
+# ===================================================================
+def figura_caja(df: pd.DataFrame, x: str, y: str, labels: dict | None = None, title: str | None = None) -> go.Figure:
+    """
+    Boxplot por grupo con las estadísticas calculadas en el servidor.
+
+    Equivale a `px.box(df, x=x, y=y, color=x, points="outliers")`, pero al
+    navegador solo viajan los cinco números de cada caja y los atípicos, no
+    todas las filas.
+    """
+    labels = labels or {}
+    estadisticas, atipicos = estadisticas_caja(df, x, y)
+    colores = px.colors.qualitative.Plotly
+    Dispersion = go.Scattergl if len(atipicos) > UMBRAL_WEBGL else go.Scatter
+
+    fig = go.Figure()
+    for i, (nombre, fila) in enumerate(estadisticas.iterrows()):
+        color = colores[i % len(colores)]
+        fig.add_trace(go.Box(
+            x=[nombre], name=str(nombre), marker_color=color, boxpoints=False,
+            q1=[fila['q1']], median=[fila['mediana']], q3=[fila['q3']], mean=[fila['media']],
+            lowerfence=[fila['bigote_inferior']], upperfence=[fila['bigote_superior']],
+        ))
+        puntos = atipicos.loc[atipicos[x] == nombre, y]
+        if len(puntos):
+            fig.add_trace(Dispersion(
+                x=[nombre] * len(puntos), y=puntos.to_numpy(), mode='markers', name=str(nombre),
+                marker=dict(color=color, size=5), showlegend=False,
+            ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+    )
+    return fig
+
+
+# ===================================================================
+# Función: reducir_puntos
+# ===================================================================
+def reducir_puntos(df: pd.DataFrame, columnas: list, maximo: int = MAX_PUNTOS,
+                   celdas: int = CELDAS, semilla: int = 0) -> pd.DataFrame:
+    """
+    Reduce un scatter a unos `maximo` puntos conservando su forma.
+
+    El espacio de `columnas` se divide en una rejilla de `celdas` por eje y a
+    cada celda se le deja como mucho el mismo cupo de puntos, elegidos al
+    azar. Las zonas densas se aclaran y las poco pobladas (donde están los
+    casos extremos) se conservan completas.
+
+    Args:
+        df (pd.DataFrame): Puntos, sin nulos en `columnas`.
+        columnas (list): Coordenadas del scatter (2 o 3 columnas numéricas).
+        maximo (int): Puntos a conservar como máximo (aproximado si hay más celdas ocupadas que `maximo`).
+        celdas (int): Celdas por eje de la rejilla.
+        semilla (int): Semilla del muestreo, para que el mismo `df` dé siempre los mismos puntos.
+
+    Returns:
+        pd.DataFrame: `df` si no supera `maximo`; si no, un subconjunto de sus filas en el orden original.
+    """
+    if len(df) <= maximo:
+        return df
+
+    valores = df[columnas].to_numpy(dtype=float)
+    minimo = valores.min(axis=0)
+    rango = valores.max(axis=0) - minimo
+    rango[rango == 0] = 1
+    posicion = np.minimum(((valores - minimo) / rango * celdas).astype(np.int64), celdas - 1)
+    _, celda = np.unique(np.ravel_multi_index(posicion.T, (celdas,) * len(columnas)), return_inverse=True)
+    conteos = np.bincount(celda)
+
+    # Mayor cupo por celda con el que el total no pasa de `maximo`
+    bajo, alto = 1, int(conteos.max())
+    while bajo < alto:
+        medio = (bajo + alto + 1) // 2
+        if np.minimum(conteos, medio).sum() <= maximo:
+            bajo = medio
+        else:
+            alto = medio - 1
+
+    orden = np.random.default_rng(semilla).permutation(len(df))
+    orden = orden[np.argsort(celda[orden], kind='stable')]
+    puesto = np.arange(len(df)) - np.repeat(np.cumsum(conteos) - conteos, conteos)
+    return df.iloc[np.sort(orden[puesto < bajo])]
+
+
+# ===================================================================
+# Función: figura
+# ===================================================================
+def figura(clave: tuple, construir) -> go.Figure:
+    """
+    Devuelve la figura de `clave`, construyéndola con `construir()` solo la
+    primera vez.
+
+    La clave debe identificar el gráfico, la versión de los datos (p. ej.
+    `hash_datos`) y la selección del usuario, así que volver a un año o
+    departamento ya visto no repite la agregación ni la construcción de la
+    figura. Las figuras se guardan en una caché LRU del proceso, compartida
+    entre sesiones.
+
+    Args:
+        clave (tuple): Llave hashable; el primer elemento es el nombre del gráfico.
+        construir (callable): Función sin argumentos que devuelve la figura.
+
+    Returns:
+        go.Figure | None: Lo que devuelva `construir`; se comparte y no debe modificarse.
+    """
+    fig = _FIGURAS.obtener(clave, _SIN_FIGURA)
+    if fig is not _SIN_FIGURA:
+        return fig
+
+    with tramo(f"figura {clave[0]}"):
+        fig = construir()
+    return _FIGURAS.guardar(clave, fig)
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+# Niveles educativos en que el MEN desagrega los indicadores: nivel -> (título, sufijo
+# de la columna). La columna de un nivel es la del total más el sufijo, p. ej.
+# 'repitencia' -> 'repitencia_secundaria'
+NIVELES = {
+    'total': ("Total", ""),
+    'transicion': ("Transición", "_transici_n"),
+    'primaria': ("Primaria", "_primaria"),
+    'secundaria': ("Secundaria", "_secundaria"),
+    'media': ("Media", "_media"),
+}
+_POR_NIVEL = list(NIVELES)
+
+# Indicadores del MEN, por la columna del total en Socrata: título, unidad y
+# niveles publicados
+INDICADORES = {
+    'poblaci_n_5_16': {'titulo': "Población 5-16 años", 'unidad': "personas", 'niveles': ['total']},
+    'tasa_matriculaci_n_5_16': {'titulo': "Tasa de matriculación 5-16", 'unidad': "%", 'niveles': ['total']},
+    'cobertura_neta': {'titulo': "Cobertura neta", 'unidad': "%", 'niveles': _POR_NIVEL},
+    'cobertura_bruta': {'titulo': "Cobertura bruta", 'unidad': "%", 'niveles': _POR_NIVEL},
+    'tama_o_promedio_de_grupo': {'titulo': "Tamaño promedio de grupo", 'unidad': "estudiantes",
+                                 'niveles': ['total']},
+    'sedes_conectadas_a_internet': {'titulo': "Sedes conectadas a internet", 'unidad': "%", 'niveles': ['total']},
+    'deserci_n': {'titulo': "Deserción", 'unidad': "%", 'niveles': _POR_NIVEL},
+    'aprobaci_n': {'titulo': "Aprobación", 'unidad': "%", 'niveles': _POR_NIVEL},
+    'reprobaci_n': {'titulo': "Reprobación", 'unidad': "%", 'niveles': _POR_NIVEL},
+    'repitencia': {'titulo': "Repitencia", 'unidad': "%", 'niveles': _POR_NIVEL},
+}
+
+
+def columna(indicador: str, nivel: str = 'total') -> str:
+    """
+    Nombre de la columna del MEN con el `indicador` en el `nivel`.
+    """
+    return indicador + NIVELES[nivel][1]
+
+
+def etiqueta(indicador: str, nivel: str = 'total') -> str:
+    """
+    Título para mostrar, p. ej. "Repitencia · Secundaria (%)".
+    """
+    info = INDICADORES[indicador]
+    titulo = info['titulo'] if nivel == 'total' else f"{info['titulo']} · {NIVELES[nivel][0]}"
+    return f"{titulo} ({info['unidad']})"
+
+
+# Columna del MEN -> (indicador, nivel), en el orden del almacén
+COLUMNAS_INDICADORES = {
+    columna(indicador, nivel): (indicador, nivel)
+    for indicador, info in INDICADORES.items() for nivel in info['niveles']
+}
+
+# Almacén en formato largo: una fila por (indicador, nivel, año, municipio) con dato
+CATEGORIAS_INDICADOR = pd.CategoricalDtype(list(INDICADORES))
+CATEGORIAS_NIVEL = pd.CategoricalDtype(list(NIVELES))
+COLUMNAS_ALMACEN = ['indicador', 'nivel', 'id_tiempo', 'id_geo', 'valor']
+
+
+# ===================================================================
+# Función: tabla_larga
+# ===================================================================
+def tabla_larga(valores: np.ndarray, columnas: list, id_tiempo: np.ndarray, id_geo: np.ndarray) -> pd.DataFrame:
+    """
+    Pasa una matriz ancha de indicadores al formato largo del almacén.
+
+    Args:
+        valores (np.ndarray): Matriz float32 filas × `columnas`, con las filas
+            ya en orden (id_tiempo, id_geo); NaN donde no hay dato.
+        columnas (list): Columnas del MEN de la matriz (llaves de `COLUMNAS_INDICADORES`).
+        id_tiempo, id_geo (np.ndarray): Llaves de cada fila.
+
+    Returns:
+        pd.DataFrame: `COLUMNAS_ALMACEN`, sin filas nulas y ordenado por
+        (indicador, nivel, id_tiempo, id_geo). Indicador y nivel son category
+        (códigos de un byte), así que cada fila ocupa 10 bytes.
+    """
+    pares = [COLUMNAS_INDICADORES[c] for c in columnas]
+    cod_indicador = CATEGORIAS_INDICADOR.categories.get_indexer([i for i, _ in pares]).astype(np.int8)
+    cod_nivel = CATEGORIAS_NIVEL.categories.get_indexer([n for _, n in pares]).astype(np.int8)
+    orden = np.lexsort((cod_nivel, cod_indicador))
+
+    # Por columna (traspuesta) para que cada indicador y nivel quede contiguo
+    traspuesta = np.ascontiguousarray(valores[:, orden].T)
+    con_dato = ~np.isnan(traspuesta)
+    col, fila = np.nonzero(con_dato)
+    return pd.DataFrame({
+        'indicador': pd.Categorical.from_codes(cod_indicador[orden][col], dtype=CATEGORIAS_INDICADOR),
+        'nivel': pd.Categorical.from_codes(cod_nivel[orden][col], dtype=CATEGORIAS_NIVEL),
+        'id_tiempo': id_tiempo[fila],
+        'id_geo': id_geo[fila],
+        'valor': traspuesta[con_dato].astype(np.float32),
+    })
+
+
+# ===================================================================
+# Función: indexar
+# ===================================================================
+def indexar(tabla: pd.DataFrame) -> dict:
+    """
+    Prepara la tabla larga (`tabla_larga` o `almacen_sqlite.cargar_indicadores`)
+    para consultarla.
+
+    Returns:
+        dict: Con las llaves
+            - 'tabla': la tabla, ordenada por indicador, nivel, año y municipio.
+            - 'rangos': {(indicador, nivel): slice} con las filas de cada
+              serie, que son contiguas: leer una serie no copia ni filtra la tabla.
+    """
+    codigos = tabla['indicador'].cat.codes.to_numpy().astype(np.int32) * len(NIVELES) \
+        + tabla['nivel'].cat.codes.to_numpy()
+    presentes, inicios = np.unique(codigos, return_index=True)
+    finales = np.append(inicios[1:], len(tabla))
+    rangos = {
+        (CATEGORIAS_INDICADOR.categories[c // len(NIVELES)], CATEGORIAS_NIVEL.categories[c % len(NIVELES)]):
+            slice(int(i), int(f))
+        for c, i, f in zip(presentes, inicios, finales)
+    }
+    return {'tabla': tabla, 'rangos': rangos}
+
+
+# ===================================================================
+# Función: disponibles
+# ===================================================================
+def disponibles(almacen: dict) -> dict:
+    """
+    Indicadores con datos en el almacén y sus niveles, en el orden del catálogo.
+    """
+    resultado = {}
+    for indicador, nivel in almacen['rangos']:
+        resultado.setdefault(indicador, []).append(nivel)
+    return resultado
+
+
+# ===================================================================
+# Función: serie
+# ===================================================================
+def serie(almacen: dict, indicador: str, nivel: str = 'total') -> pd.DataFrame:
+    """
+    Filas del almacén de un indicador y nivel (vacío si no hay datos).
+
+    Es un corte de filas contiguas de la tabla compartida: no debe modificarse.
+    """
+    rango = almacen['rangos'].get((indicador, nivel), slice(0, 0))
+    return almacen['tabla'].iloc[rango]
+
+
+# ===================================================================
+# Función: consultar
+# ===================================================================
+def consultar(almacen: dict, pares: list, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame,
+              agrupar: list = ('departamento', 'a_o'), filtros: dict | None = None) -> pd.DataFrame:
+    """
+    Promedia indicadores del almacén agrupando por columnas de las dimensiones.
+
+    Cada (indicador, nivel) se lee de su corte de filas y se agrega por
+    separado, así que pedir un indicador más no ensancha ni copia la tabla de
+    hechos.
+
+    Args:
+        almacen (dict): Resultado de `indexar`.
+        pares (list): [(indicador, nivel)] a consultar.
+        dim_geo, dim_tiempo (pd.DataFrame): Dimensiones del modelo.
+        agrupar (list): Columnas de las dimensiones, p. ej. ['departamento', 'municipio', 'a_o'].
+        filtros (dict | None): {columna de las dimensiones: valor o lista de valores}.
+
+    Returns:
+        pd.DataFrame: Columnas de agrupación seguidas de una columna por par,
+        con el nombre del MEN (`columna`); NaN donde un par no tiene dato.
+    """
+    agrupar = list(agrupar)
+    geo = pd.Index(dim_geo['id_geo'])
+    tiempo = pd.Index(dim_tiempo['id_tiempo'])
+    resultados = []
+    for indicador, nivel in pares:
+        filas = serie(almacen, indicador, nivel)
+        pos_geo = geo.get_indexer(filas['id_geo'])
+        pos_tiempo = tiempo.get_indexer(filas['id_tiempo'])
+
+        def valores_dim(col):
+            dim, pos = (dim_tiempo, pos_tiempo) if col in dim_tiempo.columns else (dim_geo, pos_geo)
+            return dim[col].array.take(pos)
+
+        mascara = (pos_geo >= 0) & (pos_tiempo >= 0)
+        for col, valores in (filtros or {}).items():
+            valores = valores if isinstance(valores, (list, tuple, set)) else [valores]
+            mascara &= np.asarray(pd.Series(valores_dim(col)).isin(valores))
+        tabla = pd.DataFrame({col: valores_dim(col) for col in agrupar})
+        tabla[columna(indicador, nivel)] = filas['valor'].to_numpy()
+        resultados.append(tabla[mascara].groupby(agrupar, observed=True).mean())
+
+    if not resultados:
+        return pd.DataFrame(columns=agrupar)
+    return pd.concat(resultados, axis=1).sort_index().reset_index()
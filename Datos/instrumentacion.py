@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+# La instrumentación se activa con la variable de entorno o con ?perfil=1 en la URL
+VARIABLE_ENTORNO = "DIPLOMADO_PERFIL"
+PARAMETRO_URL = "perfil"
+
+RUTA_LOG = os.path.join("Datos", "benchmarks", "perfil.jsonl")
+
+# Reruns recientes que se conservan por sesión para el resumen del panel
+MAX_RERUNS = 50
+
+# Cada sesión de Streamlit ejecuta el script en su propio hilo
+_LOCAL = threading.local()
+
+# tracemalloc es del proceso y `reset_peak` afecta a todos los hilos: la memoria
+# la mide un solo rerun a la vez (el dueño) y el rastreo se apaga al terminar
+# él, salvo que ya estuviera activo antes (python -X tracemalloc)
+_CANDADO = threading.Lock()
+_DUENO: dict = {'rerun': None, 'hilo': None, 'detener': False}
+
+
+class Tramo:
+    """
+    Medición de un tramo del rerun: tiempo, memoria y tamaño de los datos.
+
+    `memoria_mb` es el pico de memoria asignada durante el tramo por encima
+    de la que había al empezar (tracemalloc). Es memoria del proceso: con
+    varias sesiones a la vez incluye lo que asignen las otras. Queda en None
+    si otra sesión perfilada está midiendo la memoria en ese momento.
+    """
+    __slots__ = ('nombre', 'nivel', 'segundos', 'memoria_mb', 'filas', 'columnas', 'datos_mb', '_pico_hijos')
+
+    def __init__(self, nombre: str, nivel: int):
+        self.nombre = nombre
+        self.nivel = nivel
+        self.segundos = None
+        self.memoria_mb = None
+        self.filas = self.columnas = self.datos_mb = None
+        self._pico_hijos = 0
+
+    def df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Anota el tamaño de `df` en el tramo y lo devuelve sin cambios.
+        """
+        self.filas, self.columnas = df.shape
+        self.datos_mb = df.memory_usage(deep=False).sum() / 2**20
+        return df
+
+    def registro(self) -> dict:
+        return {campo: getattr(self, campo) for campo in self.__slots__ if not campo.startswith('_')}
+
+
+class _TramoNulo:
+    # Sin instrumentación, `with tramo(...) as t: t.df(df)` no hace nada
+    def df(self, df):
+        return df
+
+
+_NULO = _TramoNulo()
+
+
+# ===================================================================
+# Función: activa
+# ===================================================================
+def activa() -> bool:
+    """
+    Indica si la instrumentación está pedida para esta sesión.
+    """
+    return bool(os.environ.get(VARIABLE_ENTORNO)) or st.query_params.get(PARAMETRO_URL) == "1"
+
+
+# ===================================================================
+# Función: iniciar
+# ===================================================================
+def iniciar() -> None:
+    """
+    Empieza la medición de un rerun; se llama al comienzo de app.py.
+
+    Si la instrumentación no está activa, los tramos de este rerun no miden
+    nada. El rastreo de memoria (tracemalloc) se enciende solo mientras dura
+    un rerun perfilado; si otro ya lo tiene, este mide solo tiempos.
+    """
+    terminar()
+    _LOCAL.rerun = None
+    if not activa():
+        return
+    rerun = {'inicio': time.time(), 'reloj': time.perf_counter(), 'tramos': [], 'pila': [], 'memoria': False}
+    with _CANDADO:
+        if _DUENO['rerun'] is not None and not _DUENO['hilo'].is_alive():
+            # El hilo del dueño terminó sin soltar el rastreo (p. ej. una excepción
+            # antes de la página): este rerun lo hereda
+            _DUENO['rerun'] = None
+        if _DUENO['rerun'] is None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _DUENO['detener'] = True
+            _DUENO['rerun'], _DUENO['hilo'] = rerun, threading.current_thread()
+            rerun['memoria'] = True
+    _LOCAL.rerun = rerun
+
+
+# ===================================================================
+# Función: terminar
+# ===================================================================
+def terminar() -> None:
+    """
+    Cierra la medición de memoria del rerun actual y, si nadie más la usa,
+    apaga tracemalloc. Se puede llamar varias veces; `mostrar_panel` la llama
+    y app.py también al final de la página, porque `st.rerun()` o `st.stop()`
+    cortan el script antes del panel.
+    """
+    rerun = getattr(_LOCAL, 'rerun', None)
+    if rerun is None or not rerun['memoria']:
+        return
+    rerun['memoria'] = False
+    with _CANDADO:
+        if _DUENO['rerun'] is rerun:
+            if _DUENO['detener']:
+                tracemalloc.stop()
+            _DUENO.update(rerun=None, hilo=None, detener=False)
+
+
+# ===================================================================
+# Función: tramo
+# ===================================================================
+@contextmanager
+def tramo(nombre: str):
+    """
+    Mide el bloque como un tramo del rerun actual. Los tramos se pueden anidar
+    (pestaña > etapa) y cada uno reporta su propio tiempo y pico de memoria.
+
+    Uso:
+        with tramo("merge DANE") as t:
+            df = t.df(izquierda.merge(derecha, ...))
+    """
+    rerun = getattr(_LOCAL, 'rerun', None)
+    if rerun is None:
+        yield _NULO
+        return
+
+    pila = rerun['pila']
+    actual = Tramo(nombre, len(pila))
+    rerun['tramos'].append(actual)
+    if not rerun['memoria']:
+        pila.append(actual)
+        inicio = time.perf_counter()
+        try:
+            yield actual
+        finally:
+            actual.segundos = time.perf_counter() - inicio
+            pila.pop()
+        return
+
+    if pila:
+        # reset_peak borra el pico que llevaba el tramo padre: se le guarda aparte
+        pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, tracemalloc.get_traced_memory()[1])
+    memoria_inicial = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    pila.append(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    finally:
+        actual.segundos = time.perf_counter() - inicio
+        pico = max(tracemalloc.get_traced_memory()[1], actual._pico_hijos)
+        actual.memoria_mb = (pico - memoria_inicial) / 2**20
+        pila.pop()
+        if pila:
+            pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, pico)
+
+
+def _guardar_log(registros: list, ruta: str) -> None:
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+# ===================================================================
+# Función: mostrar_panel
+# ===================================================================
+def mostrar_panel(ruta_log: str = RUTA_LOG) -> None:
+    """
+    Cierra la medición del rerun y la muestra en la barra lateral; se llama
+    al final de app.py.
+
+    El panel tiene los tramos de este rerun (sangrados según el anidamiento)
+    y el promedio por pestaña de los últimos `MAX_RERUNS` reruns de la
+    sesión. Con la casilla de la barra lateral, cada rerun se agrega además a
+    `ruta_log` (JSON Lines, un registro por tramo).
+    """
+    terminar()
+    rerun = getattr(_LOCAL, 'rerun', None)
+    _LOCAL.rerun = None
+    if rerun is None:
+        return
+
+    total = time.perf_counter() - rerun['reloj']
+    tramos = pd.DataFrame([t.registro() for t in rerun['tramos']])
+    historial = st.session_state.setdefault('_perfil_reruns', deque(maxlen=MAX_RERUNS))
+    historial.append({'total': total, **{t.nombre: t.segundos for t in rerun['tramos'] if t.nivel == 0}})
+
+    with st.sidebar:
+        st.subheader("⏱️ Perfil del rerun")
+        st.metric("Tiempo total", f"{total:.2f} s")
+        if not tramos.empty:
+            tabla = tramos.assign(tramo=tramos['nivel'].map(lambda n: "· " * n) + tramos['nombre'])
+            st.dataframe(
+                tabla[['tramo', 'segundos', 'memoria_mb', 'filas', 'columnas', 'datos_mb']],
+                hide_index=True,
+                column_config={
+                    'segundos': st.column_config.NumberColumn("s", format="%.3f"),
+                    'memoria_mb': st.column_config.NumberColumn("Δ pico MB", format="%.1f"),
+                    'datos_mb': st.column_config.NumberColumn("MB datos", format="%.1f"),
+                },
+            )
+        st.caption(f"Promedio de los últimos {len(historial)} reruns (s)")
+        st.dataframe(pd.DataFrame(list(historial)).mean().rename("segundos").to_frame())
+
+        if st.checkbox("Guardar en JSONL", key="_perfil_guardar", help=ruta_log) and not tramos.empty:
+            sesion = st.session_state.setdefault('_perfil_sesion', uuid.uuid4().hex[:8])
+            base = {'rerun': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(rerun['inicio'])),
+                    'sesion': sesion, 'total': total}
+            _guardar_log([{**base, **t.registro()} for t in rerun['tramos']], ruta_log)
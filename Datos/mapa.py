@@ -1,22 +1,218 @@
 import streamlit as st
-import pandas as pd
-import geopandas as gpd
 import folium
+from branca.colormap import linear
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from jinja2 import Template
 from streamlit_folium import st_folium
 
+from consultas import query
+from instrumentacion import tramo
+from geometria import (CODIGO_DEPARTAMENTO, CODIGO_MUNICIPIO, NOMBRE_DEPARTAMENTO, NOMBRE_MUNICIPIO,
+                       OBJETO_MUNICIPIOS, TOLERANCIAS, capa_departamentos, topologias_municipios)
+from almacen_memoria import datos_sesion
+
+# Zoom desde el que se muestra cada nivel de detalle de los municipios
+ZOOM_MUNICIPIOS = {'baja': 0, 'media': 7, 'alta': 9}
+
+
+class CoropletaMunicipal(JSCSSMixin, MacroElement):
+    """
+    Coropleta de municipios a partir de TopoJSON, con nivel de detalle según el zoom.
+
+    Las topologías se incrustan tal como están en la caché (sin volver a
+    serializarlas) y cada nivel se convierte a GeoJSON en el navegador solo
+    cuando el zoom lo pide. Lo único que depende del año y la métrica son los
+    diccionarios de colores y valores por código de municipio.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var mapa = {{ this._parent.get_name() }};
+            var colores = {{ this.colores|tojson }};
+            var valores = {{ this.valores|tojson }};
+            var estilo = function(f) {
+                var color = colores[f.properties.{{ this.codigo }}];
+                return {fillColor: color || 'gray', fillOpacity: color ? 0.7 : 0.3, color: '#555', weight: 0.3};
+            };
+            var etiqueta = function(f, capa) {
+                var valor = valores[f.properties.{{ this.codigo }}];
+                capa.bindTooltip(f.properties.{{ this.nombre }} + ': ' + (valor === undefined ? 'sin dato' : valor));
+            };
+            var niveles = [
+            {%- for zoom, topologia in this.niveles %}
+                {zoom: {{ zoom }}, datos: {{ topologia }}, capa: null},
+            {%- endfor %}
+            ];
+            var actual = null;
+            function actualizar() {
+                var elegido = niveles[0];
+                niveles.forEach(function(n) { if (mapa.getZoom() >= n.zoom) { elegido = n; } });
+                if (elegido === actual) { return; }
+                if (!elegido.capa) {
+                    elegido.capa = L.geoJson(
+                        topojson.feature(elegido.datos, elegido.datos.objects.{{ this.objeto }}),
+                        {style: estilo, onEachFeature: etiqueta}
+                    );
+                }
+                if (actual) { mapa.removeLayer(actual.capa); }
+                mapa.addLayer(elegido.capa);
+                actual = elegido;
+            }
+            mapa.on('zoomend', actualizar);
+            actualizar();
+        })();
+        {% endmacro %}
+    """)
+
+    default_js = [
+        ("topojson", "https://cdnjs.cloudflare.com/ajax/libs/topojson/1.6.9/topojson.min.js"),
+    ]
+
+    def __init__(self, topologias: dict, colores: dict, valores: dict):
+        super().__init__()
+        self._name = "CoropletaMunicipal"
+        self.niveles = sorted((ZOOM_MUNICIPIOS[nivel], texto) for nivel, texto in topologias.items())
+        self.colores = colores
+        self.valores = valores
+        self.codigo = CODIGO_MUNICIPIO
+        self.nombre = NOMBRE_MUNICIPIO
+        self.objeto = OBJETO_MUNICIPIOS
+
+
+class CoropletaDepartamental(MacroElement):
+    """
+    Coropleta de departamentos a partir del GeoJSON en caché.
+
+    El GeoJSON se incrusta tal como está en la caché (folium.Choropleth lo
+    volvería a leer y serializar con un estilo por departamento en cada
+    cambio); lo que depende del año y la métrica son solo los diccionarios de
+    colores y valores por código de departamento, como en `CoropletaMunicipal`.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var mapa = {{ this._parent.get_name() }};
+            var colores = {{ this.colores|tojson }};
+            var valores = {{ this.valores|tojson }};
+            var estilo = function(f) {
+                var color = colores[f.properties.{{ this.codigo }}];
+                return {fillColor: color || 'gray', fillOpacity: 0.7, color: '#555', weight: 1, opacity: 0.2};
+            };
+            var capa = L.geoJson({{ this.geojson }}, {
+                style: estilo,
+                onEachFeature: function(f, l) {
+                    var valor = valores[f.properties.{{ this.codigo }}];
+                    l.bindTooltip(f.properties.{{ this.nombre }} + ': ' + (valor === undefined ? 'sin dato' : valor));
+                    l.on('mouseover', function() { l.setStyle({weight: 2, opacity: 1}); });
+                    l.on('mouseout', function() { capa.resetStyle(l); });
+                }
+            }).addTo(mapa);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, geojson: str, colores: dict, valores: dict):
+        super().__init__()
+        self._name = "CoropletaDepartamental"
+        self.geojson = geojson
+        self.colores = colores
+        self.valores = valores
+        self.codigo = CODIGO_DEPARTAMENTO
+        self.nombre = NOMBRE_DEPARTAMENTO
+
+
+def _escala(resumen, metrica_col, codigo_col, caption):
+    # Escala de colores y diccionarios código -> color y código -> valor; None si no hay valores
+    valores = resumen[[codigo_col, metrica_col]].dropna()
+    if valores.empty:
+        return None
+    escala = linear.YlGnBu_09.scale(float(valores[metrica_col].min()), float(valores[metrica_col].max()))
+    escala.caption = caption
+    codigos = valores[codigo_col].astype(str)
+    colores = dict(zip(codigos, map(escala, valores[metrica_col])))
+    return escala, colores, dict(zip(codigos, valores[metrica_col].round(1).tolist()))
+
+
+def _mapa_departamentos(metrica_col, metrica_label, año_sel, modelo):
+    # Promedio por código de departamento para el año seleccionado
+    resumen = (
+        query(metrica_col, ['c_digo_departamento', 'a_o'], {'a_o': año_sel}, modelo=modelo)
+        .drop(columns='a_o')
+        .rename(columns={'c_digo_departamento': 'codigo_departamento'})
+    )
+    resumen['codigo_departamento'] = resumen['codigo_departamento'].astype(str)
+    coloreado = _escala(resumen, metrica_col, 'codigo_departamento', f"{metrica_label} - {año_sel}")
+    if coloreado is None:
+        st.warning(f"⚠️ No hay datos de {metrica_label} para {año_sel}.")
+        return None
+    escala, colores, valores = coloreado
+
+    # Nivel de detalle de la geometría (menos detalle = HTML más liviano)
+    nivel = st.radio("Nivel de detalle del mapa", list(TOLERANCIAS), index=1, horizontal=True)
+
+    # ===============================
+    # Geometría de departamentos (GeoJSON simplificado y en caché)
+    # ===============================
+    try:
+        with tramo("geometría departamentos"):
+            geojson = capa_departamentos(nivel)
+    except Exception as e:
+        st.error(f"❌ Error al leer la capa de departamentos: {e}")
+        return None
+
+    # ===============================
+    # Crear el mapa: la geometría va tal cual; con el año o la métrica solo cambian los colores
+    # ===============================
+    m = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+    CoropletaDepartamental(geojson, colores, valores).add_to(m)
+    escala.add_to(m)
+    return m
+
+
+def _mapa_municipios(metrica_col, metrica_label, año_sel, modelo):
+    # Promedio por código DIVIPOLA de municipio para el año seleccionado
+    resumen = query(metrica_col, ['c_digo_municipio', 'a_o'], {'a_o': año_sel}, modelo=modelo)
+    coloreado = _escala(resumen, metrica_col, 'c_digo_municipio', f"{metrica_label} - {año_sel}")
+    if coloreado is None:
+        st.warning(f"⚠️ No hay datos de {metrica_label} para {año_sel}.")
+        return None
+    escala, colores, valores = coloreado
+
+    # ===============================
+    # Geometría de municipios (TopoJSON por nivel de detalle, en caché)
+    # ===============================
+    try:
+        with tramo("geometría municipios"):
+            topologias = topologias_municipios()
+    except Exception as e:
+        st.error(f"❌ Error al leer la capa de municipios: {e}")
+        return None
+
+    # ===============================
+    # Crear el mapa
+    # ===============================
+    m = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
+    CoropletaMunicipal(topologias, colores, valores).add_to(m)
+    escala.add_to(m)
+    return m
+
+
 def show_map_tab():
-    st.header("🗺️ Mapa Interactivo por Departamento")
+    st.header("🗺️ Mapa Interactivo por Departamento y Municipio")
 
-    if 'df_fact' not in st.session_state:
+    datos = datos_sesion()
+    if 'df_fact' not in datos:
         st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    dim_tiempo = st.session_state['dim_tiempo']
+    modelo = (datos['df_fact'], datos['dim_geo'], datos['dim_tiempo'])
+    _mapa_interactivo(modelo)
+
 
-    # Merge de tabla de hechos con dimensiones
-    df = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
+@st.fragment
+def _mapa_interactivo(modelo):
+    # Fragmento: cambiar métrica, año o nivel solo vuelve a dibujar el mapa
 
     # Selector de métrica
     metricas = {
@@ -29,58 +225,20 @@ def show_map_tab():
     metrica_col = metricas[metrica_label]
 
     # Selector de año
-    años = sorted(df['a_o'].unique())
+    años = sorted(modelo[2]['a_o'])
     año_sel = st.selectbox("Selecciona el año", años, index=len(años)-1)
 
-    # Agrupación por código de departamento
-    df_filtrado = df[df['a_o'] == año_sel]
-    resumen = (
-        df_filtrado
-        .groupby('c_digo_departamento')[metrica_col]
-        .mean()
-        .reset_index()
-        .rename(columns={'c_digo_departamento': 'codigo_departamento'})
-    )
-    resumen['codigo_departamento'] = resumen['codigo_departamento'].astype(str)
+    # Selector de nivel geográfico
+    nivel_geo = st.radio("Nivel geográfico", ["Departamento", "Municipio"], horizontal=True)
 
-    # ===============================
-    # Leer archivo SHP local de departamentos
-    # ===============================
-    try:
-        gdf = gpd.read_file("data/shapes/MGN_ANM_DPTOS.shp")  # Ajusta la ruta si es necesario
-    except Exception as e:
-        st.error(f"❌ Error al leer el archivo .shp: {e}")
+    if nivel_geo == "Municipio":
+        m = _mapa_municipios(metrica_col, metrica_label, año_sel, modelo)
+    else:
+        m = _mapa_departamentos(metrica_col, metrica_label, año_sel, modelo)
+    if m is None:
         return
 
-    # Verificar campo de código del departamento
-    codigo_col = "DPTO_CCDGO"
-
-    gdf[codigo_col] = gdf[codigo_col].astype(str)
-    resumen[codigo_col] = resumen["codigo_departamento"]
-
-    # Merge de shapefile con datos
-    gdf_merged = gdf.merge(resumen, on=codigo_col, how="left")
-
-    # ===============================
-    # Crear el mapa
-    # ===============================
-    m = folium.Map(location=[4.6, -74.1], zoom_start=5, tiles="CartoDB positron")
-
-    folium.Choropleth(
-        geo_data=gdf_merged,
-        name="choropleth",
-        data=gdf_merged,
-        columns=[codigo_col, metrica_col],
-        key_on=f"feature.properties.{codigo_col}",
-        fill_color="YlGnBu",
-        fill_opacity=0.7,
-        line_opacity=0.2,
-        nan_fill_color="gray",
-        legend_name=f"{metrica_label} - {año_sel}",
-        highlight=True
-    ).add_to(m)
-
-    folium.LayerControl().add_to(m)
-
-    st.subheader(f"🧭 {metrica_label} por Departamento - {año_sel}")
-    st_folium(m, width=750, height=550)
\ No newline at end of file
+    st.subheader(f"🧭 {metrica_label} por {nivel_geo} - {año_sel}")
+    # Sin objetos de retorno: mover o acercar el mapa no vuelve a ejecutar la app
+    with tramo("folium"):
+        st_folium(m, width=750, height=550, returned_objects=[])
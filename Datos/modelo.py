@@ -0,0 +1,537 @@
+import hashlib
+import weakref
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from validacion import REGLAS, compilar, validar
+from indicadores import COLUMNAS_INDICADORES, tabla_larga
+from cache_lru import CacheLRU
+
+# Columnas del MEN que entran al modelo estrella
+COLUMNAS_RELEVANTES = [
+    'a_o', 'departamento', 'municipio', 'c_digo_departamento', 'c_digo_municipio',
+    'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
+    'cobertura_neta', 'cobertura_bruta',
+    'deserci_n', 'aprobaci_n', 'repitencia', 'reprobaci_n'
+]
+COLUMNAS_TEXTO = ['departamento', 'municipio', 'c_digo_departamento', 'c_digo_municipio']
+COLUMNAS_GEO = ['c_digo_departamento', 'departamento', 'municipio', 'c_digo_municipio']
+COLUMNAS_HECHOS = ['poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
+                   'cobertura_neta', 'cobertura_bruta']
+COLUMNAS_METRICAS = [c for c in COLUMNAS_RELEVANTES if c not in COLUMNAS_TEXTO + ['a_o']]
+# Resto de indicadores del MEN (desagregación por nivel, tamaño de grupo, conectividad):
+# se conservan en df_clean si vienen en los datos, pero no son obligatorios
+COLUMNAS_OPCIONALES = [c for c in COLUMNAS_INDICADORES if c not in COLUMNAS_METRICAS]
+
+# Representación compacta: nombres como category, métricas float32 y años int16
+TIPOS_LIMPIOS = {
+    'a_o': 'int16',
+    **{col: 'category' for col in COLUMNAS_TEXTO},
+    **{col: 'float32' for col in COLUMNAS_METRICAS + COLUMNAS_OPCIONALES},
+}
+
+# Modelos ya construidos con su validación, (modelo, validacion), indexados por
+# el hash de los datos crudos y la versión de la DIVIPOLA
+MAX_MODELOS = 4
+_MODELOS = CacheLRU(MAX_MODELOS)
+_HASHES: dict = {}
+
+# Planes de validación compilados, por reglas y versión de la DIVIPOLA de referencia
+_PLANES: dict = {}
+
+# Palabras que no distinguen nombres y varían entre fuentes
+CONECTORES = r"\b(?:DE|DEL|LA|LAS|LOS|EL|Y|D|C)\b"
+
+# Nombre con que se muestran algunos departamentos, por su llave de
+# `normalizar_nombres`; los demás se escriben como vienen más a menudo en los datos
+NOMBRES_DEPARTAMENTO = {
+    'ARCHIPIELAGO SAN ANDRES PROVIDENCIA SANTA CATALINA': "San Andrés",
+}
+
+
+# ===================================================================
+# Función: normalizar_nombres
+# ===================================================================
+def normalizar_nombres(valores) -> pd.Series:
+    """
+    Lleva nombres de lugares a una llave comparable entre fuentes.
+
+    Quita tildes y signos de puntuación, pasa a mayúsculas, elimina el texto
+    entre paréntesis y los conectores (de, del, la, y, ...) y colapsa los
+    espacios. Las operaciones de texto se aplican una sola vez por valor
+    distinto, no por fila.
+
+    Args:
+        valores (array-like): Nombres a normalizar (admite category y nulos).
+
+    Returns:
+        pd.Series: Llaves normalizadas, alineadas con `valores`; los nulos quedan como None.
+    """
+    serie = pd.Series(valores)
+    codigos, unicos = pd.factorize(serie)
+    llaves = (
+        pd.Series(unicos, dtype=str)
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.upper()
+        .str.replace(r"\(.*?\)", " ", regex=True)
+        .str.replace(r"[^A-Z0-9 ]", " ", regex=True)
+        .str.replace(CONECTORES, " ", regex=True)
+        .str.split().str.join(" ")
+    )
+    resultado = np.append(llaves.to_numpy(dtype=object), None)[codigos]
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+# ===================================================================
+# Función: normalizar_columnas
+# ===================================================================
+def normalizar_columnas(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pasa los nombres de columna a minúscula, unifica el nombre del departamento,
+    limpia los códigos DIVIPOLA y descarta el agregado 'Nacional'.
+
+    Las variantes de un departamento ("Bogotá, D.C." / "Bogotá D.C.") se
+    reconocen por su llave de `normalizar_nombres` y se escriben todas como
+    la más frecuente en los datos ("Valle del Cauca"), salvo las que tienen
+    nombre propio en `NOMBRES_DEPARTAMENTO`.
+    """
+    df = df_raw.copy()
+    df.columns = [c.lower() for c in df.columns]
+
+    llaves = normalizar_nombres(df['departamento']).to_numpy()
+    nacional = llaves == 'NACIONAL'
+    df, llaves = df[~nacional], llaves[~nacional]
+    nombres = pd.DataFrame({'llave': llaves, 'nombre': df['departamento'].astype(str).str.strip().to_numpy()})
+    canonicos = (
+        nombres.dropna().value_counts().rename('registros').reset_index()
+        .sort_values(['registros', 'nombre'], ascending=[False, True])
+        .drop_duplicates('llave').set_index('llave')['nombre']
+    )
+    canonicos.update(pd.Series(NOMBRES_DEPARTAMENTO))
+    df['departamento'] = pd.Series(llaves, dtype=object).map(canonicos).to_numpy()
+
+    # El MEN publica el código como '5' en unos años y '05' en otros
+    df['c_digo_departamento'] = df['c_digo_departamento'].astype(str).str.strip().str.zfill(2)
+    df['c_digo_municipio'] = df['c_digo_municipio'].astype(str).str.strip().str.zfill(5)
+    return df
+
+
+# ===================================================================
+# Función: columnas_faltantes
+# ===================================================================
+def columnas_faltantes(df: pd.DataFrame) -> list:
+    """
+    Devuelve las columnas relevantes que no están en el DataFrame (sin distinguir mayúsculas).
+    """
+    presentes = {c.lower() for c in df.columns}
+    return [col for col in COLUMNAS_RELEVANTES if col not in presentes]
+
+
+def _version_divipola(divipola: pd.DataFrame | None) -> str | None:
+    if divipola is None:
+        return None
+    return divipola.attrs.get('version') or hash_datos(divipola)
+
+
+def _plan(reglas: dict, columnas: list, divipola: pd.DataFrame | None) -> dict:
+    """
+    Plan de validación de `reglas` para `columnas`, compilado una vez por
+    referencia DIVIPOLA.
+    """
+    clave = (id(reglas), tuple(columnas), _version_divipola(divipola))
+    if clave not in _PLANES:
+        municipios = None if divipola is None else divipola['codigo_municipio']
+        _PLANES[clave] = compilar({col: reglas[col] for col in columnas}, municipios)
+    return _PLANES[clave]
+
+
+# ===================================================================
+# Función: validar_datos
+# ===================================================================
+def validar_datos(df: pd.DataFrame, divipola: pd.DataFrame | None = None, reglas: dict = REGLAS) -> dict:
+    """
+    Valida los datos del MEN con las reglas de calidad.
+
+    Se validan las columnas relevantes y las `COLUMNAS_OPCIONALES` que estén en `df`.
+
+    Args:
+        df (pd.DataFrame): Datos ya pasados por `normalizar_columnas`.
+        divipola (pd.DataFrame | None): Referencia para la integridad de los
+            códigos de municipio (p. ej. `cargar_divipola()`); sin ella no se revisa.
+        reglas (dict): Reglas por columna; por defecto `validacion.REGLAS`.
+
+    Returns:
+        dict: El resultado de `validacion.validar`, con 'limpio' en `TIPOS_LIMPIOS`.
+    """
+    columnas = COLUMNAS_RELEVANTES + [c for c in COLUMNAS_OPCIONALES if c in df.columns and c in reglas]
+    resultado = validar(df[columnas], _plan(reglas, columnas, divipola))
+    resultado['limpio'] = resultado['limpio'].astype({c: TIPOS_LIMPIOS[c] for c in columnas})
+    return resultado
+
+
+# ===================================================================
+# Función: limpiar_datos
+# ===================================================================
+def limpiar_datos(df: pd.DataFrame, divipola: pd.DataFrame | None = None, reglas: dict = REGLAS) -> pd.DataFrame:
+    """
+    Selecciona las columnas relevantes (y los indicadores opcionales presentes),
+    convierte las numéricas y aplica las reglas de calidad.
+
+    Un indicador inválido o faltante se anula solo en su columna; se descartan
+    las filas sin año, municipio o códigos válidos y las claves repetidas.
+
+    Args:
+        df (pd.DataFrame): Datos ya pasados por `normalizar_columnas`.
+        divipola (pd.DataFrame | None): Referencia de códigos de municipio.
+        reglas (dict): Reglas por columna; por defecto `validacion.REGLAS`.
+
+    Returns:
+        pd.DataFrame: Datos limpios (`df_clean`) con los tipos de `TIPOS_LIMPIOS`;
+        los indicadores pueden ser nulos.
+    """
+    return validar_datos(df, divipola, reglas)['limpio']
+
+
+def tipo_id(n: int) -> str:
+    """
+    Devuelve el tipo entero más pequeño que alcanza para n ids.
+    """
+    return 'int16' if n < np.iinfo(np.int16).max else 'int32'
+
+
+def _factorizar(df: pd.DataFrame, cols: list) -> np.ndarray:
+    """
+    Asigna a cada fila un código 0..k-1 según la combinación de valores en `cols`,
+    en orden ascendente de esos valores.
+
+    Cada columna se factoriza una vez y los códigos se combinan en una sola
+    clave entera, así que no hay drop_duplicates ni cruces por hash.
+    """
+    if len(cols) == 1:
+        return pd.factorize(df[cols[0]], sort=True)[0]
+    clave = np.zeros(len(df), dtype=np.int64)
+    for col in cols:
+        codigos, valores = pd.factorize(df[col], sort=True)
+        clave = clave * (len(valores) + 1) + codigos
+    return pd.factorize(clave, sort=True)[0]
+
+
+def _dimension_y_codigos(df: pd.DataFrame, cols: list, nombre: str, clave: list | None = None,
+                         desde_id: int = 1) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Construye la dimensión y devuelve también el código de cada fila de `df`,
+    que sirve para armar la tabla de hechos por indexación directa.
+    """
+    codigos = _factorizar(df, clave or cols)
+    _, primeras = np.unique(codigos, return_index=True)
+    dim = df.iloc[primeras][cols].reset_index(drop=True)
+    dim.insert(0, f"id_{nombre}", np.arange(desde_id, desde_id + len(dim)).astype(tipo_id(desde_id + len(dim))))
+    return dim, codigos
+
+
+# ===================================================================
+# Función: crear_dimension
+# ===================================================================
+def crear_dimension(df: pd.DataFrame, cols: list, nombre: str) -> pd.DataFrame:
+    """
+    Construye una dimensión con los valores únicos de `cols` y un id consecutivo.
+    """
+    return _dimension_y_codigos(df, cols, nombre)[0]
+
+
+# ===================================================================
+# Función: crear_dim_geo
+# ===================================================================
+def crear_dim_geo(df_clean: pd.DataFrame, desde_id: int = 1) -> pd.DataFrame:
+    """
+    Construye la dimensión geográfica: una fila por (departamento, municipio),
+    con los códigos DIVIPOLA del departamento y del municipio.
+    """
+    return _dimension_y_codigos(df_clean, COLUMNAS_GEO, 'geo', ['departamento', 'municipio'], desde_id)[0]
+
+
+def _armar_hechos(df_clean: pd.DataFrame, id_tiempo: np.ndarray, id_geo: np.ndarray) -> pd.DataFrame:
+    # Orden canónico (id_tiempo, id_geo), el mismo de la llave primaria en SQLite
+    orden = np.lexsort((id_geo, id_tiempo))
+    df_fact = pd.DataFrame({'id_tiempo': id_tiempo[orden], 'id_geo': id_geo[orden]})
+    for col in COLUMNAS_HECHOS:
+        df_fact[col] = df_clean[col].to_numpy()[orden]
+    return df_fact
+
+
+def _ubicar(df_clean: pd.DataFrame, dim_tiempo: pd.DataFrame, dim_geo: pd.DataFrame) -> tuple:
+    # Posición de cada fila en las dimensiones (get_indexer) y sus ids, sin merge
+    pos_tiempo = pd.Index(dim_tiempo['a_o']).get_indexer(df_clean['a_o'])
+    pos_geo = pd.MultiIndex.from_arrays([dim_geo['departamento'], dim_geo['municipio']]).get_indexer(
+        pd.MultiIndex.from_arrays([df_clean['departamento'], df_clean['municipio']])
+    )
+    validas = (pos_tiempo >= 0) & (pos_geo >= 0)
+    return (validas, dim_tiempo['id_tiempo'].to_numpy()[pos_tiempo[validas]],
+            dim_geo['id_geo'].to_numpy()[pos_geo[validas]])
+
+
+# ===================================================================
+# Función: crear_hechos
+# ===================================================================
+def crear_hechos(df_clean: pd.DataFrame, dim_tiempo: pd.DataFrame, dim_geo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Obtiene la tabla de hechos ubicando cada fila limpia en las dimensiones.
+
+    La ubicación se hace con índices (`get_indexer`) y los ids se toman por
+    posición, sin `merge`. Las filas que no están en alguna dimensión se descartan.
+    """
+    validas, id_tiempo, id_geo = _ubicar(df_clean, dim_tiempo, dim_geo)
+    return _armar_hechos(df_clean[validas], id_tiempo, id_geo)
+
+
+# ===================================================================
+# Función: crear_indicadores
+# ===================================================================
+def crear_indicadores(df_clean: pd.DataFrame, dim_tiempo: pd.DataFrame, dim_geo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arma el almacén de indicadores: todos los del MEN presentes en `df_clean`
+    (con su desagregación por nivel) en formato largo (`indicadores.tabla_larga`).
+
+    Usa los mismos ids que la tabla de hechos, que no se ensancha: las
+    pestañas consultan aquí los indicadores que no están en ella.
+    """
+    validas, id_tiempo, id_geo = _ubicar(df_clean, dim_tiempo, dim_geo)
+    columnas = [c for c in COLUMNAS_INDICADORES if c in df_clean.columns]
+    orden = np.lexsort((id_geo, id_tiempo))
+    valores = df_clean.loc[validas, columnas].to_numpy(dtype=np.float32, na_value=np.nan)[orden]
+    return tabla_larga(valores, columnas, id_tiempo[orden], id_geo[orden])
+
+
+def _concatenar(partes: list) -> pd.DataFrame:
+    """
+    Concatena DataFrames conservando las columnas category (une sus categorías
+    en vez de degradarlas a object). Las categorías quedan ordenadas, como con
+    `astype('category')`, así que el resultado no depende de cómo se partieron los datos.
+    """
+    tipos = {
+        col: pd.CategoricalDtype(union_categoricals([p[col] for p in partes], sort_categories=True).categories)
+        for col in partes[0].columns
+        if isinstance(partes[0][col].dtype, pd.CategoricalDtype)
+    }
+    return pd.concat([p.astype(tipos) for p in partes], ignore_index=True)
+
+
+# ===================================================================
+# Función: actualizar_modelo
+# ===================================================================
+def actualizar_modelo(df_clean: pd.DataFrame, dim_tiempo: pd.DataFrame, dim_geo: pd.DataFrame,
+                      df_fact: pd.DataFrame, df_nuevo: pd.DataFrame, divipola: pd.DataFrame | None = None) -> tuple:
+    """
+    Actualiza el modelo estrella solo para los años presentes en `df_nuevo`.
+
+    Los ids existentes se conservan: los años y municipios nuevos reciben ids a
+    partir del máximo actual, y las filas de hechos de los años afectados se
+    reemplazan por las construidas con los datos nuevos. El costo depende del
+    tamaño de `df_nuevo`, no del histórico.
+
+    Las columnas agregadas a dim_geo fuera del modelo (p. ej. las de la
+    DIVIPOLA) se descartan; se vuelven a agregar sobre el resultado.
+
+    Args:
+        df_clean, dim_tiempo, dim_geo, df_fact: Modelo construido previamente.
+        df_nuevo (pd.DataFrame): Datos crudos de los años a actualizar.
+        divipola (pd.DataFrame | None): Referencia para validar los códigos de municipio.
+
+    Returns:
+        tuple: (df_clean, dim_tiempo, dim_geo, df_fact) actualizados.
+    """
+    nuevo_clean = limpiar_datos(normalizar_columnas(df_nuevo), divipola)
+    return actualizar_desde_limpios(df_clean, dim_tiempo, dim_geo, df_fact, nuevo_clean)
+
+
+# ===================================================================
+# Función: actualizar_desde_limpios
+# ===================================================================
+def actualizar_desde_limpios(df_clean: pd.DataFrame, dim_tiempo: pd.DataFrame, dim_geo: pd.DataFrame,
+                             df_fact: pd.DataFrame, nuevo_clean: pd.DataFrame) -> tuple:
+    """
+    Como `actualizar_modelo`, con los datos nuevos ya limpios (`limpiar_datos`).
+    """
+    dim_geo = dim_geo[['id_geo'] + COLUMNAS_GEO]
+    if nuevo_clean.empty:
+        return df_clean, dim_tiempo, dim_geo, df_fact
+    años = nuevo_clean['a_o'].unique()
+
+    # Los departamentos se escriben como en el modelo: la variante más frecuente
+    # (`normalizar_columnas`) puede ser otra en los datos nuevos
+    existentes = dim_geo['departamento'].cat.categories
+    por_llave = dict(zip(normalizar_nombres(existentes), existentes))
+    nuevos = nuevo_clean['departamento'].cat.categories
+    nuevo_clean = nuevo_clean.assign(departamento=nuevo_clean['departamento'].cat.rename_categories(
+        [por_llave.get(llave, nombre) for llave, nombre in zip(normalizar_nombres(nuevos), nuevos)]
+    ))
+
+    # Dimensión tiempo: solo se agregan los años que no existían
+    años_nuevos = sorted(set(años) - set(dim_tiempo['a_o']))
+    if años_nuevos:
+        inicio = int(dim_tiempo['id_tiempo'].max()) + 1
+        dim_tiempo = pd.concat([dim_tiempo, pd.DataFrame({
+            'id_tiempo': range(inicio, inicio + len(años_nuevos)),
+            'a_o': años_nuevos
+        })], ignore_index=True)
+        dim_tiempo = dim_tiempo.astype({'id_tiempo': tipo_id(len(dim_tiempo)), 'a_o': 'int16'})
+
+    # Dimensión geográfica: municipios que no estaban en el modelo
+    pos_geo = pd.MultiIndex.from_arrays([dim_geo['departamento'], dim_geo['municipio']]).get_indexer(
+        pd.MultiIndex.from_arrays([nuevo_clean['departamento'], nuevo_clean['municipio']])
+    )
+    if (pos_geo < 0).any():
+        geo_nuevo = crear_dim_geo(nuevo_clean[pos_geo < 0], int(dim_geo['id_geo'].max()) + 1)
+        dim_geo = _concatenar([dim_geo, geo_nuevo])
+        dim_geo['id_geo'] = dim_geo['id_geo'].astype(tipo_id(len(dim_geo)))
+
+    # Hechos y datos limpios: se reemplazan solo los años afectados
+    ids_tiempo = dim_tiempo.loc[dim_tiempo['a_o'].isin(años), 'id_tiempo']
+    df_fact = pd.concat([df_fact[~df_fact['id_tiempo'].isin(ids_tiempo)],
+                         crear_hechos(nuevo_clean, dim_tiempo, dim_geo)], ignore_index=True)
+    df_fact = df_fact.astype({'id_tiempo': dim_tiempo['id_tiempo'].dtype, 'id_geo': dim_geo['id_geo'].dtype}) \
+        .sort_values(['id_tiempo', 'id_geo'], kind='stable', ignore_index=True)
+    df_clean = _concatenar([df_clean[~df_clean['a_o'].isin(años)], nuevo_clean])
+    return df_clean, dim_tiempo, dim_geo, df_fact
+
+
+# ===================================================================
+# Función: modelo_desde_limpios
+# ===================================================================
+def modelo_desde_limpios(particiones: list) -> tuple:
+    """
+    Arma el modelo estrella a partir de datos ya limpios, p. ej. uno por año
+    limpiado en paralelo.
+
+    Las dimensiones se construyen sobre la unión de todas las particiones, así
+    que el resultado es el mismo que con los datos completos.
+
+    Args:
+        particiones (list): DataFrames producidos por `limpiar_datos`.
+
+    Returns:
+        tuple: (df_clean, dim_tiempo, dim_geo, df_fact).
+    """
+    df_clean = particiones[0] if len(particiones) == 1 else _concatenar(particiones)
+    dim_tiempo, cod_tiempo = _dimension_y_codigos(df_clean, ['a_o'], 'tiempo')
+    dim_geo, cod_geo = _dimension_y_codigos(df_clean, COLUMNAS_GEO, 'geo', ['departamento', 'municipio'])
+    # Los códigos de factorización son las posiciones en cada dimensión
+    df_fact = _armar_hechos(
+        df_clean,
+        dim_tiempo['id_tiempo'].to_numpy()[cod_tiempo],
+        dim_geo['id_geo'].to_numpy()[cod_geo],
+    )
+    return df_clean, dim_tiempo, dim_geo, df_fact
+
+
+# ===================================================================
+# Función: hash_datos
+# ===================================================================
+def hash_datos(df: pd.DataFrame) -> str:
+    """
+    Calcula un hash del contenido de un DataFrame (columnas y valores).
+
+    El resultado se recuerda mientras el objeto siga vivo, así que pedir el
+    hash del mismo `df_raw` en cada rerun no vuelve a recorrer los datos. Por
+    eso los DataFrames crudos se tratan como de solo lectura.
+    """
+    entrada = _HASHES.get(id(df))
+    if entrada is not None and entrada[0]() is df:
+        return entrada[1]
+
+    h = hashlib.sha1()
+    h.update("|".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    valor = h.hexdigest()
+
+    clave = id(df)
+    _HASHES[clave] = (weakref.ref(df, lambda _ref: _HASHES.pop(clave, None)), valor)
+    return valor
+
+
+# ===================================================================
+# Función: version_modelo
+# ===================================================================
+def version_modelo(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> tuple:
+    """
+    Identifica una versión del modelo estrella por el hash de sus tres tablas.
+
+    Es la llave de todo lo que se deriva del modelo (capa analítica,
+    consultas, tendencias, figuras): dim_geo puede cambiar sin que cambien
+    los hechos, p. ej. al enriquecerse con la DIVIPOLA.
+    """
+    return hash_datos(df_fact), hash_datos(dim_geo), hash_datos(dim_tiempo)
+
+
+# ===================================================================
+# Función: construir_modelo
+# ===================================================================
+def construir_modelo(df_raw: pd.DataFrame, df_nuevo: pd.DataFrame | None = None,
+                     modelo_previo: tuple | None = None, divipola: pd.DataFrame | None = None) -> tuple:
+    """
+    Construye el modelo estrella a partir de los datos crudos del MEN.
+
+    El resultado se memoiza por el hash de `df_raw`: la limpieza, las
+    dimensiones y los cruces se ejecutan una vez por versión del dataset y no
+    en cada interacción. Los DataFrames devueltos se comparten entre llamadas,
+    por lo que no deben modificarse en el lugar.
+
+    Args:
+        df_raw (pd.DataFrame): Datos crudos tal como llegan de la API o la caché.
+        df_nuevo (pd.DataFrame | None): Filas de una actualización incremental ya
+            incluidas en `df_raw`. Junto con `modelo_previo` evita reconstruir todo.
+        modelo_previo (tuple | None): Modelo construido antes de la actualización.
+        divipola (pd.DataFrame | None): Referencia para validar los códigos de municipio.
+
+    Returns:
+        tuple: (df_clean, dim_tiempo, dim_geo, df_fact). El detalle de la
+        validación queda disponible con `validacion_modelo`.
+
+    Raises:
+        ValueError: Si faltan columnas relevantes en `df_raw`.
+    """
+    clave = (hash_datos(df_raw), _version_divipola(divipola))
+    guardado = _MODELOS.obtener(clave)
+    if guardado is not None:
+        return guardado[0]
+
+    faltantes = columnas_faltantes(df_raw)
+    if faltantes:
+        raise ValueError(f"Columnas faltantes: {faltantes}")
+
+    if df_nuevo is not None and modelo_previo is not None:
+        validacion = validar_datos(normalizar_columnas(df_nuevo), divipola)
+        modelo = actualizar_desde_limpios(*modelo_previo, validacion['limpio'])
+    else:
+        validacion = validar_datos(normalizar_columnas(df_raw), divipola)
+        modelo = modelo_desde_limpios([validacion['limpio']])
+
+    _MODELOS.guardar(clave, (modelo, validacion))
+    return modelo
+
+
+# ===================================================================
+# Función: validacion_modelo
+# ===================================================================
+def validacion_modelo(df_raw: pd.DataFrame, divipola: pd.DataFrame | None = None) -> dict | None:
+    """
+    Devuelve la validación (`validar_datos`) con la que `construir_modelo`
+    armó el modelo de `df_raw`, o None si ese modelo no está en memoria.
+
+    En una actualización incremental corresponde solo a las filas nuevas.
+    """
+    guardado = _MODELOS.obtener((hash_datos(df_raw), _version_divipola(divipola)))
+    return None if guardado is None else guardado[1]
+
+
+# ===================================================================
+# Función: olvidar_modelo
+# ===================================================================
+def olvidar_modelo(version: str) -> None:
+    """
+    Descarta de la memoria los modelos construidos a partir de los datos
+    crudos con hash `version` (p. ej. cuando ya ninguna sesión los usa).
+    """
+    _MODELOS.descartar(lambda clave: clave[0] == version)
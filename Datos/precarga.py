@@ -0,0 +1,186 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from cargar_datos import cargar_men
+from divipola import cargar_divipola
+from proyecciones import cargar_libro, cargar_proyecciones
+
+# Fuentes que se cargan en segundo plano al abrir la app: nombre -> (título, carga).
+# Cada carga recibe una función `avance(detalle)` para informar en qué va.
+FUENTES = {
+    'men': ("Estadísticas MEN", lambda avance: cargar_men(avance=avance)),
+    # Solo la copia local: la API de la DIVIPOLA se consulta cuando el usuario lo pide
+    'divipola': ("DIVIPOLA", lambda avance: cargar_divipola()),
+    'dane_2005_2019': ("DANE 2005-2019", lambda avance: cargar_libro('2005_2019')),
+    'dane_2020_2035': ("DANE 2020-2035", lambda avance: cargar_libro('2020_2035')),
+}
+
+# Segundos tras los que una fuente ya cargada se vuelve a pedir al esperarla
+VIGENCIA = 15 * 60
+# Cada cuánto se refresca el panel de la barra lateral mientras hay cargas en curso
+REFRESCO = 1.0
+
+ICONOS = {'pendiente': "⏳", 'cargando': "🔄", 'lista': "✅", 'error': "⚠️"}
+
+# Estado por fuente, compartido por todas las sesiones del proceso
+_ESTADO: dict = {}
+_CANDADO = threading.Lock()
+_POOL = ThreadPoolExecutor(max_workers=len(FUENTES), thread_name_prefix="precarga")
+
+
+def _cargar(nombre: str):
+    estado = _ESTADO[nombre]
+
+    def avance(detalle: str) -> None:
+        estado['detalle'] = detalle
+
+    estado.update(inicio=time.perf_counter(), estado='cargando')
+    try:
+        resultado = FUENTES[nombre][1](avance)
+    except Exception as e:
+        estado.update(estado='error', detalle=str(e), segundos=time.perf_counter() - estado['inicio'])
+        raise
+    estado.update(estado='lista', detalle="", segundos=time.perf_counter() - estado['inicio'],
+                  cargada=time.time())
+    return resultado
+
+
+def _lanzar(nombre: str) -> None:
+    _ESTADO[nombre] = {'estado': 'pendiente', 'detalle': "", 'inicio': None, 'segundos': None, 'cargada': None}
+    _ESTADO[nombre]['futuro'] = _POOL.submit(_cargar, nombre)
+
+
+# ===================================================================
+# Función: iniciar_precarga
+# ===================================================================
+def iniciar_precarga() -> None:
+    """
+    Lanza en segundo plano la carga de las `FUENTES` que aún no se pidieron.
+
+    Se llama al comienzo de app.py en cada rerun: la primera vez en el
+    proceso arranca las cuatro cargas a la vez (cada una en su hilo) y las
+    siguientes no hacen nada, así que la primera pantalla se dibuja sin
+    esperar a ninguna fuente.
+    """
+    with _CANDADO:
+        for nombre in FUENTES:
+            if nombre not in _ESTADO:
+                _lanzar(nombre)
+
+
+# ===================================================================
+# Función: esperar
+# ===================================================================
+def esperar(nombre: str, timeout: float | None = None):
+    """
+    Devuelve el resultado de la fuente `nombre`, esperando a que termine de cargar.
+
+    Si la carga falló o tiene más de `VIGENCIA` segundos, se vuelve a lanzar
+    y se espera la nueva.
+
+    Args:
+        nombre (str): Llave de `FUENTES`.
+        timeout (float | None): Segundos máximos de espera.
+
+    Returns:
+        Lo que devuelva la carga de la fuente (un DataFrame compartido).
+
+    Raises:
+        TimeoutError: Si no termina en `timeout` segundos.
+        Exception: El error de la carga, p. ej. `requests.RequestException` u `OSError`.
+    """
+    with _CANDADO:
+        estado = _ESTADO.get(nombre)
+        vencida = (estado is not None and estado['estado'] == 'lista'
+                   and time.time() - estado['cargada'] > VIGENCIA)
+        if estado is None or estado['estado'] == 'error' or vencida:
+            _lanzar(nombre)
+        futuro = _ESTADO[nombre]['futuro']
+    return futuro.result(timeout)
+
+
+# ===================================================================
+# Función: recargar
+# ===================================================================
+def recargar(nombre: str) -> None:
+    """
+    Vuelve a lanzar la carga de `nombre` en segundo plano, p. ej. después de
+    actualizar su copia local, para que `esperar` no entregue la anterior.
+    """
+    with _CANDADO:
+        _lanzar(nombre)
+
+
+# ===================================================================
+# Función: esperar_proyecciones
+# ===================================================================
+def esperar_proyecciones() -> dict:
+    """
+    Espera los dos libros del DANE y devuelve `cargar_proyecciones()`, que ya
+    los encuentra en memoria.
+    """
+    for nombre in ('dane_2005_2019', 'dane_2020_2035'):
+        esperar(nombre)
+    return cargar_proyecciones()
+
+
+# ===================================================================
+# Función: estado_fuentes
+# ===================================================================
+def estado_fuentes() -> dict:
+    """
+    Estado de cada fuente: 'estado' ('pendiente', 'cargando', 'lista' o
+    'error'), 'detalle' (etapa en curso o mensaje de error) y 'segundos'
+    (de la carga terminada, o transcurridos si sigue en curso).
+    """
+    resumen = {}
+    for nombre, (titulo, _) in FUENTES.items():
+        estado = _ESTADO.get(nombre, {'estado': 'pendiente', 'detalle': "", 'inicio': None, 'segundos': None})
+        segundos = estado['segundos']
+        if estado['estado'] == 'cargando':
+            segundos = time.perf_counter() - estado['inicio']
+        resumen[nombre] = {'titulo': titulo, 'estado': estado['estado'], 'detalle': estado['detalle'],
+                           'segundos': segundos}
+    return resumen
+
+
+# ===================================================================
+# Función: mostrar_precarga
+# ===================================================================
+def mostrar_precarga() -> None:
+    """
+    Muestra en la barra lateral el avance de las cargas en segundo plano.
+
+    Mientras alguna fuente sigue cargando, el panel es un fragmento que se
+    actualiza solo cada `REFRESCO` segundos sin volver a ejecutar la página.
+    """
+    with st.sidebar:
+        if any(e['estado'] in ('pendiente', 'cargando') for e in estado_fuentes().values()):
+            _panel_en_curso()
+        else:
+            _panel(estado_fuentes())
+
+
+def _panel(fuentes: dict) -> None:
+    st.caption("Fuentes de datos")
+    for fuente in fuentes.values():
+        texto = f"{ICONOS[fuente['estado']]} {fuente['titulo']}"
+        if fuente['segundos'] is not None:
+            texto += f" · {fuente['segundos']:.1f} s"
+        if fuente['detalle']:
+            texto += f" · {fuente['detalle']}"
+        st.caption(texto)
+
+
+@st.fragment(run_every=REFRESCO)
+def _panel_en_curso():
+    fuentes = estado_fuentes()
+    _panel(fuentes)
+    listas = sum(e['estado'] == 'lista' for e in fuentes.values())
+    st.progress(listas / len(fuentes), text=f"{listas} de {len(fuentes)} fuentes listas")
+    if not any(e['estado'] in ('pendiente', 'cargando') for e in fuentes.values()):
+        # Todo cargado: un rerun completo deja el panel fijo y sin refresco
+        st.rerun()
@@ -0,0 +1,145 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow.feather as feather
+
+# Proyecciones de población del DANE
+LIBROS = {
+    '2005_2019': os.path.join("Datos", "Info_2005_2019.xlsx"),
+    '2020_2035': os.path.join("Datos", "Info_2020_2035.xlsx"),
+}
+COLUMNAS = ['DPNOM', 'AÑO', 'ÁREA GEOGRÁFICA', 'Población']
+TIPOS = {'DPNOM': 'category', 'AÑO': 'int16', 'ÁREA GEOGRÁFICA': 'category', 'Población': 'int32'}
+
+CACHE_DIR = os.path.join("Datos", "cache", "dane")
+
+# Libros y tabla unificada ya leídos en este proceso, indexados por nombre y huella
+_EN_MEMORIA: dict = {}
+
+
+def _huella(ruta: str) -> str:
+    # Tamaño y fecha de modificación: cambian si se reemplaza el libro
+    info = os.stat(ruta)
+    return f"{info.st_size}-{info.st_mtime_ns}"
+
+
+def _leer_libro(ruta: str) -> pd.DataFrame:
+    """
+    Lee solo las columnas necesarias de un libro del DANE y las tipa.
+    """
+    df = pd.read_excel(ruta, usecols=COLUMNAS, engine='openpyxl')
+    return df[COLUMNAS].astype(TIPOS)
+
+
+# ===================================================================
+# Función: agrupar_poblacion
+# ===================================================================
+def agrupar_poblacion(*partes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unifica las proyecciones y suma la población total por departamento y año.
+
+    Returns:
+        pd.DataFrame: Columnas Departamento, AÑO y Población (2005–2035).
+    """
+    df_dane = pd.concat([p.astype({'DPNOM': str, 'ÁREA GEOGRÁFICA': str}) for p in partes], ignore_index=True)
+    df_total = df_dane[df_dane["ÁREA GEOGRÁFICA"].str.lower().str.contains("total")]
+    df_grouped = df_total.groupby(["DPNOM", "AÑO"], as_index=False)["Población"].sum()
+    df_grouped.rename(columns={"DPNOM": "Departamento"}, inplace=True)
+    return df_grouped.astype({'Departamento': 'category', 'AÑO': 'int16', 'Población': 'int64'})
+
+
+def _leer_cache(nombre: str, meta) -> pd.DataFrame | None:
+    # Cada tabla tiene su Feather y un JSON con la huella de los libros de los que sale
+    ruta_meta = os.path.join(CACHE_DIR, f"{nombre}.json")
+    if not os.path.exists(ruta_meta):
+        return None
+    with open(ruta_meta, encoding="utf-8") as f:
+        if json.load(f) != meta:
+            return None
+    return feather.read_table(os.path.join(CACHE_DIR, f"{nombre}.feather"), memory_map=True).to_pandas()
+
+
+def _guardar_cache(nombre: str, df: pd.DataFrame, meta) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ruta = os.path.join(CACHE_DIR, f"{nombre}.feather")
+    df.to_feather(ruta + ".tmp", compression="uncompressed")
+    os.replace(ruta + ".tmp", ruta)
+    ruta_meta = os.path.join(CACHE_DIR, f"{nombre}.json")
+    with open(ruta_meta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(ruta_meta + ".tmp", ruta_meta)
+
+
+# ===================================================================
+# Función: cargar_libro
+# ===================================================================
+def cargar_libro(nombre: str) -> pd.DataFrame:
+    """
+    Devuelve uno de los libros de `LIBROS` con las columnas de `COLUMNAS`.
+
+    Se lee de la caché Feather mientras el libro no cambie. En frío el Excel
+    se lee en un proceso aparte (openpyxl no libera el GIL), así que los dos
+    libros se pueden cargar a la vez desde hilos distintos.
+
+    Args:
+        nombre (str): '2005_2019' o '2020_2035'.
+
+    Returns:
+        pd.DataFrame: Se comparte y no debe modificarse.
+
+    Raises:
+        FileNotFoundError: Si falta el libro.
+    """
+    ruta = LIBROS[nombre]
+    clave = (nombre, _huella(ruta))
+    if clave in _EN_MEMORIA:
+        return _EN_MEMORIA[clave]
+
+    df = _leer_cache(nombre, clave[1])
+    if df is None:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            df = pool.submit(_leer_libro, ruta).result()
+        _guardar_cache(nombre, df, clave[1])
+
+    for anterior in [c for c in _EN_MEMORIA if c[0] == nombre]:
+        del _EN_MEMORIA[anterior]
+    _EN_MEMORIA[clave] = df
+    return df
+
+
+# ===================================================================
+# Función: cargar_proyecciones
+# ===================================================================
+def cargar_proyecciones() -> dict:
+    """
+    Devuelve las proyecciones del DANE listas para usar.
+
+    Los libros de Excel se leen una sola vez (`cargar_libro`, los dos en
+    paralelo) y la tabla unificada de población por departamento y año se
+    guarda también en Feather; todo se invalida si cambia alguno de los libros.
+
+    Returns:
+        dict: '2005_2019' y '2020_2035' con las columnas de `COLUMNAS`, y
+        'agrupado' con la población total por Departamento y AÑO. Los
+        DataFrames se comparten y no deben modificarse.
+
+    Raises:
+        FileNotFoundError: Si falta alguno de los libros.
+    """
+    with ThreadPoolExecutor(max_workers=len(LIBROS)) as pool:
+        proyecciones = dict(zip(LIBROS, pool.map(cargar_libro, LIBROS)))
+
+    huellas = {nombre: _huella(ruta) for nombre, ruta in LIBROS.items()}
+    clave = ('agrupado', tuple(sorted(huellas.items())))
+    if clave not in _EN_MEMORIA:
+        agrupado = _leer_cache('agrupado', huellas)
+        if agrupado is None:
+            agrupado = agrupar_poblacion(*proyecciones.values())
+            _guardar_cache('agrupado', agrupado, huellas)
+        for anterior in [c for c in _EN_MEMORIA if c[0] == 'agrupado']:
+            del _EN_MEMORIA[anterior]
+        _EN_MEMORIA[clave] = agrupado
+    proyecciones['agrupado'] = _EN_MEMORIA[clave]
+    return proyecciones
@@ -0,0 +1,146 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from modelo import version_modelo
+from cache_lru import CacheLRU
+from capa_analitica import obtener_capa
+from instrumentacion import tramo
+
+# Indicadores que se proyectan y horizonte (el de las proyecciones DANE 2020-2035)
+# (la población 5-16 del MEN se proyecta para estimar la matrícula)
+METRICAS_PROYECCION = ['cobertura_neta', 'tasa_matriculaci_n_5_16', 'poblaci_n_5_16']
+AÑO_FINAL = 2035
+NIVEL_CONFIANZA = 0.95
+# Años observados mínimos para ajustar la tendencia de un municipio
+MIN_AÑOS = 5
+
+MAX_TENDENCIAS = 4
+_TENDENCIAS = CacheLRU(MAX_TENDENCIAS)
+
+
+def _cuantil_t(nivel: float, grados: np.ndarray) -> np.ndarray:
+    """
+    Cuantil bilateral de la t de Student para cada número de grados de libertad.
+
+    Aproximación de Cornish-Fisher sobre el cuantil normal; con 3 o más grados
+    de libertad (`MIN_AÑOS` = 5) el error es menor al 1 %.
+    """
+    z = NormalDist().inv_cdf(0.5 + nivel / 2)
+    g = np.maximum(grados, 1).astype(float)
+    return (z
+            + (z**3 + z) / (4 * g)
+            + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * g**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * g**3))
+
+
+# ===================================================================
+# Función: ajustar_tendencias
+# ===================================================================
+def ajustar_tendencias(tensor: dict, metricas: list = METRICAS_PROYECCION, hasta: int = AÑO_FINAL,
+                       nivel: float = NIVEL_CONFIANZA) -> dict:
+    """
+    Ajusta una tendencia lineal por municipio e indicador y la proyecta hasta `hasta`.
+
+    Todas las series se resuelven a la vez: las ecuaciones normales de
+    mínimos cuadrados se arman con sumas sobre el eje de años del tensor, y
+    los años sin dato tienen peso cero (máscara), así que no hay un ajuste
+    por municipio. Las series con menos de `MIN_AÑOS` años observados quedan
+    en NaN.
+
+    Args:
+        tensor (dict): Resultado de `construir_tensor` (municipio × año × indicador).
+        metricas (list): Indicadores a proyectar.
+        hasta (int): Último año de la proyección.
+        nivel (float): Nivel de confianza de la banda.
+
+    Returns:
+        dict: Con las llaves
+            - 'años': np.ndarray desde el primer año observado hasta `hasta`.
+            - 'estimado', 'inferior', 'superior': np.ndarray float32 de forma
+              (municipios, años, indicadores): recta ajustada y banda de
+              confianza de la tendencia (inferior acotada en 0).
+            - 'observado': np.ndarray (municipios, años observados, indicadores) con
+              los valores del tensor (NaN sin dato).
+            - 'años_observados': los años del tensor, eje de 'observado' (puede
+              tener huecos si el MEN no publicó algún año).
+            - 'pendiente': cambio anual por (municipio, indicador), en puntos.
+            - 'observaciones': años con dato por (municipio, indicador).
+            - 'ultimo_año': último año observado.
+            - 'metricas': {indicador: posición en el tercer eje}.
+            - 'geo', 'departamentos': los del tensor (mismo orden de municipios).
+    """
+    años = tensor['años'].astype(float)
+    observado = tensor['valores'][:, :, [tensor['metricas'][m] for m in metricas]]
+    y = observado.astype(float)
+    con_dato = ~np.isnan(y)
+    y = np.where(con_dato, y, 0.0)
+    peso = con_dato.astype(float)
+
+    # Años centrados para que las sumas no pierdan precisión
+    centro = años.mean()
+    x = años - centro
+    n = peso.sum(axis=1)
+    sx = np.einsum('gtm,t->gm', peso, x)
+    sxx = np.einsum('gtm,t->gm', peso, x**2)
+    sy = y.sum(axis=1)
+    sxy = np.einsum('gtm,t->gm', y, x)
+
+    validas = n >= MIN_AÑOS
+    n_ = np.where(validas, n, 1.0)
+    media_x = sx / n_
+    sxx_c = np.where(validas, sxx - n_ * media_x**2, 1.0)
+    pendiente = (sxy - media_x * sy) / sxx_c
+    intercepto = sy / n_ - pendiente * media_x
+
+    ajustado = intercepto[:, None, :] + pendiente[:, None, :] * x[None, :, None]
+    residuos = np.where(con_dato, y - ajustado, 0.0)
+    varianza = (residuos**2).sum(axis=1) / np.maximum(n - 2, 1)
+
+    años_salida = np.arange(int(años.min()), hasta + 1)
+    x0 = (años_salida - centro)[None, :, None]
+    estimado = intercepto[:, None, :] + pendiente[:, None, :] * x0
+    error = np.sqrt(varianza[:, None, :] * (1 / n_[:, None, :] + (x0 - media_x[:, None, :])**2 / sxx_c[:, None, :]))
+    margen = _cuantil_t(nivel, n - 2)[:, None, :] * error
+
+    invalidas = ~validas[:, None, :]
+    estimado = np.where(invalidas, np.nan, estimado)
+    margen = np.where(invalidas, np.nan, margen)
+    return {
+        'años': años_salida,
+        'estimado': estimado.astype(np.float32),
+        'inferior': np.maximum(estimado - margen, 0).astype(np.float32),
+        'superior': (estimado + margen).astype(np.float32),
+        'observado': observado,
+        'años_observados': tensor['años'],
+        'pendiente': np.where(validas, pendiente, np.nan).astype(np.float32),
+        'observaciones': n.astype(np.int16),
+        'ultimo_año': int(años.max()),
+        'metricas': {m: i for i, m in enumerate(metricas)},
+        'geo': tensor['geo'],
+        'departamentos': tensor['departamentos'],
+    }
+
+
+# ===================================================================
+# Función: obtener_tendencias
+# ===================================================================
+def obtener_tendencias(df_fact: pd.DataFrame, dim_geo: pd.DataFrame, dim_tiempo: pd.DataFrame) -> dict:
+    """
+    Devuelve las tendencias y proyecciones de `ajustar_tendencias` para el modelo.
+
+    Se calculan una sola vez por versión del modelo (memoizadas por hash, como
+    la capa analítica) y se comparten entre pestañas y sesiones; los arreglos
+    no deben modificarse.
+    """
+    clave = version_modelo(df_fact, dim_geo, dim_tiempo)
+    tendencias = _TENDENCIAS.obtener(clave)
+    if tendencias is not None:
+        return tendencias
+
+    tensor = obtener_capa(df_fact, dim_geo, dim_tiempo)['tensor']
+    with tramo("tendencias 2035"):
+        tendencias = ajustar_tendencias(tensor)
+
+    return _TENDENCIAS.guardar(clave, tendencias)
@@ -1,8 +1,20 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import io
+import os
 import requests
+import sqlite3
+import threading
+
+from modelo import columnas_faltantes, construir_modelo, hash_datos, validacion_modelo
+from almacen_sqlite import guardar_indicadores, guardar_modelo
+from almacen_memoria import completar, estadisticas_almacen, obtener
+from consultas import query, estadisticas_cache
+from capa_analitica import obtener_indicadores
+from precarga import esperar, esperar_proyecciones, recargar
+from divipola import actualizar_divipola, cargar_divipola
+from emparejamiento import enriquecer_dim_geo, equivalencias_dim_geo
+from exportar import FORMATOS, NOMBRE_ARCHIVO, exportar, ruta_exportacion
+from instrumentacion import tramo
 
 # Colores
 UST_BLUE = "#002855"
@@ -45,25 +57,20 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
+# Versiones que este proceso ya escribió en modelo_educativo.db. La pestaña se
+# vuelve a ejecutar en cada interacción: si cada sesión guardara su versión,
+# dos sesiones con datos distintos se pisarían el archivo una a la otra
+_PERSISTIDAS: set = set()
+_CANDADO_SQLITE = threading.Lock()
+
 def show_transform_tab():
     st.title("📊 Dashboard Educativo: Modelo Estrella")
 
-    if 'df_raw' not in st.session_state:
+    crudos = st.session_state.get('crudos')
+    if 'df_raw' not in obtener(crudos):
         st.warning("🔺 Primero debes cargar los datos desde la pestaña correspondiente.")
         return
 
-    df = st.session_state['df_raw'].copy()
-    df.columns = [c.lower() for c in df.columns]
-    df['departamento'] = df['departamento'].str.replace(",", "").str.strip().str.title()
-
-    df = df[df['departamento'] != 'Nacional']
-
-    df['departamento'] = df['departamento'].str.replace(
-        r"Archipi[eé]lago De San Andrés[.,]?\s*Providencia Y Santa Catalina",
-        "Archipiélago De San Andrés Providencia Y Santa Catalina",
-        regex=True
-    )
-
     st.markdown("""
     ### 🛠️ Etapas del Flujo de Trabajo
     1. **Limpieza de datos**
@@ -76,30 +83,48 @@ def show_transform_tab():
     st.markdown("---")
     st.subheader("1️⃣ Limpieza y Validación de Datos")
 
-    columnas_relevantes = [
-    'a_o', 'departamento', 'municipio', 'c_digo_departamento',
-    'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
-    'cobertura_neta', 'cobertura_bruta',
-    'deserci_n', 'aprobaci_n', 'repitencia', 'reprobaci_n'
-]
-
-    columnas_faltantes = [col for col in columnas_relevantes if col not in df.columns]
-    if columnas_faltantes:
-        st.error(f"❌ Columnas faltantes: {columnas_faltantes}")
+    df_raw = obtener(crudos)['df_raw']
+    faltantes = columnas_faltantes(df_raw)
+    if faltantes:
+        st.error(f"❌ Columnas faltantes: {faltantes}")
         return
 
-    df = df[columnas_relevantes]
-    for col in df.columns:
-        if col not in ['departamento', 'municipio', 'c_digo_departamento']:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    df_clean = df.dropna()
-
-    # ✅ Se guarda para otras pestañas (como cumplimiento_educativo)
-    st.session_state['df_clean'] = df_clean
-
-    col1, col2 = st.columns(2)
-    col1.metric("Registros originales", len(st.session_state['df_raw']))
+    # La DIVIPOLA local sirve para validar los códigos de municipio
+    try:
+        with st.spinner("Esperando la DIVIPOLA..."):
+            divipola = esperar('divipola')
+    except (OSError, ValueError):
+        divipola = None
+
+    # El modelo se construye una vez por versión de df_raw (y de la DIVIPOLA) en el
+    # almacén compartido: las demás sesiones con los mismos datos lo reutilizan
+    with tramo("construir modelo") as t:
+        datos = completar(crudos, {'divipola': None if divipola is None else divipola.attrs.get('version')},
+                          lambda previos: _construir(previos, divipola))
+        t.df(datos['df_fact'])
+    # Las pestañas de análisis pasan a usar esta versión
+    st.session_state['modelo'] = crudos
+    df_clean, dim_tiempo, dim_geo, df_fact = (datos[k] for k in ['df_clean', 'dim_tiempo', 'dim_geo', 'df_fact'])
+    if 'error_divipola' in datos:
+        st.warning(f"⚠️ No se pudo enriquecer la dimensión geográfica con la DIVIPOLA: {datos['error_divipola']}")
+
+    # Todos los indicadores del MEN (por nivel educativo) en formato largo, aparte de los hechos
+    almacen = obtener_indicadores(df_fact, dim_geo, dim_tiempo, df_clean)
+
+    # Se persiste en modelo_educativo.db una sola vez por versión y por proceso
+    try:
+        _persistir(df_fact, dim_geo, dim_tiempo, almacen['tabla'])
+    except sqlite3.Error as e:
+        st.warning(f"⚠️ No se pudo guardar el modelo en SQLite: {e}")
+    modelo_consulta = (df_fact, dim_geo, dim_tiempo)
+
+    validacion = datos['validacion']
+    col1, col2, col_cuarentena = st.columns(3)
+    col1.metric("Registros originales", len(df_raw))
     col2.metric("Registros válidos", len(df_clean))
+    if validacion is not None:
+        col_cuarentena.metric("En cuarentena", len(validacion['cuarentena']))
+        _mostrar_validacion(validacion, divipola is not None)
 
     st.markdown("🔎 **Registros de Bogotá luego de limpieza:**")
     st.dataframe(df_clean[df_clean['municipio'].str.contains("Bogotá", na=False)][['a_o', 'municipio']].head(10))
@@ -109,18 +134,6 @@ def show_transform_tab():
     st.markdown("---")
     st.subheader("2️⃣ Dimensiones del Modelo Estrella")
 
-    def crear_dimension(df, cols, nombre):
-        dim = df[cols].drop_duplicates().reset_index(drop=True)
-        dim[f"id_{nombre}"] = dim.index + 1
-        return dim[[f"id_{nombre}"] + cols]
-
-    dim_tiempo = crear_dimension(df_clean, ['a_o'], 'tiempo')
-
-    dim_geo = df_clean[['c_digo_departamento', 'departamento', 'municipio']].copy()
-    dim_geo = dim_geo.drop_duplicates(subset=['departamento', 'municipio']).reset_index(drop=True)
-    dim_geo['id_geo'] = dim_geo.index + 1
-    dim_geo = dim_geo[['id_geo', 'c_digo_departamento', 'departamento', 'municipio']]
-
     col3, col4 = st.columns(2)
     col3.metric("Dimensión Tiempo", len(dim_tiempo))
     col4.metric("Dimensión Geográfica", len(dim_geo))
@@ -128,23 +141,17 @@ def show_transform_tab():
     st.markdown("---")
     st.subheader("3️⃣ Tabla de Hechos")
 
-    df_fact = df_clean.merge(dim_tiempo, on='a_o') \
-                      .merge(dim_geo, on=['departamento', 'municipio', 'c_digo_departamento'], how='inner')
-    df_fact = df_fact[['id_tiempo', 'id_geo',
-                       'poblaci_n_5_16', 'tasa_matriculaci_n_5_16',
-                       'cobertura_neta', 'cobertura_bruta']]
-
     st.success(f"✅ Tabla de hechos construida con {len(df_fact):,} registros.")
-    st.session_state['df_fact'] = df_fact
-    st.session_state['dim_geo'] = dim_geo
-    st.session_state['dim_tiempo'] = dim_tiempo
+    tabla_indicadores = almacen['tabla']
+    st.caption(f"🗂️ Almacén de indicadores: {len(almacen['rangos'])} series (indicador × nivel educativo) "
+               f"con {len(tabla_indicadores):,} valores en formato largo "
+               f"({tabla_indicadores.memory_usage(deep=False).sum() / 2**20:.1f} MB).")
 
     st.markdown("---")
     st.subheader("4️⃣ Indicadores y Visualizaciones")
 
-    escolaridad_prom = df_fact.groupby('id_geo')[['tasa_matriculaci_n_5_16']].mean().reset_index()
-    escolaridad_prom = escolaridad_prom.merge(dim_geo, on='id_geo')
-    top_mpios = escolaridad_prom.sort_values(by='tasa_matriculaci_n_5_16', ascending=False).head(10)
+    top_mpios = query('tasa_matriculaci_n_5_16', ['departamento', 'municipio'],
+                      order_by='-tasa_matriculaci_n_5_16', limit=10, modelo=modelo_consulta)
 
     fig = px.bar(
         top_mpios,
@@ -154,54 +161,94 @@ def show_transform_tab():
         labels={'tasa_matriculaci_n_5_16': 'Tasa de Escolaridad (%)'},
         color_discrete_sequence=[UST_BLUE]
     )
-    st.plotly_chart(fig, use_container_width=True)
+    with tramo("plotly top municipios"):
+        st.plotly_chart(fig, use_container_width=True)
 
-    cobertura_depto = df_fact.merge(dim_geo, on='id_geo') \
-        .groupby('departamento')['cobertura_neta'].mean().sort_values(ascending=False).head(10)
+    cobertura_depto = query('cobertura_neta', 'departamento', order_by='-cobertura_neta',
+                            limit=10, modelo=modelo_consulta)
     st.markdown("**🏩 Top Departamentos por Cobertura Neta Promedio**")
-    st.dataframe(cobertura_depto.reset_index())
+    st.dataframe(cobertura_depto)
 
     st.markdown("---")
     st.subheader("5️⃣ Vista y Descarga de la Tabla de Hechos")
 
     st.dataframe(df_fact.head(50))
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_fact.to_excel(writer, index=False, sheet_name='TablaHechos')
-    output.seek(0)
-
-    st.download_button(
-        label="📅 Descargar Tabla de Hechos",
-        data=output,
-        file_name='tabla_hechos_educacion.xlsx',
-        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+
+    # La descarga se genera solo cuando se pide y queda guardada por versión
+    col5, col6 = st.columns(2)
+    formato = col5.selectbox("Formato de descarga", list(FORMATOS), format_func=lambda f: FORMATOS[f]['nombre'])
+    unir = col6.checkbox("Incluir columnas de dim_geo y dim_tiempo")
+    ruta = ruta_exportacion(df_fact, dim_geo, dim_tiempo, formato, unir)
+    if not os.path.exists(ruta) and st.button("⚙️ Preparar descarga"):
+        with st.spinner("Generando archivo..."), tramo(f"exportar {formato}"):
+            ruta = exportar(df_fact, dim_geo, dim_tiempo, formato, unir)
+    try:
+        with open(ruta, "rb") as archivo:
+            st.download_button(
+                label="📅 Descargar Tabla de Hechos",
+                data=archivo,
+                file_name=f"{NOMBRE_ARCHIVO}.{formato}",
+                mime=FORMATOS[formato]['mime']
+            )
+    except FileNotFoundError:
+        # Aún no se ha preparado, o la poda de otra sesión lo borró: queda el botón de preparar
+        pass
 
     st.markdown("---")
     st.subheader("📈 Resumen por Departamento y Año")
-    df_fact_ext = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
-    resumen = df_fact_ext.groupby(['departamento', 'a_o'])[ 
-        ['tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta']
-    ].mean().reset_index()
+    resumen = query(['tasa_matriculaci_n_5_16', 'cobertura_neta', 'cobertura_bruta'],
+                    ['departamento', 'a_o'], modelo=modelo_consulta)
     st.dataframe(resumen.head(20))
+    cache = estadisticas_cache()
+    st.caption(f"Caché de consultas: {cache['aciertos']} aciertos, {cache['fallos']} fallos, "
+               f"{cache['tamaño']} resultados guardados.")
+    with st.expander("🧠 Modelos en memoria (compartidos entre sesiones)"):
+        st.dataframe(estadisticas_almacen(), hide_index=True,
+                     column_config={'mb': st.column_config.NumberColumn("MB", format="%.1f")})
 
     st.markdown("---")
     st.subheader("📌 Fuente Principal: DIVIPOLA")
-    divipola_url = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
+    # La referencia se lee de la copia local; la API se consulta solo a pedido
+    if st.button("🔄 Actualizar DIVIPOLA desde la API"):
+        try:
+            with st.spinner("Descargando DIVIPOLA..."):
+                actualizar_divipola()
+            recargar('divipola')
+            st.success("DIVIPOLA actualizada desde datos.gov.co.")
+        except (requests.RequestException, ValueError) as e:
+            st.warning(f"⚠️ No se pudo actualizar la DIVIPOLA desde la API; se mantiene la copia local. {e}")
     try:
-        divipola_data = requests.get(divipola_url)
-        divipola_data.raise_for_status()
-        df_divipola = pd.DataFrame(divipola_data.json())
-        st.success("DIVIPOLA cargada correctamente.")
+        df_divipola = cargar_divipola()
+        st.success(f"DIVIPOLA cargada ({df_divipola.attrs['origen'].upper()}, guardada el "
+                   f"{df_divipola.attrs['guardado']}): {len(df_divipola):,} municipios.")
         st.dataframe(df_divipola.head(10))
-    except:
-        st.warning("No se pudo cargar la base DIVIPOLA")
+    except (OSError, ValueError) as e:
+        st.warning(f"⚠️ No se pudo cargar la base DIVIPOLA: {e}")
+
+    st.markdown("---")
+    st.subheader("🔗 Cruce MEN ↔ DIVIPOLA")
+    try:
+        with tramo("cruce DIVIPOLA") as t:
+            equivalencias = t.df(equivalencias_dim_geo(dim_geo))
+        conteo = equivalencias['metodo'].value_counts()
+        cols = st.columns(4)
+        for col, metodo, etiqueta in zip(cols, ['codigo', 'exacto', 'difuso', 'sin_coincidencia'],
+                                         ['Por código', 'Por nombre', 'Aproximados', 'Sin coincidencia']):
+            col.metric(etiqueta, int(conteo.get(metodo, 0)))
+        st.caption(f"Municipios emparejados: {equivalencias['codigo'].notna().mean():.1%}")
+        revisar = equivalencias[~equivalencias['metodo'].isin(['codigo', 'exacto'])]
+        if not revisar.empty:
+            st.dataframe(revisar.sort_values('similitud'))
+    except (OSError, ValueError) as e:
+        st.warning(f"⚠️ No se pudo cruzar con la DIVIPOLA local: {e}")
 
     st.markdown("---")
     st.subheader("📚 Fuentes Secundarias: Proyecciones del DANE")
     try:
-        info_2005_2019 = pd.read_excel("Datos/Info_2005_2019.xlsx")
-        info_2020_2035 = pd.read_excel("Datos/Info_2020_2035.xlsx")
+        with st.spinner("Esperando las proyecciones del DANE..."), tramo("proyecciones DANE"):
+            proyecciones = esperar_proyecciones()
+        info_2005_2019 = proyecciones['2005_2019']
+        info_2020_2035 = proyecciones['2020_2035']
         st.success("Bases de proyecciones poblacionales cargadas exitosamente.")
         st.markdown("📄 **Proyecciones 2005-2019**")
         st.dataframe(info_2005_2019.head(5))
@@ -209,3 +256,64 @@ def show_transform_tab():
         st.dataframe(info_2020_2035.head(5))
     except Exception as e:
         st.warning("❌ No se pudieron cargar las bases del DANE. Verifica que estén en la carpeta 'Datos'.")
+
+
+def _persistir(df_fact, dim_geo, dim_tiempo, tabla):
+    # Solo la primera sesión que llega con una versión la escribe; las
+    # reejecuciones (y las sesiones con versiones ya escritas) no tocan el archivo
+    version = hash_datos(df_fact)
+    with _CANDADO_SQLITE:
+        if version in _PERSISTIDAS:
+            return
+        with tramo("guardar SQLite"):
+            guardar_modelo(df_fact, dim_geo, dim_tiempo, version)
+            guardar_indicadores(tabla, version)
+        _PERSISTIDAS.add(version)
+
+
+def _construir(previos, divipola):
+    # Datos de la versión en el almacén: df_raw y, tras una actualización incremental,
+    # las filas nuevas y la manija del modelo del que se parte
+    df_raw = previos['df_raw']
+    anterior = obtener(previos.get('previo'))
+    claves = ['df_clean', 'dim_tiempo', 'dim_geo', 'df_fact']
+    modelo_previo = tuple(anterior[k] for k in claves) if all(k in anterior for k in claves) else None
+    modelo = dict(zip(claves, construir_modelo(df_raw, previos.get('df_nuevos'), modelo_previo, divipola)))
+
+    datos = {'df_raw': df_raw, **modelo, 'validacion': validacion_modelo(df_raw, divipola)}
+    # Coordenadas y tipo de municipio desde la DIVIPOLA, por el código del cruce
+    try:
+        with tramo("enriquecer DIVIPOLA") as t:
+            datos['dim_geo'] = t.df(enriquecer_dim_geo(modelo['dim_geo'], divipola))
+    except (OSError, ValueError) as e:
+        datos['error_divipola'] = str(e)
+    return datos
+
+
+def _mostrar_validacion(validacion, con_divipola):
+    # Reporte de las reglas de calidad: qué se descartó, qué se anuló y qué solo se informa
+    reporte = validacion['reporte']
+    if not con_divipola:
+        st.caption("Sin DIVIPOLA local no se revisó que los códigos de municipio existan.")
+    if reporte.empty:
+        st.success("✅ Todos los registros cumplen las reglas de calidad.")
+        return
+
+    st.markdown("🧪 **Reglas de calidad:** los indicadores inválidos se anulan solo en su columna; "
+                "la fila se descarta si no se puede ubicar (año, municipio o códigos) o si repite su clave.")
+    st.dataframe(
+        reporte,
+        hide_index=True,
+        column_config={'porcentaje': st.column_config.NumberColumn("%", format="%.2f")},
+    )
+
+    cobertura = validacion['cobertura']
+    incompletos = cobertura[~cobertura['completo']]
+    if not incompletos.empty:
+        st.warning(f"⚠️ Años con menos municipios de lo esperado: {', '.join(map(str, incompletos['a_o']))}")
+    with st.expander("📅 Municipios por año"):
+        st.dataframe(cobertura, hide_index=True)
+
+    if not validacion['cuarentena'].empty:
+        with st.expander(f"🚧 Registros en cuarentena ({len(validacion['cuarentena']):,})"):
+            st.dataframe(validacion['cuarentena'])
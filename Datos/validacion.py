@@ -0,0 +1,285 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicadores import INDICADORES, columna
+
+# Reglas de calidad de los datos del MEN, por columna:
+#   - tipo: 'entero', 'numero', 'texto' o 'codigo' (solo dígitos, `digitos` de largo).
+#   - requerida: si falla, la fila entera va a cuarentena (no se puede ubicar en el
+#     modelo); si no, solo se anula ese valor y el resto de la fila se conserva.
+#   - rango: (mínimo, máximo) admitidos; None deja el extremo abierto.
+#   - esperado: rango habitual; lo que cae fuera se conserva pero se informa.
+#   - prefijo: columna cuyo valor debe iniciar el código (municipio dentro del departamento).
+#   - referencia: el código debe existir en la DIVIPOLA; el valor es la acción si no
+#     está ('alerta', 'anulado' o 'cuarentena').
+AÑO_MINIMO = 2000
+REGLAS = {
+    'a_o': {'tipo': 'entero', 'requerida': True, 'rango': (AÑO_MINIMO, None)},
+    'departamento': {'tipo': 'texto', 'requerida': True},
+    'municipio': {'tipo': 'texto', 'requerida': True},
+    'c_digo_departamento': {'tipo': 'codigo', 'digitos': 2, 'requerida': True},
+    # Los municipios suprimidos y las áreas no municipalizadas (p. ej. Mapiripana)
+    # no están en la DIVIPOLA vigente pero tienen historia válida: solo se informan
+    'c_digo_municipio': {'tipo': 'codigo', 'digitos': 5, 'requerida': True,
+                         'prefijo': 'c_digo_departamento', 'referencia': 'alerta'},
+    'poblaci_n_5_16': {'tipo': 'numero', 'rango': (0, None)},
+    # Las coberturas municipales pasan de 100 % cuando se matriculan estudiantes
+    # de otros municipios o la proyección de población se queda corta
+    'tasa_matriculaci_n_5_16': {'tipo': 'numero', 'rango': (0, None), 'esperado': (0, 100)},
+    'cobertura_neta': {'tipo': 'numero', 'rango': (0, None), 'esperado': (0, 100)},
+    'cobertura_bruta': {'tipo': 'numero', 'rango': (0, None), 'esperado': (0, 100)},
+    'deserci_n': {'tipo': 'numero', 'rango': (0, 100)},
+    'aprobaci_n': {'tipo': 'numero', 'rango': (0, 100)},
+    'repitencia': {'tipo': 'numero', 'rango': (0, 100)},
+    'reprobaci_n': {'tipo': 'numero', 'rango': (0, 100)},
+    'tama_o_promedio_de_grupo': {'tipo': 'numero', 'rango': (0, None)},
+    'sedes_conectadas_a_internet': {'tipo': 'numero', 'rango': (0, 100)},
+}
+# Cada nivel educativo (transición, primaria, ...) tiene la regla del total de su indicador
+REGLAS.update({
+    columna(indicador, nivel): REGLAS[indicador]
+    for indicador, info in INDICADORES.items() for nivel in info['niveles'] if nivel != 'total'
+})
+# Un registro por (año, departamento, municipio)
+CLAVE = ['a_o', 'departamento', 'municipio']
+# Proporción mínima de municipios que debe tener cada año frente al más completo
+COBERTURA_MINIMA = 0.95
+
+COLUMNAS_REPORTE = ['columna', 'regla', 'registros', 'porcentaje', 'accion']
+
+
+def _limites(rango) -> tuple:
+    minimo, maximo = rango if rango is not None else (None, None)
+    return (-np.inf if minimo is None else minimo), (np.inf if maximo is None else maximo)
+
+
+# ===================================================================
+# Función: compilar
+# ===================================================================
+def compilar(reglas: dict = REGLAS, municipios=None) -> dict:
+    """
+    Convierte las reglas declarativas en el plan que aplica `validar`.
+
+    Las columnas numéricas quedan como un bloque con sus límites en arreglos
+    (mínimo, máximo, esperado, entero, requerida), para revisarlas todas con
+    operaciones sobre la matriz completa. El plan se compila una vez y se
+    reutiliza para cada lote de datos.
+
+    Args:
+        reglas (dict): {columna: regla}, con el formato de `REGLAS`.
+        municipios (array-like | None): Códigos DIVIPOLA válidos (enteros); sin
+            ellos no se revisa la integridad referencial.
+
+    Returns:
+        dict: Plan de validación.
+    """
+    numericas = [col for col, regla in reglas.items() if regla['tipo'] in ('entero', 'numero')]
+    año_actual = int(time.strftime("%Y"))
+    rangos = [_limites(reglas[col].get('rango')) for col in numericas]
+    # El año no puede ser posterior al actual
+    rangos = [(mi, min(ma, año_actual)) if col == 'a_o' else (mi, ma) for col, (mi, ma) in zip(numericas, rangos)]
+    esperados = [_limites(reglas[col].get('esperado')) for col in numericas]
+    return {
+        'columnas': list(reglas),
+        'numericas': numericas,
+        'minimo': np.array([r[0] for r in rangos], dtype=float),
+        'maximo': np.array([r[1] for r in rangos], dtype=float),
+        'esperado_minimo': np.array([r[0] for r in esperados], dtype=float),
+        'esperado_maximo': np.array([r[1] for r in esperados], dtype=float),
+        'enteras': np.array([reglas[col]['tipo'] == 'entero' for col in numericas]),
+        'requeridas': np.array([bool(reglas[col].get('requerida')) for col in numericas]),
+        'textos': [col for col, regla in reglas.items() if regla['tipo'] == 'texto'],
+        'codigos': {col: regla['digitos'] for col, regla in reglas.items() if regla['tipo'] == 'codigo'},
+        'prefijos': {col: regla['prefijo'] for col, regla in reglas.items() if 'prefijo' in regla},
+        'referencia': {
+            col: (None if municipios is None else np.unique(np.asarray(municipios, dtype=np.int64)), regla['referencia'])
+            for col, regla in reglas.items() if regla.get('referencia')
+        },
+        'requeridas_texto': [col for col, regla in reglas.items()
+                             if regla['tipo'] in ('texto', 'codigo') and regla.get('requerida')],
+    }
+
+
+def _bloque_numerico(df: pd.DataFrame, columnas: list) -> np.ndarray:
+    """
+    Las columnas numéricas como una matriz float64; lo que no es número queda en NaN.
+
+    Si ya vienen tipadas (CSV, caché) es una sola copia; si vienen como texto
+    (API) se convierten todas juntas con un único `pd.to_numeric`.
+    """
+    bloque = df[columnas]
+    if all(pd.api.types.is_numeric_dtype(t) for t in bloque.dtypes):
+        return bloque.to_numpy(dtype=float, na_value=np.nan)
+    valores = pd.to_numeric(pd.Series(bloque.to_numpy(dtype=object).ravel()), errors='coerce')
+    return valores.to_numpy(dtype=float, na_value=np.nan).reshape(len(bloque), len(columnas))
+
+
+def _factorizar_texto(serie: pd.Series) -> tuple[np.ndarray, pd.Series]:
+    # Códigos por fila (-1 para nulos) y los valores distintos como texto sin espacios
+    codigos, unicos = pd.factorize(serie)
+    return codigos, pd.Series(np.asarray(unicos, dtype=object), dtype=object).astype(str).str.strip()
+
+
+def _a_filas(por_valor: np.ndarray, codigos: np.ndarray) -> np.ndarray:
+    # Lleva un resultado por valor distinto a cada fila; los nulos quedan en False
+    return np.append(por_valor.astype(bool), False)[codigos]
+
+
+def _fila(registros: int, total: int, columna: str, regla: str, accion: str) -> dict:
+    return {'columna': columna, 'regla': regla, 'registros': int(registros),
+            'porcentaje': registros / total * 100 if total else 0.0, 'accion': accion}
+
+
+# ===================================================================
+# Función: validar
+# ===================================================================
+def validar(df: pd.DataFrame, plan: dict) -> dict:
+    """
+    Aplica el plan de `compilar` a todos los registros en una sola pasada.
+
+    Un valor que no cumple su regla se anula en su columna; la fila solo se
+    descarta (cuarentena) si falla una columna requerida para ubicarla en el
+    modelo (año, departamento, municipio, códigos) o si repite una clave.
+
+    Args:
+        df (pd.DataFrame): Datos con las columnas del plan (p. ej. tras `normalizar_columnas`).
+        plan (dict): Resultado de `compilar`.
+
+    Returns:
+        dict: Con las llaves
+            - 'limpio': filas aceptadas con las columnas del plan; los valores
+              inválidos quedan en NaN y las numéricas en float64.
+            - 'mascaras': DataFrame booleano alineado con `df` (True = valor válido).
+            - 'cuarentena': filas descartadas, con sus valores originales y 'motivo'.
+            - 'reporte': fallas por columna y regla (`COLUMNAS_REPORTE`), con la
+              acción tomada: 'cuarentena', 'anulado' o 'alerta'.
+            - 'cobertura': municipios por año y si alcanzan `COBERTURA_MINIMA`.
+    """
+    total = len(df)
+    numericas = plan['numericas']
+    reporte = []
+
+    # Bloque numérico: tipo, entero y rango sobre la matriz completa
+    valores = _bloque_numerico(df, numericas)
+    # El cargador ya convierte a número (`cargar_datos._tipar`): un texto no
+    # numérico llega como NaN y se cuenta como faltante
+    faltante = np.isnan(valores)
+    con_valor = ~faltante
+    no_entero = con_valor & plan['enteras'] & (valores != np.floor(np.where(con_valor, valores, 0)))
+    fuera = con_valor & ((valores < plan['minimo']) | (valores > plan['maximo']))
+    validos = con_valor & ~no_entero & ~fuera
+    inesperado = validos & ((valores < plan['esperado_minimo']) | (valores > plan['esperado_maximo']))
+
+    accion_numerica = np.where(plan['requeridas'], 'cuarentena', 'anulado')
+    for regla, fallas in [('faltante', faltante), ('no entero', no_entero), ('fuera de rango', fuera)]:
+        conteos = fallas.sum(axis=0)
+        reporte += [_fila(n, total, col, regla, accion) for col, n, accion
+                    in zip(numericas, conteos, accion_numerica) if n]
+    reporte += [_fila(n, total, col, 'fuera de lo esperado', 'alerta')
+                for col, n in zip(numericas, inesperado.sum(axis=0)) if n]
+
+    mascaras = pd.DataFrame(validos, columns=numericas, index=df.index)
+    rechazo = {f"{col}: inválido": ~validos[:, i] for i, col in enumerate(numericas) if plan['requeridas'][i]}
+
+    # Texto y códigos: presentes, con el formato esperado y en la referencia. Las
+    # operaciones de texto se hacen una vez por valor distinto y se llevan a las
+    # filas con los códigos de factorización
+    anulados = {}
+    textos = {col: _factorizar_texto(df[col]) for col in plan['textos'] + list(plan['codigos'])}
+    for col, (codigos_fila, unicos) in textos.items():
+        presente = _a_filas(~unicos.str.lower().isin(["", "nan", "none"]).to_numpy(), codigos_fila)
+        fallas = {'faltante': ~presente}
+        if col in plan['codigos']:
+            formato = unicos.str.fullmatch(rf"\d{{{plan['codigos'][col]}}}").to_numpy()
+            fallas['formato'] = presente & ~_a_filas(formato, codigos_fila)
+        if col in plan['prefijos']:
+            # Se compara cada par distinto (código, código del padre) una sola vez
+            codigos_padre, unicos_padre = textos[plan['prefijos'][col]]
+            base = len(unicos_padre) + 1
+            pares_fila, pares = pd.factorize(
+                np.where(codigos_fila < 0, len(unicos), codigos_fila).astype(np.int64) * base
+                + np.where(codigos_padre < 0, len(unicos_padre), codigos_padre)
+            )
+            hijos = pd.Series(np.append(unicos.to_numpy(), "")[pares // base], dtype=object)
+            padres = np.append(unicos_padre.to_numpy(), "")[pares % base]
+            coincide = (hijos.str[:plan['codigos'].get(plan['prefijos'][col], 2)] == padres).to_numpy()
+            fallas['prefijo'] = presente & ~coincide[pares_fila]
+        ok = ~np.logical_or.reduce(list(fallas.values()))
+        accion = 'cuarentena' if col in plan['requeridas_texto'] else 'anulado'
+        for regla, falla in fallas.items():
+            if falla.any():
+                reporte.append(_fila(falla.sum(), total, col, regla, accion))
+                if accion == 'cuarentena':
+                    rechazo[f"{col}: {regla}"] = falla
+
+        referencia, accion_referencia = plan['referencia'].get(col, (None, None))
+        if referencia is not None:
+            numeros = pd.to_numeric(unicos, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            fuera_referencia = ok & ~_a_filas(np.isin(numeros, referencia), codigos_fila)
+            if fuera_referencia.any():
+                reporte.append(_fila(fuera_referencia.sum(), total, col, 'referencia DIVIPOLA', accion_referencia))
+                if accion_referencia == 'cuarentena':
+                    rechazo[f"{col}: referencia DIVIPOLA"] = fuera_referencia
+                if accion_referencia != 'alerta':
+                    ok &= ~fuera_referencia
+        mascaras[col] = ok
+        if accion == 'anulado':
+            anulados[col] = ~ok
+
+    # Filas que no se pueden ubicar y claves repetidas
+    descartada = np.zeros(total, dtype=bool)
+    for fallas in rechazo.values():
+        descartada |= fallas
+    duplicada = ~descartada & df[CLAVE].duplicated(keep='first').to_numpy()
+    if duplicada.any():
+        rechazo['clave repetida'] = duplicada
+        reporte.append(_fila(duplicada.sum(), total, ", ".join(CLAVE), 'clave repetida', 'cuarentena'))
+    descartada |= duplicada
+
+    # El motivo se arma solo para las filas descartadas
+    filas = np.flatnonzero(descartada)
+    motivo = np.full(len(filas), "", dtype=object)
+    for nombre, fallas in rechazo.items():
+        motivo = np.where(fallas[filas], motivo + (nombre + "; "), motivo)
+    cuarentena = df.iloc[filas].assign(motivo=pd.Series(motivo, dtype=str).str.rstrip("; ").to_numpy())
+
+    aceptadas = ~descartada
+    limpio = df.loc[aceptadas, plan['columnas']].copy()
+    limpio[numericas] = np.where(validos, valores, np.nan)[aceptadas]
+    for col, falla in anulados.items():
+        limpio[col] = limpio[col].mask(falla[aceptadas])
+
+    return {
+        'limpio': limpio,
+        'mascaras': mascaras[plan['columnas']],
+        'cuarentena': cuarentena,
+        'reporte': pd.DataFrame(reporte, columns=COLUMNAS_REPORTE),
+        'cobertura': cobertura_años(limpio),
+    }
+
+
+# ===================================================================
+# Función: cobertura_años
+# ===================================================================
+def cobertura_años(limpio: pd.DataFrame, minima: float = COBERTURA_MINIMA) -> pd.DataFrame:
+    """
+    Cuenta los municipios de cada año, incluidos los años intermedios sin datos.
+
+    Un año está completo si tiene al menos `minima` de los municipios del año
+    más completo.
+    """
+    columnas = ['a_o', 'municipios', 'proporcion', 'completo']
+    if limpio.empty:
+        return pd.DataFrame(columns=columnas)
+    años = limpio['a_o'].to_numpy(dtype=np.int64)
+    primero = int(años.min())
+    conteo = np.bincount(años - primero)
+    proporcion = conteo / conteo.max()
+    return pd.DataFrame({
+        'a_o': np.arange(primero, primero + len(conteo)),
+        'municipios': conteo,
+        'proporcion': proporcion,
+        'completo': proporcion >= minima,
+    })
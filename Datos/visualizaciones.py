@@ -2,31 +2,41 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from consultas import query
+from capa_analitica import obtener_indicadores
+from indicadores import INDICADORES, NIVELES, consultar, disponibles, etiqueta
+from instrumentacion import tramo
+from almacen_memoria import datos_sesion
+
 def show_visualization_tab():
     st.header("📈 Visualizaciones por Departamento")
 
-    if 'df_fact' not in st.session_state:
+    datos = datos_sesion()
+    if 'df_fact' not in datos:
         st.warning("Primero debes construir la tabla de hechos en la pestaña 'Transformación y Métricas'.")
         return
 
-    df_fact = st.session_state['df_fact']
-    dim_geo = st.session_state['dim_geo']
-    dim_tiempo = st.session_state['dim_tiempo']
+    modelo = (datos['df_fact'], datos['dim_geo'], datos['dim_tiempo'])
+    deptos = sorted(datos['dim_geo']['departamento'].unique())
+    # Indicadores por nivel educativo; None si el modelo guardado no trae el almacén
+    almacen = obtener_indicadores(*modelo, datos.get('df_clean'))
+
+    # Cada gráfico es un fragmento: cambiar su selector solo vuelve a dibujar ese gráfico
+    _grafico_matricula(modelo, deptos)
+    _grafico_cobertura_bruta(modelo, deptos, almacen)
 
-    # Merge y limpieza
-    df = df_fact.merge(dim_geo, on='id_geo').merge(dim_tiempo, on='id_tiempo')
-    df['departamento'] = df['departamento'].str.replace(",", "").str.strip().str.title()
 
-    # ================================
-    # PRIMER GRÁFICO
-    # ================================
+# ================================
+# PRIMER GRÁFICO
+# ================================
+@st.fragment
+def _grafico_matricula(modelo, deptos):
     st.subheader("📊 Serie de tiempo: Tasa de Matriculación vs Cobertura Neta")
 
-    deptos = sorted(df['departamento'].unique())
-    selected_depto_1 = st.selectbox("Selecciona un departamento (Gráfico 1)", deptos)
+    selected_depto_1 = st.selectbox("Selecciona un departamento (Gráfico 1)", deptos, key="visualizaciones_depto_1")
 
-    df_1 = df[df['departamento'] == selected_depto_1]
-    df_1 = df_1.groupby('a_o')[['tasa_matriculaci_n_5_16', 'cobertura_neta']].mean().reset_index()
+    df_1 = query(['tasa_matriculaci_n_5_16', 'cobertura_neta'], ['departamento', 'a_o'],
+                 {'departamento': selected_depto_1}, order_by='a_o', modelo=modelo)
 
     fig1 = go.Figure()
 
@@ -66,25 +76,49 @@ def show_visualization_tab():
         margin=dict(l=40, r=40, t=60, b=40)
     )
 
-    st.plotly_chart(fig1, use_container_width=True)
+    with tramo("plotly matrícula y cobertura"):
+        st.plotly_chart(fig1, use_container_width=True)
 
-    # ================================
-    # SEGUNDO GRÁFICO
-    # ================================
-    st.subheader("📊 Serie de tiempo: Cobertura Bruta vs Otra Métrica")
 
-    selected_depto_2 = st.selectbox("Selecciona un departamento (Gráfico 2)", deptos, index=deptos.index(selected_depto_1))
-
-    df_2 = df[df['departamento'] == selected_depto_2]
-    df_2 = df_2.groupby('a_o')[['cobertura_bruta']].mean().reset_index()
+# ================================
+# SEGUNDO GRÁFICO
+# ================================
+@st.fragment
+def _grafico_cobertura_bruta(modelo, deptos, almacen):
+    st.subheader("📊 Serie de tiempo: Cobertura Bruta vs Otra Métrica")
 
-    # Simulamos métrica adicional
-    if 'repitencia_secundaria' in df.columns:
-        df_2['otra_metrica'] = df[df['departamento'] == selected_depto_2].groupby('a_o')['repitencia_secundaria'].mean().values
-        nombre_metrica = 'Repitencia secundaria'
+    # Arranca en el departamento del primer gráfico; después es independiente
+    inicial = st.session_state.get("visualizaciones_depto_1", deptos[0])
+    selected_depto_2 = st.selectbox("Selecciona un departamento (Gráfico 2)", deptos,
+                                    index=deptos.index(inicial) if inicial in deptos else 0)
+
+    df_2 = query(['cobertura_bruta'], ['departamento', 'a_o'],
+                 {'departamento': selected_depto_2}, order_by='a_o', modelo=modelo)
+
+    if almacen is not None:
+        # Cualquier indicador del MEN en cualquier nivel, leído del almacén de indicadores
+        opciones = disponibles(almacen)
+        col_indicador, col_nivel = st.columns(2)
+        indicador = col_indicador.selectbox(
+            "Indicador a comparar", list(opciones),
+            index=list(opciones).index('repitencia') if 'repitencia' in opciones else 0,
+            format_func=lambda i: INDICADORES[i]['titulo'], key="visualizaciones_indicador"
+        )
+        niveles = opciones[indicador]
+        nivel = col_nivel.selectbox(
+            "Nivel educativo", niveles, index=niveles.index('secundaria') if 'secundaria' in niveles else 0,
+            format_func=lambda n: NIVELES[n][0], key="visualizaciones_nivel"
+        )
+        nombre_metrica = etiqueta(indicador, nivel)
+        with tramo("consulta indicadores"):
+            otra = consultar(almacen, [(indicador, nivel)], modelo[1], modelo[2], ['a_o'],
+                             {'departamento': selected_depto_2})
+        otra = otra.set_axis(['a_o', 'otra_metrica'], axis=1)
     else:
-        df_2['otra_metrica'] = df[df['departamento'] == selected_depto_2].groupby('a_o')['tasa_matriculaci_n_5_16'].mean().values
         nombre_metrica = 'Tasa de Matriculación (5-16)'
+        otra = query(['tasa_matriculaci_n_5_16'], ['a_o'], {'departamento': selected_depto_2}, modelo=modelo)
+        otra = otra.rename(columns={'tasa_matriculaci_n_5_16': 'otra_metrica'})
+    df_2 = df_2.merge(otra, on='a_o', how='left')
 
     fig2 = go.Figure()
 
@@ -124,4 +158,5 @@ def show_visualization_tab():
         margin=dict(l=40, r=40, t=60, b=40)
     )
 
-    st.plotly_chart(fig2, use_container_width=True)
+    with tramo("plotly cobertura bruta"):
+        st.plotly_chart(fig2, use_container_width=True)
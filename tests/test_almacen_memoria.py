@@ -0,0 +1,90 @@
+import gc
+
+import pandas as pd
+import pytest
+
+import almacen_memoria
+from almacen_memoria import adquirir, completar, obtener, publicar
+from modelo import hash_datos
+
+
+@pytest.fixture(autouse=True)
+def almacen_vacio(monkeypatch):
+    # Cada prueba parte de un almacén sin versiones
+    monkeypatch.setattr(almacen_memoria, '_VERSIONES', {})
+    monkeypatch.setattr(almacen_memoria, '_HECHOS', {})
+    monkeypatch.setattr(almacen_memoria, '_vigente', None)
+
+
+def _referencias(version: str) -> int | None:
+    gc.collect()
+    entrada = almacen_memoria._VERSIONES.get(version)
+    return None if entrada is None else entrada['referencias']
+
+
+def _contador(datos: dict):
+    llamadas = []
+
+    def construir():
+        llamadas.append(1)
+        return datos
+    return construir, llamadas
+
+
+def test_las_manijas_comparten_la_version_y_la_liberan():
+    construir, llamadas = _contador({'df_raw': pd.DataFrame({'a': [1]})})
+    primera = publicar("crudos", construir)
+    segunda = publicar("crudos", construir)
+
+    # La segunda sesión recibe la copia ya construida
+    assert len(llamadas) == 1
+    assert obtener(primera)['df_raw'] is obtener(segunda)['df_raw']
+    assert _referencias("crudos") == 2
+
+    del primera
+    assert _referencias("crudos") == 1
+    # Sin sesiones y sin modelo (no es la vigente) la versión se descarta
+    del segunda
+    assert _referencias("crudos") is None
+
+
+def test_podar_no_descarta_la_vigente():
+    df_fact = pd.DataFrame({'id_tiempo': [1], 'id_geo': [1], 'cobertura_neta': [90.0]})
+    manija = publicar("v1", lambda: {'df_fact': df_fact})
+    assert almacen_memoria._vigente == "v1"
+
+    # Ninguna sesión la usa, pero es la última con modelo: se conserva
+    del manija
+    assert _referencias("v1") == 0
+    assert adquirir(hash_datos(df_fact)).version == "v1"
+    gc.collect()
+
+    # Una versión nueva con modelo pasa a ser la vigente y la anterior se descarta
+    otra = publicar("v2", lambda: {'df_fact': df_fact.assign(cobertura_neta=95.0)})
+    assert almacen_memoria._vigente == "v2"
+    assert _referencias("v1") is None
+    assert adquirir(hash_datos(df_fact)) is None
+
+    # Las versiones sin modelo tampoco la desplazan
+    crudos = publicar("crudos", lambda: {'df_raw': pd.DataFrame({'a': [1]})})
+    del otra, crudos
+    assert _referencias("v2") == 0
+    assert _referencias("crudos") is None
+
+
+def test_completar_construye_una_sola_vez():
+    manija = publicar("crudos", lambda: {'df_raw': pd.DataFrame({'a': [1, 2]})})
+    llamadas = []
+
+    def construir(previos):
+        llamadas.append(1)
+        return {**previos, 'df_fact': previos['df_raw'].assign(b=1)}
+
+    datos = completar(manija, {'divipola': "d1"}, construir)
+    assert completar(manija, {'divipola': "d1"}, construir) is datos
+    assert len(llamadas) == 1
+    assert list(datos['df_fact'].columns) == ['a', 'b']
+
+    # Otro requisito (p. ej. otra DIVIPOLA) vuelve a construir
+    completar(manija, {'divipola': "d2"}, construir)
+    assert len(llamadas) == 2
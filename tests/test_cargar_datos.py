@@ -0,0 +1,149 @@
+import json
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import cargar_datos
+from cargar_datos import fetch_paginado, leer_cache, refrescar_incremental
+
+COLUMNAS = ['a_o', 'municipio']
+
+
+class _Socrata(BaseHTTPRequestHandler):
+    """
+    Endpoint mínimo de Socrata: sirve `filas` por ventanas $offset/$limit
+    (con el $where de la actualización incremental) y anota cada petición.
+    Las primeras páginas tardan más, para que las respuestas lleguen en
+    desorden. La versión del dataset va en el ETag.
+    """
+    filas: list = []
+    peticiones: list = []
+    version = "v1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        filas = self.filas
+        if '$where' in params:
+            desde = int(re.search(r"a_o >= '(\d+)'", params['$where']).group(1))
+            nulos = "IS NULL" in params['$where']
+            filas = [f for f in filas if ('a_o' in f and int(f['a_o']) >= desde) or ('a_o' not in f and nulos)]
+        offset, limite = int(params.get('$offset', 0)), int(params['$limit'])
+        if '$offset' in params:
+            self.peticiones.append((offset, limite))
+            time.sleep(max(0.0, 0.05 - offset / 1000))
+        cuerpo = json.dumps(filas[offset:offset + limite]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', self.version)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+@pytest.fixture
+def servidor():
+    """
+    Levanta el endpoint en un puerto libre y devuelve una función que fija las
+    filas servidas y entrega (url, peticiones).
+    """
+    class Handler(_Socrata):
+        filas = []
+        peticiones = []
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    hilo = threading.Thread(target=httpd.serve_forever, daemon=True)
+    hilo.start()
+
+    def con_filas(n: int, filas: list | None = None, version: str = "v1"):
+        Handler.filas = filas if filas is not None else \
+            [{'a_o': str(2000 + i), 'municipio': f"M{i:03d}"} for i in range(n)]
+        Handler.version = version
+        return f"http://127.0.0.1:{httpd.server_address[1]}/resource/prueba.json", Handler.peticiones
+
+    yield con_filas
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_se_detiene_en_la_primera_pagina_incompleta(servidor):
+    url, peticiones = servidor(12)
+    df = fetch_paginado(url, columnas=COLUMNAS, page_size=5, max_workers=2)
+
+    assert len(df) == 12
+    # Tandas de 2: (0, 5) y (10, 15); la página 10 trae 2 filas y no se pide otra tanda
+    assert sorted(o for o, _ in peticiones) == [0, 5, 10, 15]
+
+
+def test_total_multiplo_del_tamano_de_pagina(servidor):
+    url, peticiones = servidor(10)
+    df = fetch_paginado(url, columnas=COLUMNAS, page_size=5, max_workers=2)
+
+    assert len(df) == 10
+    assert sorted(o for o, _ in peticiones) == [0, 5, 10, 15]
+
+
+def test_limit_recorta_la_ultima_pagina(servidor):
+    url, peticiones = servidor(30)
+    df = fetch_paginado(url, columnas=COLUMNAS, page_size=5, max_workers=4, limit=12)
+
+    assert len(df) == 12
+    assert sorted(peticiones) == [(0, 5), (5, 5), (10, 2)]
+
+
+def test_conserva_el_orden_del_dataset(servidor):
+    url, _ = servidor(23)
+    df = fetch_paginado(url, columnas=COLUMNAS, page_size=3, max_workers=4)
+
+    assert df['municipio'].tolist() == [f"M{i:03d}" for i in range(23)]
+    # Las columnas que no son de texto llegan ya numéricas
+    assert df['a_o'].tolist() == list(range(2000, 2023))
+
+
+def test_sin_resultados(servidor):
+    url, peticiones = servidor(0)
+    df = fetch_paginado(url, columnas=COLUMNAS, page_size=5, max_workers=2)
+
+    assert df.empty
+    assert list(df.columns) == COLUMNAS
+    assert sorted(o for o, _ in peticiones) == [0, 5]
+
+
+def _filas(años: dict, sin_año: list) -> list:
+    # {año: [municipios]} y municipios sin año, como los entrega Socrata (sin la llave si es nulo)
+    filas = [{'a_o': str(año), 'municipio': m} for año, municipios in años.items() for m in municipios]
+    return filas + [{'municipio': m} for m in sin_año]
+
+
+def test_incremental_reemplaza_los_registros_sin_año(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(cargar_datos, 'CACHE_DIR', str(tmp_path))
+    url, _ = servidor(0, _filas({2020: ["A", "B"], 2021: ["A"]}, ["X", "Y"]), version="v1")
+    df, _ = refrescar_incremental(url, columnas=COLUMNAS)
+    assert len(df) == 5
+
+    # Nueva versión: 2021 corregido, un año nuevo y los registros sin año cambian
+    servidor(0, _filas({2020: ["A", "B"], 2021: ["A", "B"], 2022: ["A"]}, ["X", "Z", "W"]), version="v2")
+    df, nuevos = refrescar_incremental(url, columnas=COLUMNAS)
+    en_disco = leer_cache(url)[0]
+
+    esperado = sorted(["A", "B", "A", "B", "A", "X", "Z", "W"])
+    assert sorted(df['municipio']) == esperado
+    # Lo que la sesión ve es lo mismo que se leerá de disco en frío
+    assert sorted(en_disco['municipio']) == esperado
+    assert sorted(nuevos['municipio'].tolist()) == sorted(["A", "B", "A", "X", "Z", "W"])
+
+
+def test_incremental_sin_años_guardados_descarga_todo(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(cargar_datos, 'CACHE_DIR', str(tmp_path))
+    url, _ = servidor(0, _filas({}, ["X"]), version="v1")
+    refrescar_incremental(url, columnas=COLUMNAS)
+
+    servidor(0, _filas({2020: ["A"]}, ["X"]), version="v2")
+    df, nuevos = refrescar_incremental(url, columnas=COLUMNAS)
+    assert sorted(df['municipio']) == ["A", "X"]
+    assert len(nuevos) == 2
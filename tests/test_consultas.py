@@ -0,0 +1,70 @@
+import pandas as pd
+
+from consultas import estadisticas_cache, query
+from modelo import COLUMNAS_HECHOS, construir_modelo
+
+
+def _modelo(desplazamiento: float = 0.0) -> tuple:
+    filas = [{'a_o': año, 'departamento': depto, 'c_digo_departamento': cod[:2], 'municipio': municipio,
+              'c_digo_municipio': cod, 'deserci_n': 1.0, 'aprobaci_n': 90.0, 'repitencia': 2.0, 'reprobaci_n': 3.0,
+              **{col: float(año - 2000 + i) + desplazamiento for col in COLUMNAS_HECHOS}}
+             for año in [2019, 2020]
+             for i, (depto, municipio, cod) in enumerate([("Antioquia", "Medellín", "05001"),
+                                                          ("Antioquia", "Bello", "05088"),
+                                                          ("Caldas", "Manizales", "17001")])]
+    _, dim_tiempo, dim_geo, df_fact = construir_modelo(pd.DataFrame(filas))
+    return df_fact, dim_geo, dim_tiempo
+
+
+def _contar(consulta) -> tuple:
+    # (aciertos, fallos) que suma la consulta en la caché
+    antes = estadisticas_cache()
+    resultado = consulta()
+    despues = estadisticas_cache()
+    return resultado, (despues['aciertos'] - antes['aciertos'], despues['fallos'] - antes['fallos'])
+
+
+def test_la_misma_consulta_sale_de_la_cache():
+    modelo = _modelo()
+    primero, conteo = _contar(lambda: query('cobertura_neta', ['departamento', 'a_o'], modelo=modelo))
+    assert conteo == (0, 1)
+    assert primero.set_index(['departamento', 'a_o'])['cobertura_neta'].to_dict() == {
+        ("Antioquia", 2019): 19.5, ("Antioquia", 2020): 20.5, ("Caldas", 2019): 21.0, ("Caldas", 2020): 22.0,
+    }
+
+    # El llamador recibe una copia: modificarla no altera lo guardado
+    primero['cobertura_neta'] = 0
+    segundo, conteo = _contar(lambda: query(['cobertura_neta'], ('departamento', 'a_o'), modelo=modelo))
+    assert conteo == (1, 0)
+    assert segundo['cobertura_neta'].tolist() == [19.5, 20.5, 21.0, 22.0]
+
+
+def test_filtros_equivalentes_comparten_llave():
+    modelo = _modelo()
+    _, conteo = _contar(lambda: query('cobertura_neta', 'municipio', {'a_o': 2020, 'departamento': "Antioquia"},
+                                      order_by='-cobertura_neta', modelo=modelo))
+    assert conteo == (0, 1)
+    resultado, conteo = _contar(lambda: query('cobertura_neta', ['municipio'],
+                                              {'departamento': ["Antioquia"], 'a_o': [2020]},
+                                              order_by='-cobertura_neta', modelo=modelo))
+    assert conteo == (1, 0)
+    assert resultado['municipio'].tolist() == ["Bello", "Medellín"]
+
+
+def test_otra_version_del_modelo_no_usa_la_cache():
+    modelo = _modelo()
+    query('cobertura_neta', 'a_o', modelo=modelo)
+
+    # Cambian los hechos: misma consulta, otra llave y otros valores
+    actualizado = _modelo(desplazamiento=10.0)
+    resultado, conteo = _contar(lambda: query('cobertura_neta', 'a_o', modelo=actualizado))
+    assert conteo == (0, 1)
+    assert resultado['cobertura_neta'].tolist() == [30.0, 31.0]
+
+    # Solo cambia dim_geo (p. ej. al enriquecerse con la DIVIPOLA): también es otra versión
+    df_fact, dim_geo, dim_tiempo = modelo
+    enriquecido = (df_fact, dim_geo.assign(latitud=6.2), dim_tiempo)
+    _, conteo = _contar(lambda: query('cobertura_neta', 'a_o', modelo=enriquecido))
+    assert conteo == (0, 1)
+    _, conteo = _contar(lambda: query('cobertura_neta', 'a_o', modelo=modelo))
+    assert conteo == (1, 0)
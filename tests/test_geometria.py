@@ -0,0 +1,73 @@
+import json
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon, box
+
+from geometria import _a_topojson
+
+
+def _decodificar(topologia: dict, objeto: str) -> list:
+    # Decodificador TopoJSON mínimo: deltas -> coordenadas y arcos unidos por anillo
+    escala = np.array(topologia['transform']['scale'])
+    traslado = np.array(topologia['transform']['translate'])
+    arcos = [np.cumsum(np.array(arco), axis=0) * escala + traslado for arco in topologia['arcs']]
+
+    def anillo(indices):
+        puntos = []
+        for i in indices:
+            arco = arcos[i] if i >= 0 else arcos[~i][::-1]
+            puntos.extend(arco.tolist() if not puntos else arco[1:].tolist())
+        assert puntos[0] == puntos[-1]
+        return puntos
+
+    def poligono(anillos):
+        exterior, *huecos = [anillo(a) for a in anillos]
+        return Polygon(exterior, huecos)
+
+    geometrias = []
+    for g in topologia['objects'][objeto]['geometries']:
+        if g['type'] == 'Polygon':
+            geometrias.append(poligono(g['arcs']))
+        else:
+            geometrias.append(MultiPolygon([poligono(p) for p in g['arcs']]))
+    return geometrias
+
+
+def test_ida_y_vuelta_con_bordes_compartidos_y_huecos():
+    # A y B comparten el borde x = 4; A tiene un hueco y C son dos islas
+    a = Polygon(box(0, 0, 4, 4).exterior.coords, [box(1, 1, 2, 2).exterior.coords[::-1]])
+    b = box(4, 0, 8, 4)
+    c = MultiPolygon([box(10, 0, 11, 1), box(12, 0, 13, 1)])
+    gdf = gpd.GeoDataFrame({'MPIO_CDPMP': ["05001", "05002", "05003"]}, geometry=[a, b, c])
+
+    topologia = json.loads(_a_topojson(gdf, "municipios", 1.0))
+    geometrias = topologia['objects']['municipios']['geometries']
+
+    assert [g['type'] for g in geometrias] == ['Polygon', 'Polygon', 'MultiPolygon']
+    assert [g['properties']['MPIO_CDPMP'] for g in geometrias] == ["05001", "05002", "05003"]
+    for original, decodificada in zip(gdf.geometry, _decodificar(topologia, "municipios")):
+        assert decodificada.equals(original)
+    assert len(geometrias[0]['arcs']) == 2
+
+    # El borde compartido es un solo arco: uno de los vecinos lo referencia invertido
+    arcos_a = {i for anillo in geometrias[0]['arcs'] for i in anillo}
+    arcos_b = {i for anillo in geometrias[1]['arcs'] for i in anillo}
+    compartidos = {i for i in arcos_a if ~i in arcos_b}
+    assert len(compartidos) == 1
+    i = compartidos.pop()
+    arco = np.cumsum(topologia['arcs'][i if i >= 0 else ~i], axis=0)
+    assert set(map(tuple, arco.tolist())) == {(4, 0), (4, 4)}
+    # Cada arco se usa en algún anillo y ninguno se guarda dos veces
+    usados = {i if i >= 0 else ~i for g in geometrias for anillos in
+              (g['arcs'] if g['type'] == 'MultiPolygon' else [g['arcs']]) for anillo in anillos for i in anillo}
+    assert usados == set(range(len(topologia['arcs'])))
+
+
+def test_poligono_que_colapsa_en_la_grilla_se_descarta():
+    gdf = gpd.GeoDataFrame({'MPIO_CDPMP': ["05001", "05002"]},
+                           geometry=[box(0, 0, 4, 4), box(10, 10, 10.2, 10.2)])
+    geometrias = json.loads(_a_topojson(gdf, "municipios", 1.0))['objects']['municipios']['geometries']
+
+    assert geometrias[0]['type'] == 'Polygon'
+    assert geometrias[1] == {'type': None, 'properties': {'MPIO_CDPMP': "05002"}}
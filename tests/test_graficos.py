@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from graficos import estadisticas_caja, reducir_puntos
+
+
+def test_cuartiles_y_bigotes_como_numpy():
+    rng = np.random.default_rng(3)
+    # Grupos de distinto tamaño (incluido uno de un solo dato), con atípicos y nulos
+    tamaños = {'A': 1, 'B': 2, 'C': 7, 'D': 250}
+    df = pd.concat([pd.DataFrame({'depto': g, 'valor': rng.standard_t(3, size=n) * 10})
+                    for g, n in tamaños.items()], ignore_index=True)
+    df.loc[[3, 50], 'valor'] = np.nan
+    df = df.sample(frac=1, random_state=1, ignore_index=True)
+
+    estadisticas, atipicos = estadisticas_caja(df, 'depto', 'valor')
+
+    assert estadisticas.index.tolist() == list(tamaños)
+    for g, fila in estadisticas.iterrows():
+        valores = df.loc[df['depto'] == g, 'valor'].dropna().to_numpy()
+        q1, mediana, q3 = np.percentile(valores, [25, 50, 75])
+        np.testing.assert_allclose([fila['q1'], fila['mediana'], fila['q3']], [q1, mediana, q3])
+        assert fila['n'] == len(valores)
+        np.testing.assert_allclose(fila['media'], valores.mean())
+
+        # Tukey: los bigotes llegan al dato más extremo dentro de 1.5 × IQR
+        inferior, superior = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+        dentro = valores[(valores >= inferior) & (valores <= superior)]
+        assert fila['bigote_inferior'] == dentro.min()
+        assert fila['bigote_superior'] == dentro.max()
+        fuera = np.sort(valores[(valores < inferior) | (valores > superior)])
+        np.testing.assert_array_equal(np.sort(atipicos.loc[atipicos['depto'] == g, 'valor']), fuera)
+
+    assert len(atipicos) > 0
+
+
+def test_caja_sin_datos():
+    estadisticas, atipicos = estadisticas_caja(pd.DataFrame({'depto': ['A'], 'valor': [np.nan]}), 'depto', 'valor')
+    assert estadisticas.empty and atipicos.empty
+    assert list(estadisticas.columns) == ['n', 'q1', 'mediana', 'q3', 'bigote_inferior', 'bigote_superior', 'media']
+
+
+def test_reducir_puntos_conserva_los_extremos():
+    rng = np.random.default_rng(5)
+    # Una nube densa y unos pocos puntos aislados en las esquinas
+    denso = rng.normal(50, 2, size=(20000, 3))
+    extremos = np.array([[0, 0, 0], [100, 100, 100], [0, 100, 50], [100, 0, 50]], dtype=float)
+    df = pd.DataFrame(np.vstack([denso, extremos]), columns=['x', 'y', 'z'])
+
+    reducido = reducir_puntos(df, ['x', 'y', 'z'], maximo=1000)
+
+    assert len(reducido) <= 1000
+    # Subconjunto de filas en el orden original, con los aislados y los máximos de cada eje
+    assert reducido.index.is_monotonic_increasing
+    assert set(df.index[-4:]) <= set(reducido.index)
+    for col in ['x', 'y', 'z']:
+        assert reducido[col].min() == df[col].min() and reducido[col].max() == df[col].max()
+    # El mismo df da siempre los mismos puntos
+    assert reducido.index.equals(reducir_puntos(df, ['x', 'y', 'z'], maximo=1000).index)
+
+
+def test_reducir_puntos_sin_exceso_devuelve_todo():
+    df = pd.DataFrame({'x': [1.0, 2.0], 'y': [3.0, 4.0]})
+    assert reducir_puntos(df, ['x', 'y'], maximo=2) is df
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from modelo import (COLUMNAS_HECHOS, COLUMNAS_RELEVANTES, actualizar_desde_limpios, construir_modelo,
+                    limpiar_datos, normalizar_columnas)
+
+MUNICIPIOS = [("Antioquia", "05", "Medellín", "05001"), ("Antioquia", "05", "Bello", "05088"),
+              ("Caldas", "17", "Manizales", "17001")]
+
+
+def _crudos(años: list, municipios: list = MUNICIPIOS, desplazamiento: float = 0.0) -> pd.DataFrame:
+    # Una fila por año y municipio, con indicadores distintos en cada fila
+    filas = []
+    for año in años:
+        for i, (depto, cod_depto, municipio, cod_municipio) in enumerate(municipios):
+            valor = (año - 2000) + i + desplazamiento
+            filas.append({'a_o': año, 'departamento': depto, 'c_digo_departamento': cod_depto,
+                          'municipio': municipio, 'c_digo_municipio': cod_municipio,
+                          **{col: valor for col in COLUMNAS_RELEVANTES[5:]}})
+    return pd.DataFrame(filas)
+
+
+def _hechos_con_nombres(modelo: tuple) -> pd.DataFrame:
+    # Los ids pueden diferir entre construcciones: se comparan los hechos por año y municipio
+    _, dim_tiempo, dim_geo, df_fact = modelo
+    vista = df_fact.merge(dim_tiempo, on='id_tiempo').merge(dim_geo, on='id_geo')
+    vista = vista[['a_o', 'departamento', 'municipio'] + COLUMNAS_HECHOS]
+    return vista.astype({'departamento': str, 'municipio': str}) \
+        .sort_values(['a_o', 'departamento', 'municipio'], ignore_index=True)
+
+
+def test_ids_y_tipos_del_modelo():
+    df_clean, dim_tiempo, dim_geo, df_fact = construir_modelo(_crudos([2021, 2019, 2020]))
+
+    # Ids consecutivos desde 1, en orden de año y de (departamento, municipio)
+    assert dim_tiempo['a_o'].tolist() == [2019, 2020, 2021]
+    assert dim_tiempo['id_tiempo'].tolist() == [1, 2, 3]
+    assert dim_geo['id_geo'].tolist() == [1, 2, 3]
+    assert dim_geo['municipio'].astype(str).tolist() == ["Bello", "Medellín", "Manizales"]
+
+    assert dim_tiempo.dtypes.to_dict() == {'id_tiempo': np.dtype('int16'), 'a_o': np.dtype('int16')}
+    assert dim_geo['id_geo'].dtype == np.int16
+    assert all(isinstance(t, pd.CategoricalDtype) for t in dim_geo.drop(columns='id_geo').dtypes)
+    assert df_fact[['id_tiempo', 'id_geo']].dtypes.tolist() == [np.dtype('int16')] * 2
+    assert (df_fact[COLUMNAS_HECHOS].dtypes == np.float32).all()
+
+    # Un hecho por año y municipio, ordenado por la llave
+    assert len(df_fact) == 9
+    assert not df_fact.duplicated(['id_tiempo', 'id_geo']).any()
+    assert df_fact.equals(df_fact.sort_values(['id_tiempo', 'id_geo'], ignore_index=True))
+    assert len(df_clean) == 9
+
+
+def test_actualizar_un_año_existente_igual_a_reconstruir():
+    previo = construir_modelo(_crudos([2019, 2020]))
+    nuevos = _crudos([2020], desplazamiento=0.5)
+
+    incremental = actualizar_desde_limpios(*previo, limpiar_datos(normalizar_columnas(nuevos)))
+    completo = construir_modelo(pd.concat([_crudos([2019]), nuevos], ignore_index=True))
+
+    # Sin años ni municipios nuevos los ids coinciden: las tablas son idénticas
+    for tabla_incremental, tabla_completa in zip(incremental[1:], completo[1:]):
+        pd.testing.assert_frame_equal(tabla_incremental.reset_index(drop=True), tabla_completa)
+
+
+def test_actualizar_con_año_y_municipio_nuevos_igual_a_reconstruir():
+    previo = construir_modelo(_crudos([2019, 2020]))
+    # Un año nuevo con un municipio que el modelo no tenía
+    nuevos = _crudos([2020, 2021], MUNICIPIOS + [("Antioquia", "05", "Abejorral", "05002")], desplazamiento=0.5)
+
+    incremental = actualizar_desde_limpios(*previo, limpiar_datos(normalizar_columnas(nuevos)))
+    completo = construir_modelo(pd.concat([_crudos([2019]), nuevos], ignore_index=True))
+
+    pd.testing.assert_frame_equal(_hechos_con_nombres(incremental), _hechos_con_nombres(completo))
+    assert len(incremental[0]) == len(completo[0])
+    # El municipio nuevo se agrega al final de la dimensión, sin renumerar los existentes
+    _, _, dim_geo_previa, _ = previo
+    dim_geo = incremental[2]
+    assert dim_geo['id_geo'].tolist() == [1, 2, 3, 4]
+    assert dim_geo['municipio'].astype(str).tolist()[:3] == dim_geo_previa['municipio'].astype(str).tolist()
+    assert dim_geo['municipio'].astype(str).tolist()[3] == "Abejorral"
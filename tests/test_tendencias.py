@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from tendencias import MIN_AÑOS, ajustar_tendencias
+
+METRICAS = ['cobertura_neta', 'poblaci_n_5_16']
+
+
+def _tensor(valores: np.ndarray, años: np.ndarray) -> dict:
+    # Lo mínimo de `construir_tensor` que usa el ajuste
+    return {'años': años, 'valores': valores.astype(np.float32), 'metricas': {m: i for i, m in enumerate(METRICAS)},
+            'geo': pd.DataFrame({'municipio': [f"M{i}" for i in range(len(valores))]}),
+            'departamentos': {}}
+
+
+def test_coincide_con_polyfit_sobre_los_años_observados():
+    rng = np.random.default_rng(7)
+    # Años con un hueco (2013 no publicado)
+    años = np.array([2010, 2011, 2012, 2014, 2015, 2016, 2017, 2018], dtype=np.int16)
+    valores = rng.normal(50, 10, size=(40, len(años), len(METRICAS))) + 2.0 * (años - 2010)[None, :, None]
+    # Cada serie pierde años al azar; algunas quedan con menos de MIN_AÑOS
+    valores[rng.random(valores.shape) < 0.3] = np.nan
+    tendencias = ajustar_tendencias(_tensor(valores, años), metricas=METRICAS, hasta=2035)
+
+    assert tendencias['años'].tolist() == list(range(2010, 2036))
+    y = tendencias['observado'].astype(float)
+    for g in range(y.shape[0]):
+        for m in range(len(METRICAS)):
+            con_dato = ~np.isnan(y[g, :, m])
+            assert tendencias['observaciones'][g, m] == con_dato.sum()
+            if con_dato.sum() < MIN_AÑOS:
+                assert np.isnan(tendencias['pendiente'][g, m])
+                assert np.isnan(tendencias['estimado'][g, :, m]).all()
+                continue
+            pendiente, intercepto = np.polyfit(años[con_dato].astype(float), y[g, con_dato, m], 1)
+            np.testing.assert_allclose(tendencias['pendiente'][g, m], pendiente, rtol=1e-4)
+            np.testing.assert_allclose(tendencias['estimado'][g, :, m],
+                                       intercepto + pendiente * tendencias['años'], rtol=1e-4, atol=1e-3)
+
+
+def test_banda_de_confianza():
+    años = np.arange(2010, 2020, dtype=np.int16)
+    # Serie casi lineal con ruido alterno, y una exacta sin varianza
+    ruido = np.where(np.arange(len(años)) % 2, 1.0, -1.0)
+    valores = np.stack([5.0 - 0.5 * (años - 2010) + ruido, 10.0 + 3.0 * (años - 2010)], axis=-1)[None]
+    tendencias = ajustar_tendencias(_tensor(valores, años), metricas=METRICAS, hasta=2035)
+
+    estimado, inferior, superior = (tendencias[k][0, :, 0] for k in ['estimado', 'inferior', 'superior'])
+    # La banda se abre al alejarse de los años observados
+    ancho = superior - estimado
+    assert (ancho > 0).all() and (np.diff(ancho[len(años):]) > 0).all()
+    # La recta puede bajar de cero (pendiente negativa); la banda inferior no
+    assert estimado.min() < 0
+    np.testing.assert_allclose(inferior, np.maximum(estimado - ancho, 0), atol=1e-5)
+    # Sin residuos la banda se cierra sobre la recta
+    np.testing.assert_allclose(tendencias['superior'][0, :, 1], tendencias['estimado'][0, :, 1], rtol=1e-5)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from validacion import REGLAS, compilar, validar
+
+# Subconjunto de las reglas del MEN: las columnas que ubican el registro y
+# dos indicadores, uno acotado (0-100) y otro con rango esperado
+REGLAS_PRUEBA = {col: REGLAS[col] for col in
+                 ['a_o', 'departamento', 'municipio', 'c_digo_departamento', 'c_digo_municipio',
+                  'deserci_n', 'cobertura_neta']}
+
+
+def _datos(filas: list) -> pd.DataFrame:
+    base = {'a_o': 2020, 'departamento': "Antioquia", 'municipio': "Medellín",
+            'c_digo_departamento': "05", 'c_digo_municipio': "05001",
+            'deserci_n': 3.0, 'cobertura_neta': 90.0}
+    return pd.DataFrame([{**base, **fila} for fila in filas])
+
+
+def _reporte(resultado: dict) -> dict:
+    reporte = resultado['reporte']
+    return {(c, r): (n, a) for c, r, n, a in reporte[['columna', 'regla', 'registros', 'accion']].itertuples(index=False)}
+
+
+def test_limites_de_rango_anulan_solo_el_valor():
+    df = _datos([{'municipio': f"M{i}", 'deserci_n': v} for i, v in enumerate([-0.5, 0.0, 100.0, 100.5, np.nan])])
+    resultado = validar(df, compilar(REGLAS_PRUEBA))
+
+    # Los extremos del rango son válidos; lo de afuera queda en NaN sin perder la fila
+    assert len(resultado['limpio']) == 5
+    assert resultado['cuarentena'].empty
+    np.testing.assert_array_equal(resultado['limpio']['deserci_n'].to_numpy(), [np.nan, 0.0, 100.0, np.nan, np.nan])
+    assert resultado['mascaras']['deserci_n'].tolist() == [False, True, True, False, False]
+    reporte = _reporte(resultado)
+    assert reporte[('deserci_n', 'fuera de rango')] == (2, 'anulado')
+    assert reporte[('deserci_n', 'faltante')] == (1, 'anulado')
+
+
+def test_fuera_de_lo_esperado_solo_se_informa():
+    df = _datos([{'municipio': "A", 'cobertura_neta': 100.0}, {'municipio': "B", 'cobertura_neta': 130.0}])
+    resultado = validar(df, compilar(REGLAS_PRUEBA))
+
+    assert resultado['limpio']['cobertura_neta'].tolist() == [100.0, 130.0]
+    assert _reporte(resultado) == {('cobertura_neta', 'fuera de lo esperado'): (1, 'alerta')}
+
+
+def test_cuarentena_si_falla_una_columna_requerida():
+    df = _datos([
+        {'municipio': "Válido"},
+        {'municipio': "Año previo", 'a_o': 1999},
+        {'municipio': "Año fraccionario", 'a_o': 2020.5},
+        {'municipio': None},
+        {'municipio': "Fuera del departamento", 'c_digo_municipio': "08001"},
+        {'municipio': "Código corto", 'c_digo_departamento': "5"},
+    ])
+    resultado = validar(df, compilar(REGLAS_PRUEBA))
+
+    assert resultado['limpio']['municipio'].tolist() == ["Válido"]
+    motivos = dict(zip(resultado['cuarentena']['municipio'].fillna("-"), resultado['cuarentena']['motivo']))
+    assert motivos == {
+        "Año previo": "a_o: inválido",
+        "Año fraccionario": "a_o: inválido",
+        "-": "municipio: faltante",
+        "Fuera del departamento": "c_digo_municipio: prefijo",
+        # Sin el formato del padre tampoco coincide el prefijo del municipio
+        "Código corto": "c_digo_departamento: formato; c_digo_municipio: prefijo",
+    }
+    reporte = _reporte(resultado)
+    assert reporte[('a_o', 'fuera de rango')] == (1, 'cuarentena')
+    assert reporte[('a_o', 'no entero')] == (1, 'cuarentena')
+
+
+def test_clave_repetida_conserva_la_primera():
+    df = _datos([
+        {'municipio': "A", 'deserci_n': 1.0},
+        {'municipio': "B", 'deserci_n': 2.0},
+        {'municipio': "A", 'deserci_n': 3.0},
+        {'municipio': "A", 'a_o': 2021, 'deserci_n': 4.0},
+    ])
+    resultado = validar(df, compilar(REGLAS_PRUEBA))
+
+    assert resultado['limpio']['deserci_n'].tolist() == [1.0, 2.0, 4.0]
+    assert resultado['cuarentena']['deserci_n'].tolist() == [3.0]
+    assert resultado['cuarentena']['motivo'].tolist() == ["clave repetida"]
+    assert _reporte(resultado) == {('a_o, departamento, municipio', 'clave repetida'): (1, 'cuarentena')}